@@ -53,17 +53,10 @@ export class MediaControlAPI {
    */
   async sendCommand(command: MediaCommand): Promise<CommandResponse> {
     try {
-      const controller = new AbortController();
-      const timeoutId = setTimeout(() => controller.abort(), this.timeout);
-
-      const response = await fetch(`${this.baseURL}/command/${command}`, {
-        method: 'POST',
-        signal: controller.signal,
+      const response = await this.postIdempotent(`/command/${command}`, {
         headers: this.getHeaders(),
       });
 
-      clearTimeout(timeoutId);
-
       if (!response.ok) {
         throw new Error(`HTTP ${response.status}: ${response.statusText}`);
       }
@@ -86,12 +79,7 @@ export class MediaControlAPI {
     }
 
     try {
-      const controller = new AbortController();
-      const timeoutId = setTimeout(() => controller.abort(), this.timeout);
-
-      const response = await fetch(`${this.baseURL}/volume`, {
-        method: 'POST',
-        signal: controller.signal,
+      const response = await this.postIdempotent('/volume', {
         headers: {
           ...this.getHeaders(),
           'Content-Type': 'application/json',
@@ -99,8 +87,6 @@ export class MediaControlAPI {
         body: JSON.stringify({ level }),
       });
 
-      clearTimeout(timeoutId);
-
       if (!response.ok) {
         throw new Error(`HTTP ${response.status}: ${response.statusText}`);
       }
@@ -128,6 +114,35 @@ export class MediaControlAPI {
     this.baseURL = url;
   }
 
+  /**
+   * POST com Idempotency-Key: se a primeira tentativa estourar o timeout
+   * ou falhar na rede, repete uma vez com a mesma chave e o servidor
+   * devolve a resposta original em vez de executar o comando de novo
+   */
+  private async postIdempotent(path: string, init: RequestInit): Promise<Response> {
+    const key = `${Date.now().toString(36)}-${Math.random().toString(36).slice(2)}`;
+    const headers = { ...(init.headers as Record<string, string>), 'Idempotency-Key': key };
+
+    for (let attempt = 1; ; attempt++) {
+      const controller = new AbortController();
+      const timeoutId = setTimeout(() => controller.abort(), this.timeout);
+      try {
+        return await fetch(`${this.baseURL}${path}`, {
+          ...init,
+          method: 'POST',
+          signal: controller.signal,
+          headers,
+        });
+      } catch (error) {
+        if (attempt >= 2) {
+          throw error;
+        }
+      } finally {
+        clearTimeout(timeoutId);
+      }
+    }
+  }
+
   /**
    * Retorna os headers comuns para todas as requisições
    */
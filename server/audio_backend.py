@@ -0,0 +1,642 @@
+import os
+import time
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+# Backend padrão (pode ser trocado por "fake" para rodar fora do Windows)
+AUDIO_BACKEND_ENV = 'AUDIOREMOTE_AUDIO_BACKEND'
+
+# Diferença de volume (em %) abaixo da qual a escrita é considerada sem efeito
+VOLUME_EPSILON = 0.05
+
+# AudioSessionState: sessões expiradas não voltam a tocar
+AUDIO_SESSION_EXPIRED = 2
+
+
+def busy_wait(seconds):
+    """Gasta CPU segurando o GIL (custo Python de comtypes/pynput nos backends falsos)"""
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        pass
+
+
+class AudioBackendError(Exception):
+    """Erro ao acessar o dispositivo de áudio"""
+
+
+class AudioBackend:
+    """Interface comum dos backends de áudio.
+
+    O volume é sempre tratado em porcentagem (0-100). Mudanças no endpoint
+    (inclusive as feitas por outros programas) são avisadas aos listeners
+    registrados com ``subscribe``.
+    """
+    name = "base"
+    listeners = ()
+    session_listeners = ()
+
+    def set_volume(self, level):
+        """Define o volume master"""
+        raise NotImplementedError
+
+    def get_volume(self):
+        """Retorna o volume master atual"""
+        raise NotImplementedError
+
+    def set_mute(self, muted):
+        """Liga ou desliga o mudo"""
+        raise NotImplementedError
+
+    def get_mute(self):
+        """Retorna se o dispositivo está mudo"""
+        raise NotImplementedError
+
+    def get_state(self):
+        """Volume e mudo atuais: {"volume": 0-100, "muted": bool}"""
+        return {"volume": self.get_volume(), "muted": self.get_mute()}
+
+    def apply_change(self, change):
+        """Lê o estado, aplica a VolumeChange e escreve só o que mudou.
+
+        Retorna (estado resultante, se houve escrita). Só é chamado pela
+        thread do VolumeScheduler, então a leitura e a escrita não se
+        intercalam com outros ajustes do servidor.
+        """
+        current = self.get_state()
+        volume, muted = change.apply_to(current["volume"], current["muted"])
+        changed = False
+        if abs(volume - current["volume"]) >= VOLUME_EPSILON:
+            self.set_volume(volume)
+            changed = True
+        else:
+            volume = current["volume"]
+        if muted != current["muted"]:
+            self.set_mute(muted)
+            changed = True
+        return {"volume": volume, "muted": muted}, changed
+
+    def subscribe(self, listener):
+        """Registra listener(volume, muted) para mudanças no endpoint.
+
+        ``volume`` None indica que o estado precisa ser relido (ex.: troca
+        do dispositivo padrão). O listener roda na thread que detectou a
+        mudança e não deve bloquear.
+        """
+        # Tupla nova a cada registro: a notificação itera sem lock
+        self.listeners = self.listeners + (listener,)
+
+    def _notify(self, volume, muted):
+        for listener in self.listeners:
+            try:
+                listener(volume, muted)
+            except Exception as e:
+                logger.warning(f"Erro no listener de áudio: {e}")
+
+    def get_sessions(self):
+        """Enumera as sessões de áudio: [{"pid", "name", "volume", "muted"}]"""
+        raise NotImplementedError
+
+    def set_session_volume(self, pid, level):
+        """Define o volume (0-100) das sessões de um processo"""
+        raise NotImplementedError
+
+    def set_session_mute(self, pid, muted):
+        """Liga ou desliga o mudo das sessões de um processo"""
+        raise NotImplementedError
+
+    def apply_session_change(self, pid, change):
+        """Como ``apply_change``, mas para as sessões de um processo.
+
+        Lê o estado atual da sessão e escreve o resultado em um único
+        passo, para que dois ajustes relativos seguidos não partam do
+        mesmo valor. Retorna ({"volume", "muted"}, se houve escrita).
+        """
+        raise NotImplementedError
+
+    def subscribe_sessions(self, listener):
+        """Registra listener(event, session) para mudanças nas sessões.
+
+        ``event`` é "created", "changed" ou "expired" (com o dict da
+        sessão) ou "reset" (session None), quando a lista inteira precisa
+        ser relida. Só há avisos depois do primeiro ``get_sessions``.
+        """
+        self.session_listeners = self.session_listeners + (listener,)
+
+    def _notify_session(self, event, session):
+        for listener in self.session_listeners:
+            try:
+                listener(event, session)
+            except Exception as e:
+                logger.warning(f"Erro no listener de sessões: {e}")
+
+    def invalidate(self):
+        """Descarta a interface em cache (ex.: troca de dispositivo)"""
+
+    def close(self):
+        """Libera os recursos do backend"""
+
+
+class FakeAudioBackend(AudioBackend):
+    """Backend em memória, usado em testes e medições fora do Windows"""
+    name = "fake"
+
+    def __init__(self, latency=0.0, level=50.0, muted=False, busy=0.0):
+        self.latency = latency
+        self.busy = busy
+        self.level = float(level)
+        self.muted = muted
+        self.calls = 0
+        self.session_reads = 0
+        self.sessions = {}
+        self._lock = threading.Lock()
+
+    def set_volume(self, level):
+        if self.latency:
+            time.sleep(self.latency)
+        if self.busy:
+            busy_wait(self.busy)
+        with self._lock:
+            self.level = float(level)
+            self.calls += 1
+            muted = self.muted
+        # Como no Windows, a própria escrita também gera notificação
+        self._notify(float(level), muted)
+
+    def get_volume(self):
+        with self._lock:
+            return self.level
+
+    def set_mute(self, muted):
+        if self.latency:
+            time.sleep(self.latency)
+        with self._lock:
+            self.muted = muted
+            self.calls += 1
+            level = self.level
+        self._notify(level, muted)
+
+    def get_mute(self):
+        with self._lock:
+            return self.muted
+
+    def emit_change(self, level=None, muted=None):
+        """Simula uma mudança feita fora do servidor (teclado, mixer...)"""
+        with self._lock:
+            if level is not None:
+                self.level = float(level)
+            if muted is not None:
+                self.muted = muted
+            level, muted = self.level, self.muted
+        self._notify(level, muted)
+
+    def get_sessions(self):
+        with self._lock:
+            self.session_reads += 1
+            return [dict(session) for session in self.sessions.values()]
+
+    def _update_session(self, pid, **values):
+        if self.latency:
+            time.sleep(self.latency)
+        with self._lock:
+            session = self.sessions.get(pid)
+            if session is None:
+                raise AudioBackendError(f"Sessão {pid} não encontrada")
+            session.update(values)
+            self.calls += 1
+            session = dict(session)
+        self._notify_session("changed", session)
+
+    def set_session_volume(self, pid, level):
+        self._update_session(pid, volume=float(level))
+
+    def set_session_mute(self, pid, muted):
+        self._update_session(pid, muted=muted)
+
+    def apply_session_change(self, pid, change):
+        if self.latency:
+            time.sleep(self.latency)
+        with self._lock:
+            session = self.sessions.get(pid)
+            if session is None:
+                raise AudioBackendError(f"Sessão {pid} não encontrada")
+            volume, muted = change.apply_to(session["volume"], session["muted"])
+            changed = False
+            if abs(volume - session["volume"]) >= VOLUME_EPSILON:
+                session["volume"] = volume
+                changed = True
+            if muted != session["muted"]:
+                session["muted"] = muted
+                changed = True
+            if changed:
+                self.calls += 1
+            session = dict(session)
+        if changed:
+            self._notify_session("changed", session)
+        return {"volume": session["volume"], "muted": session["muted"]}, changed
+
+    def add_session(self, pid, name, volume=100.0, muted=False):
+        """Simula um aplicativo começando a tocar"""
+        session = {"pid": pid, "name": name, "volume": float(volume), "muted": muted}
+        with self._lock:
+            self.sessions[pid] = session
+        self._notify_session("created", dict(session))
+
+    def remove_session(self, pid):
+        """Simula a sessão de um aplicativo expirando"""
+        with self._lock:
+            session = self.sessions.pop(pid)
+        self._notify_session("expired", session)
+
+
+def endpoint_errors():
+    """Erros que indicam interface de áudio inválida (COMError só existe no Windows)"""
+    try:
+        from _ctypes import COMError
+    except ImportError:
+        return (OSError,)
+    return (COMError, OSError)
+
+
+class PycawAudioBackend(AudioBackend):
+    """Backend do Windows Core Audio com uma thread COM dedicada.
+
+    O COM é inicializado uma única vez na thread do backend e a interface
+    IAudioEndpointVolume é reaproveitada entre requisições. Ela só é
+    readquirida quando o dispositivo padrão muda ou quando uma chamada falha.
+    Cada interface adquirida recebe um IAudioEndpointVolumeCallback que
+    repassa as mudanças de volume/mudo aos listeners.
+
+    As sessões por aplicativo são enumeradas uma vez em ``get_sessions``;
+    depois disso chegam por IAudioSessionNotification (sessão nova) e
+    IAudioSessionEvents (volume, mudo e expiração de cada sessão).
+    """
+    name = "pycaw"
+
+    def __init__(self, timeout=5.0):
+        self.timeout = timeout
+        self._endpoint = None
+        self._watched = None
+        # Estado das sessões: só acessado na thread COM
+        self._session_manager = None
+        self._sessions = {}
+        self._session_events = None
+        self._process_names = {}
+        self._notifier = None
+        self._enumerator = None
+        self._started = False
+        # A thread (e o import do comtypes/pycaw) só nasce na primeira chamada
+        self._executor = ThreadPoolExecutor(
+            max_workers=1,
+            thread_name_prefix="audio-com",
+            initializer=self._init_com,
+        )
+
+    def _init_com(self):
+        """Inicializa o COM (MTA) na thread do backend"""
+        from comtypes import CoInitializeEx, COINIT_MULTITHREADED
+        CoInitializeEx(COINIT_MULTITHREADED)
+
+    def _watch_default_device(self):
+        """Registra callback para descartar a interface ao trocar o dispositivo padrão"""
+        from pycaw.callbacks import MMNotificationClient
+        from pycaw.pycaw import AudioUtilities
+
+        backend = self
+
+        class DefaultDeviceWatcher(MMNotificationClient):
+            def on_default_device_changed(self, flow, flow_id, role, role_id, default_device_id):
+                if flow == "eRender":
+                    backend.invalidate()
+
+        try:
+            self._enumerator = AudioUtilities.GetDeviceEnumerator()
+            self._notifier = DefaultDeviceWatcher()
+            self._enumerator.RegisterEndpointNotificationCallback(self._notifier)
+        except Exception as e:
+            # Sem notificações ainda funciona: a interface é readquirida após erro
+            logger.warning(f"Não foi possível monitorar troca de dispositivo: {e}")
+            self._notifier = None
+
+    def _acquire(self):
+        """Ativa a interface IAudioEndpointVolume do dispositivo padrão"""
+        from comtypes import CLSCTX_ALL
+        from pycaw.pycaw import AudioUtilities, IAudioEndpointVolume
+
+        devices = AudioUtilities.GetSpeakers()
+        interface = devices.Activate(IAudioEndpointVolume._iid_, CLSCTX_ALL, None)
+        endpoint = interface.QueryInterface(IAudioEndpointVolume)
+        self._watch_endpoint(endpoint)
+        return endpoint
+
+    def _watch_endpoint(self, endpoint):
+        """Troca o callback de volume/mudo para o endpoint recém-adquirido"""
+        from pycaw.callbacks import AudioEndpointVolumeCallback
+
+        backend = self
+
+        class VolumeWatcher(AudioEndpointVolumeCallback):
+            def on_notify(self, new_volume, new_mute, event_context, channels, channel_volumes):
+                backend._notify(new_volume * 100, bool(new_mute))
+
+        self._unwatch_endpoint()
+        try:
+            watcher = VolumeWatcher()
+            endpoint.RegisterControlChangeNotify(watcher)
+            self._watched = (endpoint, watcher)
+        except Exception as e:
+            logger.warning(f"Não foi possível monitorar mudanças de volume: {e}")
+
+    def _unwatch_endpoint(self):
+        if self._watched is not None:
+            endpoint, watcher = self._watched
+            self._watched = None
+            try:
+                endpoint.UnregisterControlChangeNotify(watcher)
+            except Exception:
+                pass
+
+    def _submit(self, func, *args):
+        """Agenda func na thread COM sem esperar (usado pelos callbacks)"""
+        try:
+            self._executor.submit(func, *args)
+        except RuntimeError:
+            # Backend já encerrado
+            pass
+
+    def _process_name(self, pid):
+        name = self._process_names.get(pid)
+        if name is None:
+            if pid == 0:
+                name = "System Sounds"
+            else:
+                # psutil é dependência do pycaw
+                import psutil
+                try:
+                    name = psutil.Process(pid).name()
+                except psutil.Error:
+                    name = f"pid {pid}"
+            self._process_names[pid] = name
+        return name
+
+    def _session_info(self, pid, volume):
+        return {
+            "pid": pid,
+            "name": self._process_name(pid),
+            "volume": volume.GetMasterVolume() * 100,
+            "muted": bool(volume.GetMute()),
+        }
+
+    def _watch_sessions(self):
+        """Enumera as sessões do dispositivo padrão e registra os avisos de sessão"""
+        from comtypes import CLSCTX_ALL
+        from pycaw.callbacks import AudioSessionNotification, AudioSessionEvents
+        from pycaw.pycaw import AudioUtilities, IAudioSessionManager2, IAudioSessionControl2
+
+        backend = self
+
+        class SessionEvents(AudioSessionEvents):
+            def __init__(self, pid, control):
+                super().__init__()
+                self.pid = pid
+                self.control = control
+
+            def on_simple_volume_changed(self, new_volume, new_mute, event_context):
+                backend._notify_session("changed", {
+                    "pid": self.pid,
+                    "name": backend._process_name(self.pid),
+                    "volume": new_volume * 100,
+                    "muted": bool(new_mute),
+                })
+
+            def on_state_changed(self, new_state, new_state_id):
+                if new_state_id == AUDIO_SESSION_EXPIRED:
+                    backend._submit(backend._remove_session, self.pid, self.control)
+
+            def on_session_disconnected(self, disconnect_reason, disconnect_reason_id):
+                backend._submit(backend._remove_session, self.pid, self.control)
+
+        class SessionWatcher(AudioSessionNotification):
+            def on_session_created(self, new_session):
+                # Chega em uma thread do sistema; o índice é atualizado na thread COM
+                try:
+                    control = new_session.QueryInterface(IAudioSessionControl2)
+                except Exception:
+                    return
+                backend._submit(backend._add_session, control, True)
+
+        self._session_events = SessionEvents
+        devices = AudioUtilities.GetSpeakers()
+        interface = devices.Activate(IAudioSessionManager2._iid_, CLSCTX_ALL, None)
+        manager = interface.QueryInterface(IAudioSessionManager2)
+        # Enumerar uma vez também habilita os avisos de sessão nova
+        enumerator = manager.GetSessionEnumerator()
+        sessions = []
+        for index in range(enumerator.GetCount()):
+            control = enumerator.GetSession(index).QueryInterface(IAudioSessionControl2)
+            if control.GetState() != AUDIO_SESSION_EXPIRED:
+                sessions.append(self._add_session(control))
+        watcher = SessionWatcher()
+        manager.RegisterSessionNotification(watcher)
+        self._session_manager = (manager, watcher)
+        return sessions
+
+    def _add_session(self, control, notify=False):
+        from pycaw.pycaw import ISimpleAudioVolume
+
+        pid = control.GetProcessId()
+        volume = control.QueryInterface(ISimpleAudioVolume)
+        events = self._session_events(pid, control)
+        control.RegisterAudioSessionNotification(events)
+        self._sessions.setdefault(pid, []).append((control, volume, events))
+        info = self._session_info(pid, volume)
+        if notify:
+            self._notify_session("created", info)
+        return info
+
+    def _remove_session(self, pid, control):
+        entries = self._sessions.get(pid, [])
+        for entry in entries:
+            if entry[0] is control:
+                try:
+                    control.UnregisterAudioSessionNotification(entry[2])
+                except Exception:
+                    pass
+        remaining = [entry for entry in entries if entry[0] is not control]
+        if remaining:
+            self._sessions[pid] = remaining
+            return
+        if self._sessions.pop(pid, None) is not None:
+            self._notify_session("expired", {"pid": pid, "name": self._process_names.pop(pid, f"pid {pid}")})
+
+    def _release_sessions(self):
+        for entries in self._sessions.values():
+            for control, _, events in entries:
+                try:
+                    control.UnregisterAudioSessionNotification(events)
+                except Exception:
+                    pass
+        self._sessions = {}
+        if self._session_manager is not None:
+            manager, watcher = self._session_manager
+            self._session_manager = None
+            try:
+                manager.UnregisterSessionNotification(watcher)
+            except Exception:
+                pass
+
+    def _run(self, func):
+        """Executa func(endpoint) na thread COM, readquirindo a interface uma vez após erro de COM"""
+        if not self._started:
+            # Só roda na thread COM, então não precisa de lock
+            self._started = True
+            self._watch_default_device()
+        endpoint = self._endpoint
+        if endpoint is not None:
+            try:
+                return func(endpoint)
+            except endpoint_errors() as e:
+                # Só erros de COM/dispositivo: outros (ex.: sessão não encontrada) não repetem func
+                logger.info(f"Interface de áudio inválida, readquirindo: {e}")
+        self._endpoint = endpoint = self._acquire()
+        return func(endpoint)
+
+    def call(self, func):
+        """Agenda func(endpoint) na thread COM e aguarda o resultado"""
+        future = self._executor.submit(self._run, func)
+        try:
+            return future.result(timeout=self.timeout)
+        except Exception as e:
+            raise AudioBackendError(str(e)) from e
+
+    def set_volume(self, level):
+        self.call(lambda endpoint: endpoint.SetMasterVolumeLevelScalar(level / 100, None))
+
+    def get_volume(self):
+        return self.call(lambda endpoint: endpoint.GetMasterVolumeLevelScalar() * 100)
+
+    def set_mute(self, muted):
+        self.call(lambda endpoint: endpoint.SetMute(muted, None))
+
+    def get_mute(self):
+        return self.call(lambda endpoint: bool(endpoint.GetMute()))
+
+    def get_state(self):
+        # Uma única ida à thread COM para os dois valores
+        return self.call(lambda endpoint: {
+            "volume": endpoint.GetMasterVolumeLevelScalar() * 100,
+            "muted": bool(endpoint.GetMute()),
+        })
+
+    def apply_change(self, change):
+        # Leitura e escritas em uma única ida à thread COM
+        def apply(endpoint):
+            current = endpoint.GetMasterVolumeLevelScalar() * 100
+            current_muted = bool(endpoint.GetMute())
+            volume, muted = change.apply_to(current, current_muted)
+            changed = False
+            if abs(volume - current) >= VOLUME_EPSILON:
+                endpoint.SetMasterVolumeLevelScalar(volume / 100, None)
+                changed = True
+            else:
+                volume = current
+            if muted != current_muted:
+                endpoint.SetMute(muted, None)
+                changed = True
+            return {"volume": volume, "muted": muted}, changed
+
+        return self.call(apply)
+
+    def get_sessions(self):
+        # Reenumera do zero: só é chamado na carga (ou recarga) do índice
+        def enumerate_sessions(endpoint):
+            self._release_sessions()
+            return self._watch_sessions()
+
+        return self.call(enumerate_sessions)
+
+    def _session_call(self, pid, func):
+        def run(endpoint):
+            entries = self._sessions.get(pid)
+            if not entries:
+                raise KeyError(f"Sessão {pid} não encontrada")
+            for _, volume, _ in entries:
+                func(volume)
+
+        self.call(run)
+
+    def set_session_volume(self, pid, level):
+        self._session_call(pid, lambda volume: volume.SetMasterVolume(level / 100, None))
+
+    def set_session_mute(self, pid, muted):
+        self._session_call(pid, lambda volume: volume.SetMute(muted, None))
+
+    def apply_session_change(self, pid, change):
+        # Leitura e escritas em uma única ida à thread COM, como em apply_change
+        def apply(endpoint):
+            entries = self._sessions.get(pid)
+            if not entries:
+                raise KeyError(f"Sessão {pid} não encontrada")
+            first = entries[0][1]
+            current = first.GetMasterVolume() * 100
+            current_muted = bool(first.GetMute())
+            volume, muted = change.apply_to(current, current_muted)
+            changed = False
+            if abs(volume - current) >= VOLUME_EPSILON:
+                for _, control, _ in entries:
+                    control.SetMasterVolume(volume / 100, None)
+                changed = True
+            else:
+                volume = current
+            if muted != current_muted:
+                for _, control, _ in entries:
+                    control.SetMute(muted, None)
+                changed = True
+            return {"volume": volume, "muted": muted}, changed
+
+        return self.call(apply)
+
+    def invalidate(self):
+        # A atribuição é atômica; a próxima chamada readquire a interface
+        self._endpoint = None
+        if self._started:
+            # As sessões pertencem ao dispositivo antigo
+            self._submit(self._release_sessions)
+        self._notify(None, None)
+        self._notify_session("reset", None)
+
+    def _release(self):
+        self._release_sessions()
+        self._unwatch_endpoint()
+        if self._notifier is not None:
+            try:
+                self._enumerator.UnregisterEndpointNotificationCallback(self._notifier)
+            except Exception:
+                pass
+        self._notifier = None
+        self._enumerator = None
+        self._endpoint = None
+        from comtypes import CoUninitialize
+        CoUninitialize()
+
+    def close(self):
+        if self._started:
+            self._executor.submit(self._release)
+        self._executor.shutdown(wait=True)
+
+
+AUDIO_BACKENDS = {
+    "pycaw": PycawAudioBackend,
+    "fake": FakeAudioBackend,
+}
+
+
+def create_audio_backend(name=None):
+    """Cria o backend de áudio configurado (padrão: pycaw)"""
+    name = name or os.environ.get(AUDIO_BACKEND_ENV, "pycaw")
+    if name not in AUDIO_BACKENDS:
+        raise ValueError(f"Backend de áudio desconhecido: {name}")
+    logger.info(f"🔊 Backend de áudio: {name}")
+    return AUDIO_BACKENDS[name]()
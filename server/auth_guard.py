@@ -0,0 +1,120 @@
+import hmac
+import time
+import threading
+from collections import OrderedDict
+
+# Resultado de record_failure: o chamador decide como registrar
+LOG = "log"
+SUPPRESS = "suppress"
+BLOCK = "block"
+
+
+class _ClientState:
+    __slots__ = ("failures", "window_start", "blocked_until")
+
+    def __init__(self, now):
+        self.failures = 0
+        self.window_start = now
+        self.blocked_until = 0.0
+
+
+class AuthGuard:
+    """Filtro barato que fica na frente da autenticação.
+
+    Mantém por IP um contador de falhas, que é o único limite: requisições
+    autenticadas (arrastando o slider de volume, por exemplo) nunca recebem
+    429. IPs que erram o token ``max_failures`` vezes dentro de
+    ``failure_window`` segundos ficam bloqueados por ``block_seconds`` e são
+    recusados antes da verificação, sem log. Todo o trabalho é O(1) por
+    requisição e o número de IPs acompanhados é limitado (LRU).
+    Falhas repetidas de um mesmo IP/motivo são registradas só na primeira
+    vez; as demais viram um resumo, coletado por um timer a cada
+    ``summary_interval`` segundos com ``drain_summaries``.
+    """
+
+    def __init__(self, max_failures=10, failure_window=60.0, block_seconds=60.0, summary_interval=30.0,
+                 max_clients=4096):
+        self.max_failures = max_failures
+        self.failure_window = failure_window
+        self.block_seconds = block_seconds
+        self.summary_interval = summary_interval
+        self.max_clients = max_clients
+        self.counters = {
+            "allowed": 0,
+            "blocked_rejections": 0,
+            "failures": 0,
+            "blocks": 0,
+            "suppressed_logs": 0,
+        }
+        self._clients = OrderedDict()
+        self._suppressed = {}
+        self._lock = threading.Lock()
+
+    def _state(self, client, now):
+        state = self._clients.get(client)
+        if state is None:
+            state = self._clients[client] = _ClientState(now)
+            if len(self._clients) > self.max_clients:
+                self._clients.popitem(last=False)
+        else:
+            self._clients.move_to_end(client)
+        return state
+
+    def check(self, client):
+        """Retorna 0 se o IP está liberado ou os segundos restantes de bloqueio"""
+        now = time.monotonic()
+        with self._lock:
+            state = self._clients.get(client)
+            if state is not None and state.blocked_until > now:
+                self.counters["blocked_rejections"] += 1
+                return state.blocked_until - now
+            self.counters["allowed"] += 1
+            return 0
+
+    @staticmethod
+    def verify(presented, expected):
+        """Compara tokens em tempo constante"""
+        return hmac.compare_digest(presented.encode(), expected.encode())
+
+    def record_failure(self, client, reason):
+        """Registra uma falha de autenticação.
+
+        Retorna BLOCK se o IP acabou de ser bloqueado, LOG se a falha deve ser registrada ou SUPPRESS se ela
+        entra apenas no próximo resumo.
+        """
+        now = time.monotonic()
+        with self._lock:
+            self.counters["failures"] += 1
+            state = self._state(client, now)
+            if now - state.window_start > self.failure_window:
+                state.window_start = now
+                state.failures = 0
+            state.failures += 1
+
+            if state.failures >= self.max_failures:
+                state.blocked_until = now + self.block_seconds
+                state.failures = 0
+                self.counters["blocks"] += 1
+                return BLOCK
+
+            key = (client, reason)
+            if key in self._suppressed:
+                self._suppressed[key] += 1
+                self.counters["suppressed_logs"] += 1
+                return SUPPRESS
+            self._suppressed[key] = 0
+            return LOG
+
+    def drain_summaries(self):
+        """Retorna e zera [(ip, motivo, falhas suprimidas)] desde o último resumo"""
+        with self._lock:
+            summaries = [(client, reason, count) for (client, reason), count in self._suppressed.items() if count]
+            self._suppressed.clear()
+            return summaries
+
+    def stats(self):
+        """Contadores do filtro"""
+        now = time.monotonic()
+        with self._lock:
+            blocked = sum(1 for state in self._clients.values() if state.blocked_until > now)
+            return dict(self.counters, tracked_clients=len(self._clients), blocked_clients=blocked)
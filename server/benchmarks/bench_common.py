@@ -0,0 +1,104 @@
+"""Funções compartilhadas pelos benchmarks (carga HTTP e estatísticas)."""
+import os
+import sys
+import json
+import time
+import platform
+import threading
+import subprocess
+import http.client
+from collections import Counter
+
+SERVER_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if SERVER_DIR not in sys.path:
+    sys.path.insert(0, SERVER_DIR)
+
+
+def percentile(samples, fraction):
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def summarize(latencies, elapsed, statuses):
+    """Vazão e percentis (ms) de uma rodada"""
+    def ms(value):
+        return round(value * 1000, 3) if value is not None else None
+
+    return {
+        "requests": len(latencies),
+        "req_per_s": round(len(latencies) / elapsed, 1) if elapsed else None,
+        "p50_ms": ms(percentile(latencies, 0.50)),
+        "p95_ms": ms(percentile(latencies, 0.95)),
+        "p99_ms": ms(percentile(latencies, 0.99)),
+        "statuses": {str(status): count for status, count in sorted(statuses.items(), key=str)},
+    }
+
+
+def _client(host, port, count, make_request, latencies, statuses, lock):
+    conn = http.client.HTTPConnection(host, port, timeout=10)
+    local_latencies, local_statuses = [], Counter()
+    for i in range(count):
+        method, path, body, headers = make_request(i)
+        start = time.perf_counter()
+        try:
+            conn.request(method, path, body=body, headers=headers)
+            response = conn.getresponse()
+            response.read()
+            local_latencies.append(time.perf_counter() - start)
+            local_statuses[response.status] += 1
+            if response.getheader("Connection", "").lower() == "close":
+                conn.close()
+                conn = http.client.HTTPConnection(host, port, timeout=10)
+        except (OSError, http.client.HTTPException) as e:
+            local_statuses[type(e).__name__] += 1
+            conn.close()
+            conn = http.client.HTTPConnection(host, port, timeout=10)
+    conn.close()
+    with lock:
+        latencies.extend(local_latencies)
+        statuses.update(local_statuses)
+
+
+def run_load(port, clients, requests_per_client, make_request, host="127.0.0.1"):
+    """Dispara requisições com N clientes keep-alive concorrentes.
+
+    ``make_request(i)`` retorna (método, caminho, corpo, headers).
+    """
+    latencies, statuses, lock = [], Counter(), threading.Lock()
+    threads = [
+        threading.Thread(target=_client, args=(host, port, requests_per_client, make_request,
+                                               latencies, statuses, lock))
+        for _ in range(clients)
+    ]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return summarize(latencies, time.perf_counter() - start, statuses)
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=SERVER_DIR,
+                                       stderr=subprocess.DEVNULL, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def write_results(path, benchmark, results, **meta):
+    """Grava os resultados em JSON com metadados para comparar commits"""
+    document = {
+        "benchmark": benchmark,
+        "commit": git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        **meta,
+        "results": results,
+    }
+    with open(path, "w") as f:
+        json.dump(document, f, indent=2)
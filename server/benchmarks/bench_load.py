@@ -0,0 +1,130 @@
+"""Benchmark de carga/latência dos apps reais com backends de SO falsos.
+
+Sobe o app Flask do ServerCore (o mesmo de server.py e server_gui.py)
+com teclado e áudio em memória (roda em qualquer sistema) e mede /ping,
+/command/<action>, /volume e requisições com token inválido em cada
+nível de concorrência. Os resultados (req/s e p50/p95/p99) vão para um
+JSON com o commit atual, para comparar regressões entre commits.
+
+Uso:
+    python benchmarks/bench_load.py --concurrency 1 8 32 --requests 200 --output load.json
+"""
+import os
+import sys
+import json
+import argparse
+import tempfile
+import threading
+
+from bench_common import run_load, write_results
+from log_pipeline import setup_logging
+
+SCENARIOS = ("ping", "command", "volume", "auth_fail")
+
+
+def prepare_environment(args):
+    """Backends falsos e diretório temporário para o server_token.txt"""
+    os.environ["AUDIOREMOTE_AUDIO_BACKEND"] = "fake"
+    os.environ["AUDIOREMOTE_KEYBOARD_BACKEND"] = "fake"
+    # A espera do playpause por um segundo toque entraria na latência de injeção medida
+    os.environ["AUDIOREMOTE_PLAYPAUSE_WINDOW_MS"] = "0"
+    # server_token.txt é criado no diretório atual
+    os.chdir(tempfile.mkdtemp(prefix="audioremote-bench-"))
+
+
+def configure_fakes(audio, keyboard, args):
+    audio.latency = args.audio_latency_ms / 1000
+    keyboard.latency = args.key_latency_ms / 1000
+
+
+def boot_core(args):
+    """ServerCore compartilhado por server.py e server_gui.py, sem a janela do Tk"""
+    from core import ServerCore
+    core = ServerCore()
+    configure_fakes(core.audio, core.keyboard, args)
+    return core
+
+
+TARGETS = {
+    "server": boot_core,
+}
+
+
+def request_factory(scenario, token):
+    auth = {"Authorization": f"Bearer {token}"}
+
+    if scenario == "ping":
+        return lambda i: ("GET", "/ping", None, {})
+    if scenario == "command":
+        return lambda i: ("POST", "/command/next", None, auth)
+    if scenario == "volume":
+        headers = dict(auth, **{"Content-Type": "application/json"})
+        return lambda i: ("POST", "/volume", json.dumps({"level": i % 101}), headers)
+    if scenario == "auth_fail":
+        return lambda i: ("POST", "/command/next", None, {"Authorization": "Bearer invalid"})
+    raise ValueError(scenario)
+
+
+def bench_target(name, args):
+    from serving import create_http_server
+
+    try:
+        core = TARGETS[name](args)
+    except ImportError as e:
+        return [{"target": name, "skipped": f"dependência ausente: {e}"}]
+    token = core.token
+
+    http_server = create_http_server(core.app, "127.0.0.1", 0, mode=args.mode, workers=args.workers)
+    threading.Thread(target=http_server.serve_forever, daemon=True).start()
+
+    results = []
+    try:
+        for scenario in args.scenarios:
+            for clients in args.concurrency:
+                result = run_load(http_server.port, clients, args.requests,
+                                  request_factory(scenario, token))
+                results.append(dict(target=name, scenario=scenario, clients=clients, **result))
+                print(f"{name:>7} {scenario:>10} c={clients:<3} {result['req_per_s']:>8} req/s  "
+                      f"p50 {result['p50_ms']:>7} ms  p95 {result['p95_ms']:>7} ms  "
+                      f"p99 {result['p99_ms']:>7} ms  {result['statuses']}")
+    finally:
+        http_server.shutdown()
+        http_server.server_close()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--targets", nargs="+", choices=list(TARGETS), default=list(TARGETS))
+    parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=list(SCENARIOS))
+    parser.add_argument("--concurrency", nargs="+", type=int, default=[1, 8, 32])
+    parser.add_argument("--requests", type=int, default=200, help="requisições por cliente")
+    parser.add_argument("--mode", default="threaded", help="modo do servidor HTTP")
+    parser.add_argument("--workers", type=int, default=32)
+    parser.add_argument("--audio-latency-ms", type=float, default=0.0,
+                        help="latência simulada do endpoint de áudio falso")
+    parser.add_argument("--key-latency-ms", type=float, default=0.0,
+                        help="latência simulada da injeção de teclas falsa")
+    parser.add_argument("--log-level", default="WARNING")
+    parser.add_argument("--output", help="arquivo JSON com os resultados")
+    args = parser.parse_args()
+
+    output = os.path.abspath(args.output) if args.output else None
+    prepare_environment(args)
+    setup_logging(args.log_level)
+
+    results = []
+    for target in args.targets:
+        results.extend(bench_target(target, args))
+
+    for result in results:
+        if "skipped" in result:
+            print(f"{result['target']:>7}: ignorado ({result['skipped']})", file=sys.stderr)
+
+    if output:
+        write_results(output, "load", results, mode=args.mode, workers=args.workers,
+                      audio_latency_ms=args.audio_latency_ms, key_latency_ms=args.key_latency_ms)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,156 @@
+"""Benchmark do processo auxiliar: latência HTTP com a interface ocupada.
+
+Sobe o ServerCore com teclado e áudio falsos que gastam CPU segurando o
+GIL a cada operação (como o comtypes/pynput) nos dois modos de
+AUDIOREMOTE_OS_WORKER: "inline" (backends no processo do servidor) e
+"process" (processo auxiliar). Em cada modo mede POST /volume (que espera
+a escrita) e a latência de injeção dos /command com a interface ociosa e
+com uma thread simulando o Tk ocupado (rajadas de trabalho Python, como o
+log de atividades recebendo muitas linhas).
+
+Uso:
+    python benchmarks/bench_os_worker.py --requests 200 --output os_worker.json
+"""
+import os
+import sys
+import json
+import time
+import logging
+import argparse
+import threading
+from contextlib import nullcontext
+
+from bench_common import run_load, write_results
+from bench_load import prepare_environment
+from log_pipeline import setup_logging
+
+MODES = ("inline", "process")
+
+
+class BusyGui:
+    """Thread que segura o GIL em rajadas, como o mainloop do Tk desenhando o log"""
+
+    def __init__(self, busy_ms, idle_ms):
+        self.busy = busy_ms / 1000
+        self.idle = idle_ms / 1000
+        self.bursts = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="busy-gui", daemon=True)
+
+    def _run(self):
+        lines = []
+        while not self._stop.is_set():
+            end = time.perf_counter() + self.busy
+            while time.perf_counter() < end:
+                lines.append(f"[{time.time():.3f}] 🔊 Volume ajustado para {len(lines) % 101}%")
+                if len(lines) > 500:
+                    del lines[:250]
+            self.bursts += 1
+            self._stop.wait(self.idle)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+
+def boot(mode, args):
+    from core import ServerCore
+    from os_worker import OSWorker
+
+    audio_busy = args.audio_cpu_ms / 1000
+    key_busy = args.key_cpu_ms / 1000
+    if mode == "process":
+        worker = OSWorker(audio="fake", keyboard="fake", audio_options={"busy": audio_busy},
+                          keyboard_options={"busy": key_busy}, transport=args.transport)
+        core = ServerCore(os_worker=worker)
+        worker.metrics = core.metrics
+    else:
+        core = ServerCore()
+        core.audio.busy = audio_busy
+        core.keyboard.busy = key_busy
+    # Sobe o processo auxiliar e carrega os backends antes de medir
+    core.warm_up()
+    return core
+
+
+def measure(mode, load, args):
+    from serving import create_http_server
+
+    core = boot(mode, args)
+    http_server = create_http_server(core.app, "127.0.0.1", 0, workers=args.clients * 2)
+    threading.Thread(target=http_server.serve_forever, daemon=True).start()
+    auth = {"Authorization": f"Bearer {core.token}"}
+    volume_headers = dict(auth, **{"Content-Type": "application/json"})
+
+    results = []
+    try:
+        with BusyGui(args.gui_busy_ms, args.gui_idle_ms) if load == "gui_busy" else nullcontext():
+            volume = run_load(http_server.port, args.clients, args.requests,
+                              lambda i: ("POST", "/volume", json.dumps({"level": i % 101}), volume_headers))
+            results.append(dict(mode=mode, load=load, scenario="volume", **volume))
+            command = run_load(http_server.port, args.clients, args.requests,
+                               lambda i: ("POST", "/command/playpause", None, auth))
+            # Espera a fila de teclas esvaziar antes de ler a latência de injeção
+            deadline = time.monotonic() + 10
+            while core.input_dispatcher.stats()["queued"] and time.monotonic() < deadline:
+                time.sleep(0.01)
+        dispatch = core.metrics.summary()["stages"].get("input_dispatch", {})
+        results.append(dict(mode=mode, load=load, scenario="command", **command,
+                            dispatch_p50_ms=dispatch.get("p50_ms"), dispatch_p99_ms=dispatch.get("p99_ms")))
+        results[-1]["os_worker"] = core.os_worker.stats() if core.os_worker else None
+    finally:
+        http_server.shutdown()
+        http_server.server_close()
+        core.close()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--modes", nargs="+", choices=MODES, default=list(MODES))
+    parser.add_argument("--requests", type=int, default=200, help="requisições por cliente")
+    parser.add_argument("--clients", type=int, default=4)
+    parser.add_argument("--audio-cpu-ms", type=float, default=2.0,
+                        help="CPU (com o GIL) gasta pelo áudio falso a cada escrita")
+    parser.add_argument("--key-cpu-ms", type=float, default=1.0,
+                        help="CPU (com o GIL) gasta pelo teclado falso a cada tecla")
+    parser.add_argument("--gui-busy-ms", type=float, default=20.0, help="duração de cada rajada da interface")
+    parser.add_argument("--gui-idle-ms", type=float, default=5.0, help="pausa entre as rajadas")
+    parser.add_argument("--transport", choices=("shm", "pipe"), default="shm")
+    parser.add_argument("--output", help="arquivo JSON com os resultados")
+    args = parser.parse_args()
+
+    output = os.path.abspath(args.output) if args.output else None
+    prepare_environment(args)
+    # Sem intervalo mínimo entre escritas: cada /volume chega ao backend
+    os.environ["AUDIOREMOTE_VOLUME_MIN_INTERVAL_MS"] = "0"
+    setup_logging(logging.WARNING)
+
+    results = []
+    for mode in args.modes:
+        for load in ("idle", "gui_busy"):
+            try:
+                rows = measure(mode, load, args)
+            except ImportError as e:
+                print(f"{mode}: ignorado (dependência ausente: {e})", file=sys.stderr)
+                break
+            for row in rows:
+                extra = ""
+                if row["scenario"] == "command":
+                    extra = f"  injeção p50 {row['dispatch_p50_ms']} ms p99 {row['dispatch_p99_ms']} ms"
+                print(f"{mode:>7} {load:>8} {row['scenario']:>7}  p50 {row['p50_ms']:>7} ms  "
+                      f"p95 {row['p95_ms']:>7} ms  p99 {row['p99_ms']:>7} ms  {row['statuses']}{extra}")
+            results.extend(rows)
+
+    if output:
+        write_results(output, "os_worker", results, clients=args.clients, audio_cpu_ms=args.audio_cpu_ms,
+                      key_cpu_ms=args.key_cpu_ms, gui_busy_ms=args.gui_busy_ms, gui_idle_ms=args.gui_idle_ms,
+                      transport=args.transport)
+
+
+if __name__ == "__main__":
+    main()
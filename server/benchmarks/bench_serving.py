@@ -0,0 +1,73 @@
+"""Compara os modos de servidor HTTP (vazão e latência p50/p99).
+
+Sobe um app Flask mínimo em cada modo disponível e dispara requisições
+GET /ping com N clientes concorrentes usando conexões keep-alive.
+
+Uso:
+    python benchmarks/bench_serving.py --clients 16 --requests 500 --output serving.json
+"""
+import logging
+import argparse
+import threading
+
+from bench_common import run_load, write_results
+
+from flask import Flask
+from serving import create_http_server, SERVER_MODES
+
+
+def create_app():
+    app = Flask(__name__)
+
+    @app.route("/ping")
+    def ping():
+        return "pong", 200
+
+    return app
+
+
+def bench_mode(mode, clients, requests_per_client, workers):
+    try:
+        server = create_http_server(create_app(), "127.0.0.1", 0, mode=mode, workers=workers)
+    except ImportError as e:
+        return {"mode": mode, "skipped": str(e)}
+
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+
+    result = run_load(server.port, clients, requests_per_client,
+                      lambda i: ("GET", "/ping", None, {}))
+
+    server.shutdown()
+    server.server_close()
+    return dict(mode=mode, clients=clients, **result)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--modes", nargs="+", default=list(SERVER_MODES))
+    parser.add_argument("--clients", type=int, default=16)
+    parser.add_argument("--requests", type=int, default=500, help="requisições por cliente")
+    parser.add_argument("--workers", type=int, default=16)
+    parser.add_argument("--output", help="arquivo JSON com os resultados")
+    args = parser.parse_args()
+
+    # Log de acesso do modo dev distorce a medição
+    logging.getLogger("werkzeug").setLevel(logging.ERROR)
+
+    results = [bench_mode(mode, args.clients, args.requests, args.workers) for mode in args.modes]
+
+    for result in results:
+        if "skipped" in result:
+            print(f"{result['mode']:>10}: ignorado ({result['skipped']})")
+        else:
+            print(f"{result['mode']:>10}: {result['req_per_s']:>8} req/s  "
+                  f"p50 {result['p50_ms']:>7} ms  p99 {result['p99_ms']:>7} ms  "
+                  f"status {result['statuses']}")
+
+    if args.output:
+        write_results(args.output, "serving", results, clients=args.clients, workers=args.workers)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+"""Benchmark de inicialização: tempo de import e tempo até a primeira requisição.
+
+Cada medição roda em um processo Python novo. O import mede core, server
+e server_gui e informa quais dependências pesadas (tkinter, PIL, pynput,
+comtypes, pycaw) foram carregadas. O tempo até a primeira requisição
+inicia ``server.py`` e ``server_gui.py --headless`` e conta do spawn até
+o primeiro ``/ping`` e o primeiro ``/command/next`` autenticado.
+
+Uso:
+    python benchmarks/bench_startup.py --runs 5 --output startup.json
+"""
+import os
+import sys
+import json
+import time
+import socket
+import argparse
+import statistics
+import subprocess
+import http.client
+import tempfile
+
+from bench_common import SERVER_DIR, write_results
+
+MODULES = ("core", "server", "server_gui")
+HEAVY_MODULES = ("tkinter", "PIL", "pynput", "comtypes", "pycaw")
+ENTRY_POINTS = {
+    "server": ["server.py"],
+    "gui_headless": ["server_gui.py", "--headless"],
+}
+
+IMPORT_PROBE = """
+import sys, time, json
+sys.path.insert(0, {server_dir!r})
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+print(json.dumps({{"seconds": elapsed, "loaded": [m for m in {heavy!r} if m in sys.modules]}}))
+"""
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def measure_import(module, env):
+    code = IMPORT_PROBE.format(server_dir=SERVER_DIR, module=module, heavy=HEAVY_MODULES)
+    output = subprocess.check_output([sys.executable, "-c", code], env=env, text=True,
+                                     stderr=subprocess.DEVNULL)
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def wait_for(port, method, path, headers, deadline):
+    """Repete a requisição até receber 2xx (ou estourar o prazo)"""
+    while time.perf_counter() < deadline:
+        try:
+            conn = http.client.HTTPConnection("127.0.0.1", port, timeout=1)
+            conn.request(method, path, headers=headers)
+            status = conn.getresponse().status
+            conn.close()
+            if 200 <= status < 300:
+                return time.perf_counter()
+        except OSError:
+            pass
+        time.sleep(0.005)
+    return None
+
+
+def measure_first_request(argv, env, timeout):
+    port = free_port()
+    workdir = tempfile.mkdtemp(prefix="audioremote-startup-")
+    env = dict(env, AUDIOREMOTE_PORT=str(port))
+    start = time.perf_counter()
+    process = subprocess.Popen([sys.executable] + [os.path.join(SERVER_DIR, argv[0])] + argv[1:],
+                               cwd=workdir, env=env,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        deadline = start + timeout
+        ping = wait_for(port, "GET", "/ping", {}, deadline)
+        if ping is None:
+            return None
+        with open(os.path.join(workdir, "server_token.txt")) as f:
+            token = f.read().strip()
+        command = wait_for(port, "POST", "/command/next", {"Authorization": f"Bearer {token}"}, deadline)
+        return {
+            "first_ping_ms": round((ping - start) * 1000, 1),
+            "first_command_ms": round((command - start) * 1000, 1) if command else None,
+        }
+    finally:
+        process.terminate()
+        try:
+            process.wait(timeout=5)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+
+def median(values):
+    values = [v for v in values if v is not None]
+    return round(statistics.median(values), 1) if values else None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5, help="processos por medição")
+    parser.add_argument("--real-backends", action="store_true",
+                        help="usa pynput/pycaw em vez dos backends falsos (só no Windows)")
+    parser.add_argument("--timeout", type=float, default=30.0)
+    parser.add_argument("--output", help="arquivo JSON com os resultados")
+    args = parser.parse_args()
+
+    env = dict(os.environ)
+    if not args.real_backends:
+        env.update(AUDIOREMOTE_AUDIO_BACKEND="fake", AUDIOREMOTE_KEYBOARD_BACKEND="fake")
+
+    results = []
+    for module in MODULES:
+        runs = [measure_import(module, env) for _ in range(args.runs)]
+        result = {
+            "measure": "import",
+            "target": module,
+            "median_ms": median([run["seconds"] * 1000 for run in runs]),
+            "heavy_modules_loaded": runs[-1]["loaded"],
+        }
+        results.append(result)
+        print(f"import {module:>12}: {result['median_ms']:>7} ms  pesados: {result['heavy_modules_loaded'] or '-'}")
+
+    for name, argv in ENTRY_POINTS.items():
+        runs = [measure_first_request(argv, env, args.timeout) for _ in range(args.runs)]
+        ok = [run for run in runs if run]
+        result = {
+            "measure": "first_request",
+            "target": name,
+            "runs": len(ok),
+            "first_ping_ms": median([run["first_ping_ms"] for run in ok]),
+            "first_command_ms": median([run["first_command_ms"] for run in ok]),
+        }
+        results.append(result)
+        print(f"start  {name:>12}: /ping {result['first_ping_ms']} ms  "
+              f"/command {result['first_command_ms']} ms  ({len(ok)}/{args.runs} ok)")
+
+    if args.output:
+        write_results(args.output, "startup", results, runs=args.runs, real_backends=args.real_backends)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,149 @@
+"""Benchmark de reconexão HTTPS: handshake completo vs sessão retomada.
+
+Sobe o ServerCore com TLS (certificado autoassinado em um diretório
+temporário) e backends falsos e mede, em série, o tempo de conectar e
+receber o ``/ping`` em quatro caminhos: HTTP com conexão nova, HTTPS com
+handshake completo, HTTPS retomando a sessão anterior (caso do celular
+que acorda e reconecta) e HTTPS keep-alive. Também mostra a duração
+média dos handshakes completos e retomados medida pelo servidor.
+
+Uso:
+    python benchmarks/bench_tls.py --requests 500 --output tls.json
+"""
+import os
+import sys
+import ssl
+import time
+import socket
+import logging
+import argparse
+import threading
+import http.client
+from collections import Counter
+
+from bench_common import summarize, write_results
+from bench_load import prepare_environment, boot_core
+from log_pipeline import setup_logging
+
+REQUEST = b"GET /ping HTTP/1.1\r\nHost: 127.0.0.1\r\nConnection: close\r\n\r\n"
+
+
+def fetch(port, context=None, session=None):
+    """Uma conexão nova com um GET /ping; retorna (status, sessão, se foi retomada)"""
+    sock = socket.create_connection(("127.0.0.1", port), timeout=10)
+    # Como o app: sem Nagle, o Finished do TLS 1.2 retomado não espera ACK
+    sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    if context is not None:
+        sock = context.wrap_socket(sock, server_hostname="127.0.0.1", session=session)
+    try:
+        sock.sendall(REQUEST)
+        data = b""
+        while True:
+            chunk = sock.recv(4096)
+            if not chunk:
+                break
+            data += chunk
+        status = int(data.split(b" ", 2)[1]) if data else "empty"
+        if context is None:
+            return status, None, False
+        return status, sock.session, sock.session_reused
+    finally:
+        sock.close()
+
+
+def bench_connections(port, count, context=None, resume=False):
+    latencies, statuses = [], Counter()
+    session = None
+    start = time.perf_counter()
+    for _ in range(count):
+        sent = time.perf_counter()
+        try:
+            status, new_session, reused = fetch(port, context, session if resume else None)
+        except (OSError, ssl.SSLError) as e:
+            statuses[type(e).__name__] += 1
+            continue
+        latencies.append(time.perf_counter() - sent)
+        statuses[status] += 1
+        if resume:
+            statuses["resumed" if reused else "full"] += 1
+            session = new_session
+    return summarize(latencies, time.perf_counter() - start, statuses)
+
+
+def bench_keepalive(port, count, context):
+    latencies, statuses = [], Counter()
+    conn = http.client.HTTPSConnection("127.0.0.1", port, timeout=10, context=context)
+    start = time.perf_counter()
+    for _ in range(count):
+        sent = time.perf_counter()
+        conn.request("GET", "/ping")
+        response = conn.getresponse()
+        response.read()
+        latencies.append(time.perf_counter() - sent)
+        statuses[response.status] += 1
+    conn.close()
+    return summarize(latencies, time.perf_counter() - start, statuses)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=500, help="conexões por caminho")
+    parser.add_argument("--max-tls", choices=("1.2", "1.3"), default="1.3",
+                        help="versão máxima de TLS do cliente")
+    parser.add_argument("--output", help="arquivo JSON com os resultados")
+    args = parser.parse_args()
+    args.audio_latency_ms = args.key_latency_ms = 0.0
+
+    output = os.path.abspath(args.output) if args.output else None
+    prepare_environment(args)
+
+    setup_logging(logging.WARNING)
+    try:
+        core = boot_core(args)
+    except ImportError as e:
+        print(f"ignorado (dependência ausente: {e})", file=sys.stderr)
+        return
+    core.tls = True
+
+    from serving import create_http_server
+
+    https_server = create_http_server(core.app, "127.0.0.1", 0, ssl_context=core.ssl_context)
+    http_server = create_http_server(core.app, "127.0.0.1", 0)
+    for server in (https_server, http_server):
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    # O app fixa o certificado; aqui basta confiar no próprio arquivo
+    context = ssl.create_default_context(cafile=core.certificate[0])
+    context.check_hostname = False
+    context.maximum_version = ssl.TLSVersion.TLSv1_2 if args.max_tls == "1.2" else ssl.TLSVersion.TLSv1_3
+    print(f"certificado SHA-256 {core.tls_fingerprint}")
+
+    paths = {
+        "http_new_connection": lambda: bench_connections(http_server.port, args.requests),
+        "tls_full_handshake": lambda: bench_connections(https_server.port, args.requests, context),
+        "tls_resumed": lambda: bench_connections(https_server.port, args.requests, context, resume=True),
+        "tls_keepalive": lambda: bench_keepalive(https_server.port, args.requests, context),
+    }
+    results = []
+    try:
+        for name, run in paths.items():
+            result = run()
+            results.append(dict(path=name, **result))
+            print(f"{name:>20} p50 {result['p50_ms']:>7} ms  p95 {result['p95_ms']:>7} ms  "
+                  f"p99 {result['p99_ms']:>7} ms  {result['statuses']}")
+        server_stats = https_server.stats()
+        print(f"{'servidor':>20} handshake completo {server_stats['tls_full_avg_ms']} ms "
+              f"({server_stats['tls_full_handshakes']}), retomado {server_stats['tls_resumed_avg_ms']} ms "
+              f"({server_stats['tls_resumed_handshakes']})")
+    finally:
+        for server in (https_server, http_server):
+            server.shutdown()
+            server.server_close()
+        core.close()
+
+    if output:
+        write_results(output, "tls", results, max_tls=args.max_tls, server=server_stats)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""Benchmark de latência ida-e-volta: comando via UDP vs POST /command.
+
+Sobe o ServerCore com backends falsos, o listener UDP em uma porta
+livre e mede, em série, o tempo entre enviar um comando e receber a
+resposta em três caminhos: datagrama UDP com ack, HTTP keep-alive e HTTP
+com uma conexão nova por comando (caso típico do app mobile).
+
+Uso:
+    python benchmarks/bench_udp.py --requests 2000 --output udp.json
+"""
+import os
+import sys
+import time
+import socket
+import logging
+import argparse
+import threading
+import http.client
+from collections import Counter
+
+from bench_common import summarize, write_results
+from bench_load import prepare_environment, boot_core
+from log_pipeline import setup_logging
+
+
+def bench_udp(port, token, count):
+    from udp_control import build_request, parse_ack, STATUS_OK
+
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sock.settimeout(1.0)
+    client_id = int.from_bytes(os.urandom(4), "big")
+    latencies, statuses = [], Counter()
+    start = time.perf_counter()
+    for seq in range(1, count + 1):
+        sent = time.perf_counter()
+        sock.sendto(build_request(token, "next", client_id, seq), ("127.0.0.1", port))
+        try:
+            ack = parse_ack(token, sock.recv(64))
+        except socket.timeout:
+            statuses["timeout"] += 1
+            continue
+        latencies.append(time.perf_counter() - sent)
+        statuses["ok" if ack and ack[0] == STATUS_OK else "error"] += 1
+    sock.close()
+    return summarize(latencies, time.perf_counter() - start, statuses)
+
+
+def bench_http(port, token, count, keep_alive):
+    headers = {"Authorization": f"Bearer {token}"}
+    latencies, statuses = [], Counter()
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=10)
+    start = time.perf_counter()
+    for _ in range(count):
+        sent = time.perf_counter()
+        conn.request("POST", "/command/next", headers=headers)
+        response = conn.getresponse()
+        response.read()
+        latencies.append(time.perf_counter() - sent)
+        statuses[response.status] += 1
+        if not keep_alive:
+            conn.close()
+            conn = http.client.HTTPConnection("127.0.0.1", port, timeout=10)
+    conn.close()
+    return summarize(latencies, time.perf_counter() - start, statuses)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=2000, help="comandos por caminho")
+    parser.add_argument("--key-latency-ms", type=float, default=0.0,
+                        help="latência simulada da injeção de teclas falsa")
+    parser.add_argument("--output", help="arquivo JSON com os resultados")
+    args = parser.parse_args()
+    args.audio_latency_ms = 0.0
+
+    output = os.path.abspath(args.output) if args.output else None
+    prepare_environment(args)
+
+    setup_logging(logging.WARNING)
+    try:
+        core = boot_core(args)
+    except ImportError as e:
+        print(f"ignorado (dependência ausente: {e})", file=sys.stderr)
+        return
+    token = core.token
+
+    from serving import create_http_server
+    from udp_control import UDPControlServer
+
+    http_server = create_http_server(core.app, "127.0.0.1", 0)
+    udp_server = UDPControlServer(core.controller, lambda: token, host="127.0.0.1", port=0)
+    threading.Thread(target=http_server.serve_forever, daemon=True).start()
+    threading.Thread(target=udp_server.serve_forever, daemon=True).start()
+
+    paths = {
+        "udp": lambda: bench_udp(udp_server.port, token, args.requests),
+        "http_keepalive": lambda: bench_http(http_server.port, token, args.requests, True),
+        "http_new_connection": lambda: bench_http(http_server.port, token, args.requests, False),
+    }
+    results = []
+    try:
+        for name, run in paths.items():
+            result = run()
+            results.append(dict(path=name, **result))
+            print(f"{name:>20} p50 {result['p50_ms']:>7} ms  p95 {result['p95_ms']:>7} ms  "
+                  f"p99 {result['p99_ms']:>7} ms  {result['statuses']}")
+    finally:
+        udp_server.shutdown()
+        http_server.shutdown()
+        http_server.server_close()
+
+    if output:
+        write_results(output, "udp", results, key_latency_ms=args.key_latency_ms)
+
+
+if __name__ == "__main__":
+    main()
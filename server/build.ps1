@@ -21,6 +21,14 @@ pyinstaller --onefile `
     --hidden-import=comtypes `
     --hidden-import=pynput `
     --hidden-import=PIL `
+    --hidden-import=PIL.ImageTk `
+    --hidden-import=pycaw.callbacks `
+    --hidden-import=tls `
+    --hidden-import=os_worker `
+    --hidden-import=log_pipeline `
+    --hidden-import=multiprocessing.shared_memory `
+    --hidden-import=waitress.server `
+    --collect-submodules=cryptography `
     server_gui.py
 
 Write-Host ""
@@ -0,0 +1,562 @@
+import os
+import math
+import time
+import secrets
+import logging
+import socket
+import threading
+from functools import wraps, cached_property
+from flask import Flask, Response, request, jsonify, g
+from flask_cors import CORS
+from audio_backend import create_audio_backend, AudioBackendError
+from keyboard_backend import create_keyboard_backend
+from os_worker import DEFAULT_OS_WORKER, OSWorker, RemoteAudioBackend, RemoteKeyboardBackend
+from volume_scheduler import VolumeScheduler
+from state_stream import AudioStateCache
+from session_index import SessionIndex
+from ramp_engine import RampEngine
+from idempotency import IdempotencyCache
+from fair_gate import FairGate
+from tls import DEFAULT_TLS, ensure_certificate, fingerprint, create_server_context
+from media_controller import MediaController, ControlError
+from input_dispatcher import InputDispatcher
+from ws_channel import TicketBook, register_control_socket
+from serving import create_http_server
+from udp_control import DEFAULT_UDP_SHARED_TOKEN, start_udp_server
+from discovery import start_discovery, list_interfaces
+from auth_guard import AuthGuard, LOG, BLOCK
+from credentials import CredentialStore, credentials_path, SERVER_TOKEN_DEVICE
+from metrics import MetricsRegistry, instrument_app, stats_collector
+from tracing import Tracer, trace_app, span
+
+logger = logging.getLogger(__name__)
+
+TOKEN_FILE = 'server_token.txt'
+
+# Porta HTTP
+PORT_ENV = 'AUDIOREMOTE_PORT'
+DEFAULT_PORT = int(os.environ.get(PORT_ENV, 5000))
+
+# Falhas de autenticação: motivo -> (mensagem de log, erro retornado)
+AUTH_FAILURES = {
+    "missing": ("Requisição sem token", "Token de autenticação necessário"),
+    "format": ("Formato de token inválido", "Formato de token inválido"),
+    "invalid": ("Token inválido", "Token inválido"),
+}
+
+
+def load_or_create_token(path=TOKEN_FILE):
+    """Carrega token existente ou cria um novo"""
+    if os.path.exists(path):
+        with open(path, 'r') as f:
+            token = f.read().strip()
+            logger.info("🔑 Token carregado do arquivo")
+            return token
+    else:
+        token = secrets.token_urlsafe(32)
+        with open(path, 'w') as f:
+            f.write(token)
+        logger.info(f"🔑 Novo token gerado e salvo")
+        return token
+
+
+def get_local_ip():
+    """Obtém o IP local da máquina"""
+    try:
+        # Cria um socket UDP para descobrir o IP local
+        s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        # Não precisa realmente conectar, apenas precisa do binding
+        s.connect(('10.255.255.255', 1))
+        local_ip = s.getsockname()[0]
+        s.close()
+        return local_ip
+    except Exception:
+        # Fallback para localhost se não conseguir determinar
+        try:
+            hostname = socket.gethostname()
+            return socket.gethostbyname(hostname)
+        except:
+            return '127.0.0.1'
+
+
+class ServerCore:
+    """Backends, app Flask e servidores compartilhados por server.py e server_gui.py.
+
+    Nada de caro acontece na construção: o token e o IP são resolvidos no
+    primeiro uso e os backends de SO (pynput, pycaw/comtypes) só importam
+    suas dependências na primeira operação ou em ``warm_up()``.
+    """
+
+    def __init__(self, token_file=TOKEN_FILE, port=DEFAULT_PORT, tls=None, os_worker=None, udp_shared_token=None):
+        self.token_file = token_file
+        self.port = port
+        self.tls = DEFAULT_TLS if tls is None else tls
+        # False: o UDP só aceita dispositivos pareados (revogáveis)
+        self.udp_shared_token = DEFAULT_UDP_SHARED_TOKEN if udp_shared_token is None else udp_shared_token
+        self._token = None
+        self._token_lock = threading.Lock()
+        self.http_server = None
+        self.udp_server = None
+        self.discovery = None
+        self.auth_guard = AuthGuard()
+        # Tokens por dispositivo (server_devices.json); o token do arquivo vale como admin
+        self.credentials = CredentialStore(credentials_path(token_file))
+        self.idempotency = IdempotencyCache()
+        # Tickets de uso único para o handshake do /ws sem header Authorization
+        self.ws_tickets = TicketBook()
+        self.metrics = MetricsRegistry()
+        self.tracer = Tracer()
+        if os_worker is None and DEFAULT_OS_WORKER == "process":
+            os_worker = OSWorker(metrics=self.metrics)
+        # Com o processo auxiliar, pycaw/pynput rodam fora deste processo (e do GIL do Tk)
+        self.os_worker = os_worker
+        if os_worker is not None:
+            self.audio = RemoteAudioBackend(os_worker)
+            self.keyboard = RemoteKeyboardBackend(os_worker)
+        else:
+            self.audio = create_audio_backend()
+            self.keyboard = create_keyboard_backend()
+        self.input_dispatcher = InputDispatcher(self.keyboard, metrics=self.metrics)
+        self.volume_scheduler = VolumeScheduler(self.audio, metrics=self.metrics)
+        self.state_cache = AudioStateCache(self.audio)
+        self.sessions = SessionIndex(self.audio)
+        self.ramps = RampEngine(self.volume_scheduler, self.state_cache, self.input_dispatcher)
+        # Resumo das falhas de autenticação suprimidas, mesmo sem novas falhas
+        self.ramps.timers.call_later(self.auth_guard.summary_interval, self.flush_auth_summaries)
+        self.gate = FairGate(metrics=self.metrics)
+        self.controller = MediaController(self.input_dispatcher, self.volume_scheduler, metrics=self.metrics,
+                                          sessions=self.sessions, ramps=self.ramps, gate=self.gate)
+        self.metrics.add_collector(stats_collector("audioremote_input", self.input_dispatcher.stats))
+        self.metrics.add_collector(stats_collector("audioremote_admission", self.gate.stats))
+        self.metrics.add_collector(self.gate.collect)
+        self.metrics.add_collector(stats_collector("audioremote_volume", self.volume_scheduler.stats))
+        self.metrics.add_collector(stats_collector("audioremote_ramp", self.ramps.stats))
+        self.metrics.add_collector(stats_collector("audioremote_state", self.state_cache.stats))
+        self.metrics.add_collector(stats_collector("audioremote_sessions", self.sessions.stats))
+        self.metrics.add_collector(stats_collector("audioremote_auth", self.auth_guard.stats))
+        self.metrics.add_collector(stats_collector("audioremote_credentials", self.credentials.stats))
+        self.metrics.add_collector(stats_collector("audioremote_idempotency", self.idempotency.stats))
+        self.metrics.add_collector(stats_collector("audioremote_ws_tickets", self.ws_tickets.stats))
+        self.metrics.add_collector(stats_collector("audioremote_tracing", self.tracer.stats))
+        self.metrics.add_collector(stats_collector(
+            "audioremote_os_worker", lambda: self.os_worker.stats() if self.os_worker else None))
+        self.metrics.add_collector(stats_collector(
+            "audioremote_http", lambda: self.http_server.stats() if self.http_server else None))
+        self.metrics.add_collector(stats_collector(
+            "audioremote_udp", lambda: self.udp_server.stats() if self.udp_server else None))
+        self.metrics.add_collector(stats_collector(
+            "audioremote_discovery", lambda: self.discovery.stats() if self.discovery else None))
+        self.app = self.create_app()
+
+    @property
+    def token(self):
+        """Token da API (carregado ou criado no primeiro acesso)"""
+        if self._token is None:
+            with self._token_lock:
+                if self._token is None:
+                    self._token = load_or_create_token(self.token_file)
+        return self._token
+
+    def save_token(self, new_token):
+        """Salva e passa a usar um novo token"""
+        with self._token_lock:
+            with open(self.token_file, 'w') as f:
+                f.write(new_token)
+            self._token = new_token
+
+    @cached_property
+    def interfaces(self):
+        """Interfaces utilizáveis, da preferida para a menos provável"""
+        return list_interfaces(get_local_ip())
+
+    @cached_property
+    def local_ip(self):
+        return self.interfaces[0].ip if self.interfaces else get_local_ip()
+
+    @property
+    def addresses(self):
+        """Todos os IPs candidatos (atualizados pela descoberta quando ativa)"""
+        interfaces = self.discovery.interfaces if self.discovery else self.interfaces
+        return [interface.ip for interface in interfaces]
+
+    @property
+    def scheme(self):
+        return "https" if self.tls else "http"
+
+    @property
+    def url(self):
+        return f"{self.scheme}://{self.local_ip}:{self.port}"
+
+    @cached_property
+    def certificate(self):
+        """(cert, chave) autoassinados ao lado do token, gerados na primeira vez"""
+        return ensure_certificate(self.token_file, self.addresses)
+
+    @cached_property
+    def certificate_fingerprint(self):
+        """SHA-256 do certificado (gera o par na primeira vez)"""
+        return fingerprint(self.certificate[0])
+
+    @property
+    def tls_fingerprint(self):
+        """SHA-256 do certificado, para o app fixar (None sem TLS).
+
+        Segue o valor atual de ``tls``: a interface só decide o modo ao
+        iniciar, depois de /info e do payload de descoberta já terem sido lidos.
+        """
+        return self.certificate_fingerprint if self.tls else None
+
+    @cached_property
+    def ssl_context(self):
+        # Um único contexto: os tickets de sessão continuam valendo após parar/iniciar
+        return create_server_context(*self.certificate)
+
+    def stats(self):
+        """Contadores internos (GET /stats)"""
+        return {
+            "input": self.input_dispatcher.stats(),
+            "admission": self.gate.stats(),
+            "volume": self.volume_scheduler.stats(),
+            "ramp": self.ramps.stats(),
+            "state": self.state_cache.stats(),
+            "sessions": self.sessions.stats(),
+            "auth": self.auth_guard.stats(),
+            "credentials": self.credentials.stats(),
+            "idempotency": self.idempotency.stats(),
+            "ws_tickets": self.ws_tickets.stats(),
+            "tracing": self.tracer.stats(),
+            "os_worker": self.os_worker.stats() if self.os_worker else None,
+            "http": self.http_server.stats() if self.http_server else None,
+            "udp": self.udp_server.stats() if self.udp_server else None,
+            "discovery": self.discovery.stats() if self.discovery else None,
+        }
+
+    def info(self):
+        """Payload do /info (também enviado nas respostas de descoberta)"""
+        return {
+            "name": "AudioRemote Server",
+            "version": "2.0.0",
+            "auth_required": True,
+            "ip": self.local_ip,
+            "port": self.port,
+            "udp_port": self.udp_server.port if self.udp_server else None,
+            "url": self.url,
+            "addresses": self.addresses,
+            "tls": self.tls,
+            "tls_fingerprint": self.tls_fingerprint,
+        }
+
+    def reject_auth(self, client, reason):
+        """Registra a falha (com amostragem) e monta a resposta 401"""
+        log_message, error = AUTH_FAILURES[reason]
+        decision = self.auth_guard.record_failure(client, reason)
+        if decision == LOG:
+            logger.warning("❌ %s de %s", log_message, client, extra={"event": "auth"})
+        elif decision == BLOCK:
+            logger.warning("⛔ %s bloqueado por %.0fs após falhas repetidas", client, self.auth_guard.block_seconds, extra={"event": "auth"})
+        return jsonify({"error": error}), 401
+
+    def flush_auth_summaries(self):
+        """Registra o resumo das falhas suprimidas (timer a cada summary_interval)"""
+        for ip, reason, count in self.auth_guard.drain_summaries():
+            logger.warning("❌ %d falhas repetidas (%s) de %s", count, AUTH_FAILURES[reason][0], ip, extra={"event": "auth"})
+        self.ramps.timers.call_later(self.auth_guard.summary_interval, self.flush_auth_summaries)
+
+    def identify(self, presented):
+        """Device dono do token (o de server_token.txt ou um pareado) ou None"""
+        if self.auth_guard.verify(presented, self.token):
+            return SERVER_TOKEN_DEVICE
+        return self.credentials.verify(presented)
+
+    def authenticate(self, auth_header, scope=None):
+        """Aplica o limite por IP, valida o header Authorization e o escopo.
+
+        Retorna None se autorizado (o dispositivo fica em ``g.device``) ou a
+        resposta de erro.
+        """
+        client = request.remote_addr
+        retry_after = self.auth_guard.check(client)
+        if retry_after:
+            return jsonify({"error": "Muitas requisições"}), 429, {"Retry-After": str(math.ceil(retry_after))}
+
+        if not auth_header:
+            return self.reject_auth(client, "missing")
+
+        if not auth_header.startswith('Bearer '):
+            return self.reject_auth(client, "format")
+
+        device = self.identify(auth_header[len('Bearer '):])
+        if device is None:
+            return self.reject_auth(client, "invalid")
+        g.device = device
+
+        if not device.allows(scope):
+            logger.warning("🚫 %s (%s) sem permissão %s", device.name, client, scope, extra={"event": "auth"})
+            return jsonify({"error": "Dispositivo sem permissão para esta operação"}), 403
+
+        return None
+
+    def authorize_operation(self, device, operation):
+        """Confere uma operação do /batch ou do /ws contra o estado atual do dispositivo"""
+        current = self.credentials.current(device) if device is not None else None
+        if current is None:
+            raise ControlError("Dispositivo revogado", 401)
+        if not current.allows_operation(operation):
+            raise ControlError("Dispositivo sem permissão para esta operação", 403)
+
+    def require_auth(self, scope=None):
+        """Decorator para verificar autenticação e o escopo do dispositivo"""
+        def decorator(f):
+            @wraps(f)
+            def decorated_function(*args, **kwargs):
+                with self.metrics.time_stage("auth"), span("auth"):
+                    error = self.authenticate(request.headers.get('Authorization'), scope)
+                if error is not None:
+                    return error
+                return f(*args, **kwargs)
+            return decorated_function
+        return decorator
+
+    def create_app(self):
+        """Cria o app Flask com todas as rotas"""
+        app = Flask(__name__)
+        CORS(app)
+        instrument_app(app, self.metrics)
+        trace_app(app, self.tracer)
+        require_auth = self.require_auth
+        # Rotas que alteram estado aceitam Idempotency-Key
+        idempotent = self.idempotency.route
+        controller = self.controller
+
+        @app.route('/command/<action>', methods=['POST'])
+        @require_auth("command")
+        @idempotent
+        def command(action):
+            """Enfileira comandos de controle de mídia (202)"""
+            try:
+                message, status = controller.command(action, request.remote_addr)
+            except ControlError as e:
+                if e.status == 400:
+                    logger.warning(" Comando inválido: %s", action, extra={"event": "command"})
+                else:
+                    logger.warning("⚠️ Comando %s recusado: %s", action, e, extra={"event": "command"})
+                return jsonify({"error": e.message}), e.status
+
+            logger.info("🎵 Comando enfileirado: %s de %s", action, request.remote_addr, extra={"event": "command"})
+            return message, status
+
+        @app.route('/volume', methods=['POST'])
+        @require_auth("volume")
+        @idempotent
+        def volume():
+            """Ajusta o volume do sistema (absoluto, relativo, passo ou mudo)"""
+            data = request.json
+
+            try:
+                message, status = controller.change_volume(data, request.remote_addr)
+            except ControlError as e:
+                if e.status == 400:
+                    logger.warning(" %s: %s", e.message, data, extra={"event": "volume"})
+                else:
+                    logger.error("❌ %s", e.message, extra={"event": "volume"})
+                return jsonify({"error": e.message}), e.status
+
+            if status == 200:
+                logger.info(" %s de %s", message, request.remote_addr, extra={"event": "volume"})
+            return message, status
+
+        @app.route('/volume/ramp', methods=['GET', 'POST', 'DELETE'])
+        @require_auth("volume")
+        @idempotent
+        def volume_ramp():
+            """Agenda (POST), consulta (GET) ou cancela (DELETE) a rampa de volume"""
+            if request.method == 'POST':
+                data = request.json
+                try:
+                    ramp = controller.start_ramp(data, request.remote_addr)
+                except ControlError as e:
+                    logger.warning(" %s: %s", e.message, data, extra={"event": "volume"})
+                    return jsonify({"error": e.message}), e.status
+                logger.info(" Rampa %d até %s%% em %s s de %s", ramp.id, ramp.level, ramp.duration,
+                            request.remote_addr, extra={"event": "volume"})
+                return jsonify(ramp.to_dict()), 202
+
+            ramp = self.ramps.cancel() if request.method == 'DELETE' else self.ramps.current()
+            if ramp is None:
+                return jsonify({"error": "Nenhuma rampa ativa"}), 404
+            return jsonify(ramp.to_dict()), 200
+
+        @app.route('/state')
+        @require_auth("volume")
+        def state():
+            """Retorna volume e mudo atuais (do cache mantido pelas notificações)"""
+            try:
+                with span("backend"):
+                    return jsonify(self.state_cache.get()), 200
+            except AudioBackendError as e:
+                logger.error("❌ Erro ao ler o estado do áudio: %s", e)
+                return jsonify({"error": f"Erro ao ler o estado do áudio: {e}"}), 500
+
+        @app.route('/state/stream')
+        @require_auth("volume")
+        def state_stream():
+            """Server-Sent Events com o estado a cada mudança"""
+            stream = self.state_cache.open_stream()
+            if stream is None:
+                return jsonify({"error": "Limite de streams atingido"}), 503
+            return Response(stream, mimetype="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+        @app.route('/sessions')
+        @require_auth("volume")
+        def sessions():
+            """Lista as sessões de áudio por aplicativo (revalidável via If-None-Match)"""
+            try:
+                with span("backend"):
+                    items, etag = self.sessions.snapshot()
+            except AudioBackendError as e:
+                logger.error("❌ Erro ao listar sessões de áudio: %s", e)
+                return jsonify({"error": f"Erro ao listar sessões de áudio: {e}"}), 500
+            response = jsonify({"sessions": items})
+            response.set_etag(etag)
+            response.headers["Cache-Control"] = "no-cache"
+            return response.make_conditional(request)
+
+        @app.route('/sessions/<key>/volume', methods=['POST'])
+        @require_auth("volume")
+        @idempotent
+        def session_volume(key):
+            """Ajusta volume/mudo de um aplicativo (PID ou nome do processo)"""
+            data = request.json
+
+            try:
+                message, status = controller.change_session(key, data, request.remote_addr)
+            except ControlError as e:
+                if e.status in (400, 404):
+                    logger.warning(" %s: %s %s", e.message, key, data, extra={"event": "volume"})
+                else:
+                    logger.error("❌ %s", e.message, extra={"event": "volume"})
+                return jsonify({"error": e.message}), e.status
+
+            logger.info(" %s de %s", message, request.remote_addr, extra={"event": "volume"})
+            return message, status
+
+        @app.route('/batch', methods=['POST'])
+        @require_auth()
+        @idempotent
+        def batch():
+            """Executa uma lista ordenada de operações em uma única requisição"""
+            data = request.json
+            operations = data.get('ops') if isinstance(data, dict) else None
+            stop_on_error = data.get('stop_on_error', True) if isinstance(data, dict) else True
+            try:
+                # Cada operação exige o escopo correspondente (cmd -> command, vol -> volume)
+                for operation in operations if isinstance(operations, list) else ():
+                    self.authorize_operation(g.device, operation)
+            except ControlError as e:
+                return jsonify({"error": e.message}), e.status
+
+            start = time.perf_counter()
+            try:
+                results = controller.run_batch(operations, stop_on_error=bool(stop_on_error), client=request.remote_addr)
+            except ControlError as e:
+                logger.warning(" Lote inválido: %s", e.message, extra={"event": "batch"})
+                return jsonify({"error": e.message}), e.status
+            total_ms = round((time.perf_counter() - start) * 1000, 3)
+
+            logger.info("📦 Lote com %d operações executado em %s ms de %s", len(results), total_ms, request.remote_addr, extra={"event": "batch"})
+            return jsonify({"results": results, "total_ms": total_ms}), 200
+
+        @app.route('/stats')
+        @require_auth("admin")
+        def stats():
+            """Retorna contadores internos do servidor"""
+            return jsonify(self.stats()), 200
+
+        @app.route('/metrics')
+        @require_auth("admin")
+        def metrics_endpoint():
+            """Exporta métricas no formato texto do Prometheus"""
+            return self.metrics.render_prometheus(), 200, {"Content-Type": "text/plain; version=0.0.4; charset=utf-8"}
+
+        @app.route('/debug/traces')
+        @require_auth("admin")
+        def debug_traces():
+            """Traces recentes e mais lentos, com os spans de cada requisição (?limit=N)"""
+            limit = request.args.get('limit', type=int)
+            if limit is not None and limit < 0:
+                return jsonify({"error": "limit inválido"}), 400
+            return jsonify(self.tracer.traces(limit)), 200
+
+        # Canal WebSocket persistente (autentica uma vez no handshake)
+        register_control_socket(app, controller, self.authenticate, logger.info, self.authorize_operation,
+                                self.ws_tickets)
+
+        @app.route("/ping")
+        def ping():
+            """Endpoint para testar conectividade (sem autenticação)"""
+            return "pong", 200
+
+        @app.route("/info")
+        def info():
+            """Retorna informações do servidor (sem autenticação)"""
+            return jsonify(self.info()), 200
+
+        return app
+
+    def start(self, host="0.0.0.0"):
+        """Abre o servidor HTTP (e o UDP, se configurado) sem começar a atender.
+
+        Use serve_forever() do http_server em uma thread; stop() para parar.
+        """
+        ssl_context = self.ssl_context if self.tls else None
+        self.http_server = create_http_server(self.app, host, self.port, ssl_context=ssl_context)
+        try:
+            self.udp_server = start_udp_server(self.controller, lambda: self.token, credentials=self.credentials,
+                                               shared_token=self.udp_shared_token)
+        except Exception:
+            self.http_server.server_close()
+            self.http_server = None
+            raise
+        self.discovery = start_discovery(self.info, self.port, self.local_ip)
+        return self.http_server
+
+    def detach(self):
+        """Fecha UDP, descoberta e streams e retorna o servidor HTTP para encerrar.
+
+        Não bloqueia: a interface encerra o HTTP em outra thread.
+        """
+        http_server, self.http_server = self.http_server, None
+        udp_server, self.udp_server = self.udp_server, None
+        discovery, self.discovery = self.discovery, None
+        self.state_cache.close_streams()
+        if udp_server is not None:
+            udp_server.shutdown()
+        if discovery is not None:
+            discovery.shutdown()
+        return http_server
+
+    def stop(self):
+        """Encerra os servidores (bloqueia até o loop HTTP terminar)"""
+        http_server = self.detach()
+        if http_server is not None:
+            http_server.shutdown()
+            http_server.server_close()
+
+    def warm_up(self):
+        """Carrega os backends de SO antes do primeiro comando (em segundo plano)"""
+        try:
+            self.keyboard.load()
+            self.state_cache.get()
+        except Exception as e:
+            logger.warning(f"Falha ao pré-carregar os backends: {e}")
+
+    def close(self):
+        """Para os servidores e libera os backends"""
+        self.stop()
+        self.ramps.close()
+        self.input_dispatcher.close()
+        self.volume_scheduler.close()
+        self.audio.close()
+        self.keyboard.close()
+        if self.os_worker is not None:
+            self.os_worker.close()
@@ -0,0 +1,283 @@
+import os
+import hmac
+import json
+import time
+import hashlib
+import logging
+import secrets
+import threading
+
+logger = logging.getLogger(__name__)
+
+# Tokens por dispositivo, gravados ao lado do server_token.txt
+DEVICES_FILE = 'server_devices.json'
+
+# Intervalo mínimo entre verificações do mtime do arquivo (recarga a quente)
+DEVICES_RELOAD_ENV = 'AUDIOREMOTE_DEVICES_RELOAD_MS'
+DEFAULT_DEVICES_RELOAD = float(os.environ.get(DEVICES_RELOAD_ENV, 1000)) / 1000
+
+# Escopos: "command" (teclas de mídia), "volume" (volume, rampas, sessões e
+# leitura do estado) e "admin" (tudo, inclusive /stats, /metrics e /debug)
+SCOPES = ("command", "volume", "admin")
+DEFAULT_SCOPES = ("command", "volume")
+
+# Escopo exigido por cada operação de /batch e do /ws
+OPERATION_SCOPES = {"cmd": "command", "vol": "volume"}
+
+
+class CredentialError(Exception):
+    """Arquivo de dispositivos inválido ou operação recusada"""
+
+
+def hash_token(token):
+    """SHA-256 do token: os tokens são aleatórios, então não precisam de KDF lenta"""
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+def udp_key(token):
+    """Chave UDP do dispositivo (hex): HMAC-SHA256 do token com o rótulo "udp".
+
+    É separada do hash de verificação, então quem só tem o hash não
+    consegue assinar datagramas.
+    """
+    return hmac.new(token.encode(), b"udp", hashlib.sha256).hexdigest()
+
+
+def credentials_path(token_file):
+    return os.path.join(os.path.dirname(os.path.abspath(token_file)), DEVICES_FILE)
+
+
+def parse_scopes(value):
+    """"command,volume" (ou lista) -> tupla validada na ordem de SCOPES"""
+    if isinstance(value, str):
+        value = value.split(",")
+    scopes = {scope.strip() for scope in value if scope.strip()}
+    unknown = scopes - set(SCOPES)
+    if unknown or not scopes:
+        raise CredentialError(f"Escopos inválidos: {', '.join(sorted(unknown)) or 'nenhum'} "
+                              f"(use {', '.join(SCOPES)})")
+    return tuple(scope for scope in SCOPES if scope in scopes)
+
+
+class Device:
+    """Um dispositivo pareado: nome, escopos, o hash do seu token e a chave UDP"""
+    __slots__ = ("id", "name", "token_hash", "scopes", "created", "udp_key")
+
+    def __init__(self, device_id, name, token_hash, scopes, created=None, udp_key=None):
+        self.id = device_id
+        self.name = name
+        self.token_hash = token_hash
+        self.scopes = frozenset(scopes)
+        self.created = created
+        self.udp_key = udp_key
+
+    @property
+    def scope_names(self):
+        """Escopos na ordem de SCOPES"""
+        return [scope for scope in SCOPES if scope in self.scopes]
+
+    def allows(self, scope):
+        return scope is None or "admin" in self.scopes or scope in self.scopes
+
+    def allows_operation(self, operation):
+        """Operação do /batch ou do /ws (ping e wait não exigem escopo)"""
+        op = operation.get("op") if isinstance(operation, dict) else None
+        return self.allows(OPERATION_SCOPES.get(op))
+
+    def to_dict(self):
+        data = {
+            "id": self.id,
+            "name": self.name,
+            "token_sha256": self.token_hash,
+            "scopes": self.scope_names,
+            "created": self.created,
+        }
+        if self.udp_key is not None:
+            data["udp_key"] = self.udp_key
+        return data
+
+
+# O token de server_token.txt continua valendo, com todos os escopos
+SERVER_TOKEN_DEVICE = Device("server", "server_token.txt", None, ("admin",))
+
+
+class CredentialStore:
+    """Tokens por dispositivo com índice em memória e recarga a quente.
+
+    O arquivo JSON guarda o hash de cada token (e a chave UDP derivada
+    dele, por isso é gravado com permissão 0600). ``verify`` calcula o
+    hash do token apresentado, consulta o índice (dict hash -> Device) e
+    confirma com ``hmac.compare_digest``; o arquivo só é relido quando o
+    mtime muda, verificado no máximo uma vez por ``reload_interval``.
+    Adicionar ou revogar um dispositivo (pela interface, pela linha de
+    comando ou editando o arquivo) vale sem reiniciar o servidor.
+    """
+
+    def __init__(self, path, reload_interval=DEFAULT_DEVICES_RELOAD):
+        self.path = path
+        self.reload_interval = reload_interval
+        self.version = 0
+        self.reloads = 0
+        self.reload_errors = 0
+        self.verified = 0
+        self.rejected = 0
+        # Trocado inteiro a cada recarga: leitores nunca precisam de lock
+        self._index = {}
+        self._by_id = {}
+        self._signature = None
+        self._next_check = 0.0
+        self._reload_lock = threading.Lock()
+        self._write_lock = threading.Lock()
+
+    def _stat(self):
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return st.st_mtime_ns, st.st_size
+
+    def _read(self):
+        """[Device] do arquivo (vazio se ele não existe); erros de formato viram CredentialError"""
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return []
+        except ValueError as e:
+            raise CredentialError(f"JSON inválido: {e}") from e
+        try:
+            return [self._parse_device(item) for item in data.get("devices", [])]
+        except (KeyError, TypeError, AttributeError, ValueError) as e:
+            raise CredentialError(f"Formato inválido ({type(e).__name__}: {e})") from e
+
+    @staticmethod
+    def _parse_device(item):
+        def digest(field):
+            value = item.get(field)
+            if value is None:
+                return None
+            value = str(value).lower()
+            if len(value) != 64 or not all(c in "0123456789abcdef" for c in value):
+                raise CredentialError(f"{field} inválido para o dispositivo {item.get('id')}")
+            return value
+
+        token_hash = digest("token_sha256")
+        if token_hash is None:
+            raise CredentialError(f"Dispositivo {item.get('id')} sem token_sha256")
+        return Device(str(item["id"]), str(item.get("name") or item["id"]), token_hash,
+                      parse_scopes(item.get("scopes") or DEFAULT_SCOPES), item.get("created"),
+                      digest("udp_key"))
+
+    def reload(self, force=False):
+        """Relê o arquivo se o mtime/tamanho mudou; um arquivo inválido mantém o índice anterior"""
+        with self._reload_lock:
+            signature = self._stat()
+            if not force and signature == self._signature:
+                return False
+            try:
+                devices = self._read()
+            except (OSError, CredentialError) as e:
+                self.reload_errors += 1
+                # Não tenta de novo até o arquivo mudar outra vez
+                self._signature = signature
+                logger.error(f"❌ Arquivo de dispositivos inválido ({self.path}): {e}")
+                return False
+            self._index = {device.token_hash: device for device in devices}
+            self._by_id = {device.id: device for device in devices}
+            self._signature = signature
+            self.version += 1
+            self.reloads += 1
+        if not force and self.reloads > 1:
+            logger.info(f"🔑 Dispositivos recarregados ({len(devices)})")
+        return True
+
+    def maybe_reload(self):
+        """Verifica o mtime no máximo uma vez por intervalo (chamado a cada autenticação)"""
+        now = time.monotonic()
+        if now < self._next_check:
+            return
+        self._next_check = now + self.reload_interval
+        self.reload()
+
+    def verify(self, presented):
+        """Device dono do token ou None"""
+        self.maybe_reload()
+        digest = hash_token(presented)
+        device = self._index.get(digest)
+        # O dict só compara hashes; a confirmação é em tempo constante
+        if device is not None and hmac.compare_digest(device.token_hash, digest):
+            self.verified += 1
+            return device
+        self.rejected += 1
+        return None
+
+    def current(self, device):
+        """Versão atual do dispositivo (escopos podem ter mudado) ou None se revogado.
+
+        Canais abertos, como o /ws, conferem a cada mensagem.
+        """
+        if device is SERVER_TOKEN_DEVICE:
+            return device
+        self.maybe_reload()
+        current = self._index.get(device.token_hash)
+        return current if current is not None and current.id == device.id else None
+
+    def find(self, device_id):
+        """Dispositivo atual pelo id ou None (revogado ou desconhecido)"""
+        self.maybe_reload()
+        return self._by_id.get(device_id)
+
+    def devices(self):
+        """Dispositivos na ordem do arquivo"""
+        self.maybe_reload()
+        return list(self._index.values())
+
+    def _write(self, devices):
+        data = {"devices": [device.to_dict() for device in devices]}
+        temporary = f"{self.path}.tmp"
+        with open(temporary, "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=2, ensure_ascii=False)
+        try:
+            os.chmod(temporary, 0o600)
+        except OSError:
+            pass
+        os.replace(temporary, self.path)
+        self.reload(force=True)
+
+    def add(self, name, scopes=DEFAULT_SCOPES):
+        """Cria um dispositivo e retorna (Device, token); o token só existe aqui"""
+        name = name.strip()
+        if not name:
+            raise CredentialError("Nome do dispositivo vazio")
+        scopes = parse_scopes(scopes)
+        token = secrets.token_urlsafe(32)
+        with self._write_lock:
+            devices = self._read()
+            device = Device(secrets.token_hex(4), name, hash_token(token), scopes, round(time.time()),
+                            udp_key(token))
+            self._write(devices + [device])
+        logger.info(f"🔑 Dispositivo adicionado: {name} ({', '.join(scopes)})")
+        return self._index.get(device.token_hash, device), token
+
+    def revoke(self, device_id):
+        """Remove o dispositivo pelo id (ou nome); retorna o Device removido"""
+        with self._write_lock:
+            devices = self._read()
+            matches = [device for device in devices if device.id == device_id] or \
+                      [device for device in devices if device.name == device_id]
+            if len(matches) != 1:
+                raise CredentialError(f"Dispositivo não encontrado: {device_id}" if not matches
+                                      else f"Mais de um dispositivo chamado {device_id}; use o id")
+            self._write([device for device in devices if device is not matches[0]])
+        logger.info(f"🔑 Dispositivo revogado: {matches[0].name}")
+        return matches[0]
+
+    def stats(self):
+        return {
+            "devices": len(self._index),
+            "version": self.version,
+            "reloads": self.reloads,
+            "reload_errors": self.reload_errors,
+            "verified": self.verified,
+            "rejected": self.rejected,
+        }
@@ -0,0 +1,218 @@
+import os
+import time
+import json
+import socket
+import struct
+import logging
+import ipaddress
+import threading
+
+logger = logging.getLogger(__name__)
+
+# Porta UDP das sondas de descoberta (0 = desativado)
+DISCOVERY_PORT_ENV = 'AUDIOREMOTE_DISCOVERY_PORT'
+DEFAULT_DISCOVERY_PORT = int(os.environ.get(DISCOVERY_PORT_ENV, 5002))
+
+# Sonda: o cliente envia PROBE por broadcast (255.255.255.255 ou o broadcast
+# da sub-rede) ou para o grupo multicast; a resposta é o JSON do /info com
+# o IP da interface por onde a sonda chegou e todos os endereços candidatos.
+PROBE = b"AUDIOREMOTE_DISCOVER"
+MULTICAST_GROUP = "239.255.77.77"
+
+# Reenumera as interfaces periodicamente (VPN conectando, Wi-Fi trocando...)
+REFRESH_INTERVAL = 30.0
+
+# Nomes típicos de adaptadores virtuais (vão para o fim da lista)
+VIRTUAL_PREFIXES = ("docker", "br-", "veth", "virbr", "vmnet", "vboxnet", "tun", "tap",
+                    "wg", "tailscale", "zt", "utun", "vethernet", "virtualbox", "vmware",
+                    "hyper-v", "loopback", "bluetooth")
+
+CGNAT_NETWORK = ipaddress.ip_network("100.64.0.0/10")
+
+
+class Interface:
+    """Endereço IPv4 utilizável de uma interface de rede"""
+
+    def __init__(self, name, ip, netmask="255.255.255.0"):
+        self.name = name
+        self.ip = ip
+        self.network = ipaddress.ip_network(f"{ip}/{netmask}", strict=False)
+        self.virtual = name.lower().startswith(VIRTUAL_PREFIXES)
+
+    def rank(self, default_ip):
+        """Ordem de preferência: LAN física e privada primeiro"""
+        address = ipaddress.ip_address(self.ip)
+        lan = address.is_private and address not in CGNAT_NETWORK
+        return (self.virtual, not lan, self.ip != default_ip)
+
+    def to_dict(self):
+        return {"name": self.name, "ip": self.ip, "network": str(self.network)}
+
+
+def _psutil_interfaces():
+    import psutil
+
+    stats = psutil.net_if_stats()
+    interfaces = []
+    for name, addresses in psutil.net_if_addrs().items():
+        if name in stats and not stats[name].isup:
+            continue
+        for address in addresses:
+            if address.family == socket.AF_INET:
+                interfaces.append(Interface(name, address.address, address.netmask or "255.255.255.0"))
+    return interfaces
+
+
+def _socket_interfaces():
+    """Sem psutil: endereços do hostname (máscara /24 presumida)"""
+    try:
+        _, _, addresses = socket.gethostbyname_ex(socket.gethostname())
+    except OSError:
+        addresses = []
+    return [Interface("host", ip) for ip in addresses]
+
+
+def list_interfaces(default_ip=None):
+    """Interfaces IPv4 utilizáveis, da mais provável para a menos provável.
+
+    Usa psutil quando instalado (nomes, máscaras e estado das interfaces);
+    senão, os endereços do hostname. Loopback e link-local ficam de fora.
+    """
+    try:
+        interfaces = _psutil_interfaces()
+    except ImportError:
+        interfaces = _socket_interfaces()
+    if default_ip and all(interface.ip != default_ip for interface in interfaces):
+        interfaces.append(Interface("default", default_ip))
+
+    usable, seen = [], set()
+    for interface in interfaces:
+        address = ipaddress.ip_address(interface.ip)
+        if address.is_loopback or address.is_link_local or interface.ip in seen:
+            continue
+        seen.add(interface.ip)
+        usable.append(interface)
+    usable.sort(key=lambda interface: interface.rank(default_ip))
+    return usable
+
+
+class DiscoveryResponder:
+    """Responde sondas de descoberta em todas as interfaces.
+
+    Um único socket UDP em 0.0.0.0 recebe broadcast e multicast; a
+    interface é identificada pela sub-rede do remetente. As respostas de
+    cada interface são serializadas de antemão, então responder é só
+    uma busca e um sendto. Remetentes fora das sub-redes locais são
+    ignorados.
+    """
+
+    def __init__(self, info, http_port, default_ip=None, port=DEFAULT_DISCOVERY_PORT, host="0.0.0.0"):
+        self.info = info
+        self.http_port = http_port
+        self.default_ip = default_ip
+        self.probes = 0
+        self.answered = 0
+        self.ignored = 0
+        self.interfaces = []
+        self._responses = []
+        self._next_refresh = 0.0
+        self._running = False
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.bind((host, port))
+        self.sock.settimeout(1.0)
+        self.port = self.sock.getsockname()[1]
+        self.refresh()
+
+    def refresh(self):
+        """Reenumera as interfaces e recalcula as respostas"""
+        interfaces = list_interfaces(self.default_ip)
+        addresses = [interface.ip for interface in interfaces]
+        base = dict(self.info(), addresses=addresses)
+        scheme = "https" if base.get("tls") else "http"
+        responses = []
+        for interface in interfaces:
+            payload = dict(base, ip=interface.ip, url=f"{scheme}://{interface.ip}:{self.http_port}")
+            responses.append((interface.network, json.dumps(payload).encode()))
+            self._join_multicast(interface.ip)
+        # Troca atômica: o loop de resposta lê sem lock
+        self.interfaces = interfaces
+        self._responses = responses
+        self._next_refresh = time.monotonic() + REFRESH_INTERVAL
+
+    def _join_multicast(self, ip):
+        membership = struct.pack("4s4s", socket.inet_aton(MULTICAST_GROUP), socket.inet_aton(ip))
+        try:
+            self.sock.setsockopt(socket.IPPROTO_IP, socket.IP_ADD_MEMBERSHIP, membership)
+        except OSError:
+            # Já inscrito nessa interface ou interface sem multicast
+            pass
+
+    def response_for(self, sender_ip):
+        """Resposta pré-calculada da interface na sub-rede do remetente"""
+        try:
+            address = ipaddress.ip_address(sender_ip)
+        except ValueError:
+            return None
+        for network, response in self._responses:
+            if address in network:
+                return response
+        return None
+
+    def handle(self, data, address):
+        self.probes += 1
+        response = self.response_for(address[0]) if data.startswith(PROBE) else None
+        if response is None:
+            self.ignored += 1
+            return None
+        self.answered += 1
+        return response
+
+    def serve_forever(self):
+        self._running = True
+        logger.info(f"🔎 Descoberta na porta UDP {self.port} ({len(self.interfaces)} interfaces)")
+        while self._running:
+            if time.monotonic() >= self._next_refresh:
+                try:
+                    self.refresh()
+                except Exception as e:
+                    logger.warning(f"Falha ao atualizar interfaces: {e}")
+                    self._next_refresh = time.monotonic() + REFRESH_INTERVAL
+            try:
+                data, address = self.sock.recvfrom(512)
+            except socket.timeout:
+                continue
+            except OSError:
+                break
+            response = self.handle(data, address)
+            if response is not None:
+                try:
+                    self.sock.sendto(response, address)
+                except OSError:
+                    pass
+
+    def shutdown(self):
+        self._running = False
+        self.sock.close()
+
+    def stats(self):
+        return {
+            "port": self.port,
+            "interfaces": len(self.interfaces),
+            "probes": self.probes,
+            "answered": self.answered,
+            "ignored": self.ignored,
+        }
+
+
+def start_discovery(info, http_port, default_ip=None, port=None):
+    """Cria e inicia o responder em uma thread; None se desativado ou a porta estiver em uso"""
+    port = DEFAULT_DISCOVERY_PORT if port is None else port
+    if not port:
+        return None
+    try:
+        responder = DiscoveryResponder(info, http_port, default_ip, port=port)
+    except OSError as e:
+        logger.warning(f"Descoberta desativada: {e}")
+        return None
+    threading.Thread(target=responder.serve_forever, name="discovery", daemon=True).start()
+    return responder
@@ -0,0 +1,218 @@
+import os
+import time
+import threading
+from collections import deque, OrderedDict
+
+# Operações executando ao mesmo tempo nos backends (todos os clientes)
+GATE_CAPACITY_ENV = 'AUDIOREMOTE_GATE_CAPACITY'
+DEFAULT_GATE_CAPACITY = int(os.environ.get(GATE_CAPACITY_ENV, 4))
+
+# Operações simultâneas de um mesmo cliente
+GATE_PER_CLIENT_ENV = 'AUDIOREMOTE_GATE_PER_CLIENT'
+DEFAULT_GATE_PER_CLIENT = int(os.environ.get(GATE_PER_CLIENT_ENV, 2))
+
+# Operações aguardando por cliente; acima disso a resposta é 429
+GATE_QUEUE_ENV = 'AUDIOREMOTE_GATE_QUEUE'
+DEFAULT_GATE_QUEUE = int(os.environ.get(GATE_QUEUE_ENV, 16))
+
+# Prioridades (menor primeiro): comandos de transporte antes de volume
+PRIORITY_TRANSPORT = 0
+PRIORITY_VOLUME = 1
+PRIORITIES = (PRIORITY_TRANSPORT, PRIORITY_VOLUME)
+
+ADMITTED = "admitted"
+QUEUE_FULL = "queue_full"
+TIMEOUT = "timeout"
+
+
+class _Waiter:
+    __slots__ = ("enqueued", "granted", "event")
+
+    def __init__(self, enqueued):
+        self.enqueued = enqueued
+        self.granted = False
+        self.event = threading.Event()
+
+
+class _Client:
+    __slots__ = ("active", "queues", "admitted", "queue_full", "timeouts", "wait_total", "wait_max")
+
+    def __init__(self):
+        self.active = 0
+        self.queues = tuple(deque() for _ in PRIORITIES)
+        self.admitted = 0
+        self.queue_full = 0
+        self.timeouts = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+
+    @property
+    def waiting(self):
+        return sum(len(queue) for queue in self.queues)
+
+    def to_dict(self):
+        return {
+            "active": self.active,
+            "waiting": self.waiting,
+            "admitted": self.admitted,
+            "queue_full": self.queue_full,
+            "timeouts": self.timeouts,
+            "avg_wait_ms": round(self.wait_total / self.admitted * 1000, 3) if self.admitted else 0.0,
+            "max_wait_ms": round(self.wait_max * 1000, 3),
+        }
+
+
+class FairGate:
+    """Admissão justa das operações de controle entre clientes.
+
+    Cada cliente (IP) tem uma fila por prioridade. Quando há vaga, os
+    clientes com operações esperando são atendidos em rodízio, sempre
+    esgotando antes a prioridade mais alta (play/pause/next/prev antes de
+    volume). ``capacity`` limita as operações em andamento no total e
+    ``per_client`` as de um mesmo cliente, então um slider disparando
+    /volume não ocupa todas as vagas nem atrasa o play/pause dos outros.
+    """
+
+    def __init__(self, capacity=DEFAULT_GATE_CAPACITY, per_client=DEFAULT_GATE_PER_CLIENT,
+                 queue_size=DEFAULT_GATE_QUEUE, timeout=5.0, max_clients=64, metrics=None):
+        self.capacity = capacity
+        self.per_client = per_client
+        self.queue_size = queue_size
+        self.timeout = timeout
+        self.max_clients = max_clients
+        self.metrics = metrics
+        self.active = 0
+        self.admitted = 0
+        self.queue_full = 0
+        self.timeouts = 0
+        self._clients = OrderedDict()
+        # Clientes com operações esperando, na ordem do rodízio
+        self._ring = deque()
+        self._lock = threading.Lock()
+
+    def _client(self, name):
+        client = self._clients.get(name)
+        if client is None:
+            client = self._clients[name] = _Client()
+            if len(self._clients) > self.max_clients:
+                # Esquece o cliente ocioso menos recente (nunca o que acabou de entrar)
+                for old_name, old in self._clients.items():
+                    if old_name != name and not old.active and not old.waiting:
+                        del self._clients[old_name]
+                        break
+        else:
+            self._clients.move_to_end(name)
+        return client
+
+    def _grant(self, client, waiter, now):
+        # Chamado com o lock
+        waited = now - waiter.enqueued
+        self.active += 1
+        self.admitted += 1
+        client.active += 1
+        client.admitted += 1
+        client.wait_total += waited
+        client.wait_max = max(client.wait_max, waited)
+        waiter.granted = True
+        if self.metrics is not None:
+            self.metrics.observe_stage("admission_wait", waited)
+
+    def _dispatch(self):
+        """Distribui as vagas livres entre os clientes em espera (com o lock)"""
+        now = time.monotonic()
+        while self.active < self.capacity:
+            chosen = None
+            for priority in PRIORITIES:
+                for index, name in enumerate(self._ring):
+                    client = self._clients[name]
+                    if client.queues[priority] and client.active < self.per_client:
+                        chosen = index, name, client, priority
+                        break
+                if chosen:
+                    break
+            if chosen is None:
+                return
+
+            index, name, client, priority = chosen
+            waiter = client.queues[priority].popleft()
+            # O cliente atendido vai para o fim do rodízio
+            del self._ring[index]
+            if client.waiting:
+                self._ring.append(name)
+            self._grant(client, waiter, now)
+            waiter.event.set()
+
+    def acquire(self, name, priority=PRIORITY_VOLUME):
+        """Aguarda a vez do cliente; retorna ADMITTED, QUEUE_FULL ou TIMEOUT.
+
+        Depois de ADMITTED o chamador precisa chamar ``release(name)``.
+        """
+        now = time.monotonic()
+        waiter = _Waiter(now)
+        with self._lock:
+            client = self._client(name)
+            if not self._ring and self.active < self.capacity and client.active < self.per_client:
+                # Ninguém esperando: entra direto
+                self._grant(client, waiter, now)
+                return ADMITTED
+            if client.waiting >= self.queue_size:
+                self.queue_full += 1
+                client.queue_full += 1
+                return QUEUE_FULL
+            client.queues[priority].append(waiter)
+            if name not in self._ring:
+                self._ring.append(name)
+            self._dispatch()
+
+        if waiter.event.wait(self.timeout):
+            return ADMITTED
+        with self._lock:
+            if waiter.granted:
+                return ADMITTED
+            client.queues[priority].remove(waiter)
+            if not client.waiting and name in self._ring:
+                self._ring.remove(name)
+            self.timeouts += 1
+            client.timeouts += 1
+            return TIMEOUT
+
+    def release(self, name):
+        with self._lock:
+            self.active -= 1
+            client = self._clients.get(name)
+            if client is not None:
+                client.active -= 1
+            self._dispatch()
+
+    def stats(self):
+        """Totais e, por cliente, vagas em uso, fila e tempo de espera"""
+        with self._lock:
+            clients = {name: client.to_dict() for name, client in self._clients.items()}
+        return {
+            "capacity": self.capacity,
+            "per_client": self.per_client,
+            "active": self.active,
+            "waiting": sum(client["waiting"] for client in clients.values()),
+            "admitted": self.admitted,
+            "queue_full": self.queue_full,
+            "timeouts": self.timeouts,
+            "clients": clients,
+        }
+
+    def collect(self):
+        """Coletor do /metrics com o tempo de espera por cliente"""
+        clients = self.stats()["clients"]
+
+        def samples(key, scale=1.0):
+            return [({"client": name}, values[key] * scale) for name, values in sorted(clients.items())]
+
+        return [
+            ("audioremote_admission_client_admitted_total", "counter",
+             "Operações admitidas por cliente", samples("admitted")),
+            ("audioremote_admission_client_wait_avg_seconds", "gauge",
+             "Espera média na fila por cliente", samples("avg_wait_ms", 0.001)),
+            ("audioremote_admission_client_wait_max_seconds", "gauge",
+             "Maior espera na fila por cliente", samples("max_wait_ms", 0.001)),
+            ("audioremote_admission_client_waiting", "gauge",
+             "Operações aguardando por cliente", samples("waiting")),
+        ]
@@ -0,0 +1,156 @@
+import os
+import time
+import hashlib
+import threading
+from functools import wraps
+from collections import OrderedDict
+from flask import Response, g, request, jsonify, make_response
+from credentials import SERVER_TOKEN_DEVICE
+
+# Respostas guardadas por Idempotency-Key
+IDEMPOTENCY_MAX_ENV = 'AUDIOREMOTE_IDEMPOTENCY_MAX'
+DEFAULT_IDEMPOTENCY_MAX = int(os.environ.get(IDEMPOTENCY_MAX_ENV, 1024))
+
+# Por quanto tempo (segundos) uma repetição recebe a resposta original
+IDEMPOTENCY_TTL_ENV = 'AUDIOREMOTE_IDEMPOTENCY_TTL'
+DEFAULT_IDEMPOTENCY_TTL = float(os.environ.get(IDEMPOTENCY_TTL_ENV, 300))
+
+IDEMPOTENCY_HEADER = "Idempotency-Key"
+REPLAYED_HEADER = "Idempotent-Replayed"
+MAX_KEY_LENGTH = 255
+
+
+class _Entry:
+    __slots__ = ("fingerprint", "expires", "response", "done")
+
+    def __init__(self, fingerprint, expires):
+        self.fingerprint = fingerprint
+        self.expires = expires
+        self.response = None
+        self.done = threading.Event()
+
+
+class IdempotencyCache:
+    """Cache LRU com TTL das respostas de rotas que alteram estado.
+
+    A primeira requisição com uma Idempotency-Key executa normalmente e
+    tem a resposta guardada; repetições com a mesma chave (mesmo
+    dispositivo, método, rota e corpo) recebem essa resposta sem executar
+    de novo. Chaves de dispositivos diferentes nunca colidem; clientes do
+    token do servidor, compartilhado, são separados pelo IP. Uma
+    repetição que chega enquanto a original ainda roda espera por ela.
+    Respostas 429 e 5xx não são guardadas, então a repetição executa de novo.
+    """
+
+    def __init__(self, max_entries=DEFAULT_IDEMPOTENCY_MAX, ttl=DEFAULT_IDEMPOTENCY_TTL, wait_timeout=10.0):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.wait_timeout = wait_timeout
+        self.stored = 0
+        self.hits = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.conflicts = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _begin(self, key, fingerprint):
+        """Retorna (entrada, True se esta requisição deve executar)"""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.expires <= now and entry.done.is_set():
+                del self._entries[key]
+                self.expirations += 1
+                entry = None
+            if entry is not None:
+                self._entries.move_to_end(key)
+                return entry, False
+
+            entry = _Entry(fingerprint, now + self.ttl)
+            self._entries[key] = entry
+            while len(self._entries) > self.max_entries:
+                _, oldest = self._entries.popitem(last=False)
+                if oldest.expires <= now:
+                    self.expirations += 1
+                else:
+                    self.evictions += 1
+            return entry, True
+
+    def _complete(self, key, entry, response):
+        if response is not None:
+            entry.response = (response.status_code, response.headers.get("Content-Type"), response.get_data())
+            with self._lock:
+                self.stored += 1
+        else:
+            with self._lock:
+                if self._entries.get(key) is entry:
+                    del self._entries[key]
+        # Libera as repetições que esperavam pela original
+        entry.done.set()
+
+    def _replay(self, entry):
+        status, content_type, body = entry.response
+        response = Response(body, status=status, content_type=content_type)
+        response.headers[REPLAYED_HEADER] = "true"
+        return response
+
+    @staticmethod
+    def _identity():
+        """Dono da chave: o dispositivo autenticado ou, no token do servidor, o IP"""
+        device = g.get("device")
+        if device is None or device is SERVER_TOKEN_DEVICE:
+            return request.remote_addr
+        return f"device:{device.id}"
+
+    def route(self, f):
+        """Decorator das rotas mutáveis (aplicado depois do require_auth)"""
+        @wraps(f)
+        def decorated(*args, **kwargs):
+            key = request.headers.get(IDEMPOTENCY_HEADER)
+            if key is None or request.method in ("GET", "HEAD"):
+                return f(*args, **kwargs)
+            if not key or len(key) > MAX_KEY_LENGTH:
+                return jsonify({"error": f"{IDEMPOTENCY_HEADER} inválida (1-{MAX_KEY_LENGTH} caracteres)"}), 400
+
+            scoped = (self._identity(), request.method, request.path, key)
+            fingerprint = hashlib.sha256(request.get_data()).digest()
+            while True:
+                entry, owner = self._begin(scoped, fingerprint)
+                if owner:
+                    break
+                if entry.fingerprint != fingerprint:
+                    with self._lock:
+                        self.conflicts += 1
+                    return jsonify({"error": f"{IDEMPOTENCY_HEADER} já usada com outro corpo"}), 422
+                if not entry.done.wait(self.wait_timeout):
+                    return jsonify({"error": "Requisição original ainda em andamento"}), 409
+                if entry.response is not None:
+                    with self._lock:
+                        self.hits += 1
+                    return self._replay(entry)
+                # A original falhou (5xx): esta repetição executa
+
+            try:
+                response = make_response(f(*args, **kwargs))
+            except Exception:
+                self._complete(scoped, entry, None)
+                raise
+            # 429 e 5xx são transitórios: a repetição deve executar de novo
+            cacheable = response.status_code < 500 and response.status_code != 429
+            self._complete(scoped, entry, response if cacheable else None)
+            return response
+
+        return decorated
+
+    def stats(self):
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl_s": self.ttl,
+            "stored": self.stored,
+            "hits": self.hits,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "conflicts": self.conflicts,
+        }
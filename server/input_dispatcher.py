@@ -0,0 +1,168 @@
+import os
+import time
+import logging
+import threading
+from collections import deque
+from metrics import stage_timer
+from tracing import current_trace
+
+logger = logging.getLogger(__name__)
+
+# Comandos aguardando injeção; acima disso a resposta é 503
+INPUT_QUEUE_SIZE_ENV = 'AUDIOREMOTE_INPUT_QUEUE_SIZE'
+DEFAULT_INPUT_QUEUE_SIZE = int(os.environ.get(INPUT_QUEUE_SIZE_ENV, 32))
+
+# Junta next/prev repetidos ainda na fila em um único item com contagem
+MERGE_SKIPS_ENV = 'AUDIOREMOTE_INPUT_MERGE_SKIPS'
+DEFAULT_MERGE_SKIPS = os.environ.get(MERGE_SKIPS_ENV, "1") != "0"
+
+# Tempo que um playpause espera na fila por um segundo toque que o anule
+# (um toque duplo acidental chega em ~100-200 ms; 0 só anula pares ainda na fila)
+PLAYPAUSE_WINDOW_ENV = 'AUDIOREMOTE_PLAYPAUSE_WINDOW_MS'
+DEFAULT_PLAYPAUSE_WINDOW = float(os.environ.get(PLAYPAUSE_WINDOW_ENV, 200)) / 1000
+
+SKIP_ACTIONS = ("next", "prev")
+
+
+class _Entry:
+    __slots__ = ("action", "count", "enqueued", "ready_at", "traces")
+
+    def __init__(self, action, enqueued, ready_at, trace=None):
+        self.action = action
+        self.count = 1
+        self.enqueued = enqueued
+        self.ready_at = ready_at
+        # Traces das requisições atendidas por este item (recebem key_injection)
+        self.traces = [trace] if trace is not None else []
+
+
+class InputDispatcher:
+    """Fila única de teclas de mídia atendida por uma thread dedicada.
+
+    As requisições só enfileiram (o HTTP responde 202 na hora) e uma
+    única thread injeta as teclas em ordem, sem intercalar eventos de
+    requisições concorrentes. Enquanto ainda estão na fila:
+
+    - next/prev repetidos viram um item com contagem (N pulos seguidos);
+    - dois playpause consecutivos se anulam. Com ``playpause_window`` > 0
+      cada playpause espera esse tempo antes de ser injetado, então um
+      toque duplo acidental não chega a pausar a música.
+    """
+
+    def __init__(self, keyboard, queue_size=DEFAULT_INPUT_QUEUE_SIZE, merge_skips=DEFAULT_MERGE_SKIPS,
+                 playpause_window=DEFAULT_PLAYPAUSE_WINDOW, metrics=None):
+        self.keyboard = keyboard
+        self.actions = keyboard.actions
+        self.queue_size = queue_size
+        self.merge_skips = merge_skips
+        self.playpause_window = playpause_window
+        self.metrics = metrics
+        self.submitted = 0
+        self.dispatched = 0
+        self.merged = 0
+        self.cancelled = 0
+        self.rejected = 0
+        self.failed = 0
+        self.max_queued = 0
+        self.last_dispatch_ms = None
+        self.max_dispatch_ms = 0.0
+        self._queue = deque()
+        self._closed = False
+        self._cond = threading.Condition()
+        self._thread = threading.Thread(target=self._run, name="input-dispatcher", daemon=True)
+        self._thread.start()
+
+    def submit(self, action):
+        """Enfileira a ação; False se a fila estiver cheia"""
+        now = time.monotonic()
+        with self._cond:
+            self.submitted += 1
+            last = self._queue[-1] if self._queue else None
+            if last is not None and last.action == action:
+                if self.merge_skips and action in SKIP_ACTIONS:
+                    last.count += 1
+                    self.merged += 1
+                    trace = current_trace()
+                    if trace is not None:
+                        last.traces.append(trace)
+                    return True
+                if action == "playpause":
+                    self._queue.pop()
+                    self.cancelled += 2
+                    return True
+
+            if len(self._queue) >= self.queue_size:
+                self.rejected += 1
+                return False
+            ready_at = now + self.playpause_window if action == "playpause" else now
+            self._queue.append(_Entry(action, now, ready_at, current_trace()))
+            self.max_queued = max(self.max_queued, len(self._queue))
+            self._cond.notify()
+        return True
+
+    def _next_entry(self):
+        with self._cond:
+            while not self._closed:
+                if not self._queue:
+                    self._cond.wait()
+                    continue
+                delay = self._queue[0].ready_at - time.monotonic()
+                if delay > 0:
+                    # Um segundo playpause pode anular o primeiro durante a espera
+                    self._cond.wait(delay)
+                    continue
+                return self._queue.popleft()
+            return None
+
+    def _run(self):
+        while True:
+            entry = self._next_entry()
+            if entry is None:
+                break
+            start = time.perf_counter()
+            try:
+                for _ in range(entry.count):
+                    with stage_timer(self.metrics, "key_injection"):
+                        self.keyboard.tap(entry.action)
+                    self.dispatched += 1
+            except Exception as e:
+                self.failed += 1
+                logger.error("❌ Erro ao executar comando %s: %s", entry.action, e, extra={"event": "command"})
+            # Chega ao trace depois da resposta 202
+            end = time.perf_counter()
+            for trace in entry.traces:
+                trace.add("key_injection", start, end)
+
+            # Latência do enfileiramento até a última tecla injetada
+            elapsed = time.monotonic() - entry.enqueued
+            if self.metrics is not None:
+                self.metrics.observe_stage("input_dispatch", elapsed)
+            self.last_dispatch_ms = round(elapsed * 1000, 3)
+            self.max_dispatch_ms = max(self.max_dispatch_ms, self.last_dispatch_ms)
+
+    def stats(self):
+        """Profundidade da fila, políticas aplicadas e latência de despacho"""
+        return {
+            "queued": len(self._queue),
+            "max_queued": self.max_queued,
+            "queue_size": self.queue_size,
+            "submitted": self.submitted,
+            "dispatched": self.dispatched,
+            "merged": self.merged,
+            "cancelled": self.cancelled,
+            "rejected": self.rejected,
+            "failed": self.failed,
+            "last_dispatch_ms": self.last_dispatch_ms,
+            "max_dispatch_ms": self.max_dispatch_ms,
+            "playpause_window_ms": round(self.playpause_window * 1000, 1),
+        }
+
+    def close(self, timeout=1.0):
+        """Injeta o que já está na fila (até ``timeout``) e para a thread"""
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while self._queue and time.monotonic() < deadline:
+                self._cond.wait(0.01)
+            self._closed = True
+            self._cond.notify_all()
+        self._thread.join(timeout=1)
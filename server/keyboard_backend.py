@@ -0,0 +1,92 @@
+import os
+import time
+import logging
+import threading
+from audio_backend import busy_wait
+
+logger = logging.getLogger(__name__)
+
+# Backend padrão (pode ser trocado por "fake" para rodar fora do Windows)
+KEYBOARD_BACKEND_ENV = 'AUDIOREMOTE_KEYBOARD_BACKEND'
+
+# Ações de mídia aceitas em /command/<action>
+MEDIA_ACTIONS = ("playpause", "next", "prev")
+
+
+class KeyboardBackend:
+    """Interface comum dos backends de injeção de teclas de mídia"""
+    name = "base"
+    actions = MEDIA_ACTIONS
+
+    def tap(self, action):
+        """Pressiona e solta a tecla de mídia da ação"""
+        raise NotImplementedError
+
+    def load(self):
+        """Carrega dependências antes da primeira tecla (opcional)"""
+
+    def close(self):
+        """Libera os recursos do backend"""
+
+
+class FakeKeyboardBackend(KeyboardBackend):
+    """Backend em memória, usado em testes e medições fora do Windows"""
+    name = "fake"
+
+    def __init__(self, latency=0.0, busy=0.0):
+        self.latency = latency
+        self.busy = busy
+        self.counts = dict.fromkeys(MEDIA_ACTIONS, 0)
+        self._lock = threading.Lock()
+
+    def tap(self, action):
+        if self.latency:
+            time.sleep(self.latency)
+        if self.busy:
+            busy_wait(self.busy)
+        with self._lock:
+            self.counts[action] += 1
+
+
+class PynputKeyboardBackend(KeyboardBackend):
+    """Teclas de mídia via pynput (importado só na primeira tecla)"""
+    name = "pynput"
+
+    def __init__(self):
+        self._controller = None
+        self._keymap = None
+        self._lock = threading.Lock()
+
+    def load(self):
+        with self._lock:
+            if self._controller is None:
+                from pynput.keyboard import Key, Controller
+
+                self._keymap = {
+                    "playpause": Key.media_play_pause,
+                    "next": Key.media_next,
+                    "prev": Key.media_previous,
+                }
+                self._controller = Controller()
+
+    def tap(self, action):
+        if self._controller is None:
+            self.load()
+        key = self._keymap[action]
+        self._controller.press(key)
+        self._controller.release(key)
+
+
+KEYBOARD_BACKENDS = {
+    "pynput": PynputKeyboardBackend,
+    "fake": FakeKeyboardBackend,
+}
+
+
+def create_keyboard_backend(name=None):
+    """Cria o backend de teclado configurado (padrão: pynput)"""
+    name = name or os.environ.get(KEYBOARD_BACKEND_ENV, "pynput")
+    if name not in KEYBOARD_BACKENDS:
+        raise ValueError(f"Backend de teclado desconhecido: {name}")
+    logger.info(f"⌨️ Backend de teclado: {name}")
+    return KEYBOARD_BACKENDS[name]()
@@ -0,0 +1,154 @@
+import os
+import json
+import time
+import queue
+import atexit
+import logging
+import threading
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+
+# Configuração do logging (variáveis de ambiente)
+LOG_JSON_ENV = 'AUDIOREMOTE_LOG_JSON'
+LOG_JSON_MAX_BYTES_ENV = 'AUDIOREMOTE_LOG_JSON_MAX_BYTES'
+LOG_JSON_BACKUPS_ENV = 'AUDIOREMOTE_LOG_JSON_BACKUPS'
+LOG_SAMPLE_ENV = 'AUDIOREMOTE_LOG_SAMPLE'
+
+CONSOLE_FORMAT = '%(asctime)s - %(levelname)s - %(message)s'
+
+# Eventos frequentes: máximo de registros por segundo (0 = sem amostragem)
+DEFAULT_SAMPLE_RATES = {"volume": 2}
+
+_listener = None
+
+
+class LazyQueueHandler(QueueHandler):
+    """QueueHandler que não formata a mensagem na thread da requisição.
+
+    A formatação (msg % args) fica para a thread do listener. Por isso os
+    argumentos do log não devem ser alterados depois da chamada.
+    """
+
+    def prepare(self, record):
+        return record
+
+
+class SamplingFilter(logging.Filter):
+    """Limita eventos frequentes (extra={"event": ...}) a N registros por segundo.
+
+    O registro que passa após um período amostrado recebe ``record.skipped``
+    com a quantidade omitida.
+    """
+
+    def __init__(self, rates):
+        super().__init__()
+        self.rates = {event: rate for event, rate in rates.items() if rate > 0}
+        self._windows = {}
+        self._lock = threading.Lock()
+
+    def filter(self, record):
+        event = getattr(record, "event", None)
+        rate = self.rates.get(event)
+        if rate is None:
+            return True
+
+        now = time.monotonic()
+        with self._lock:
+            start, count, skipped = self._windows.get(event, (now, 0, 0))
+            if now - start >= 1.0:
+                start, count = now, 0
+            if count >= rate:
+                self._windows[event] = (start, count, skipped + 1)
+                return False
+            self._windows[event] = (start, count + 1, 0)
+
+        if skipped:
+            record.skipped = skipped
+        return True
+
+
+class JsonLinesFormatter(logging.Formatter):
+    """Um objeto JSON por linha"""
+
+    def format(self, record):
+        entry = {
+            "ts": round(record.created, 3),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        for field in ("event", "skipped", "client"):
+            value = getattr(record, field, None)
+            if value is not None:
+                entry[field] = value
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False)
+
+
+class SkippedCountFormatter(logging.Formatter):
+    """Formatter de texto que indica quantos registros a amostragem omitiu"""
+
+    def format(self, record):
+        text = super().format(record)
+        skipped = getattr(record, "skipped", None)
+        if skipped:
+            text = f"{text} (+{skipped} omitidos)"
+        return text
+
+
+def parse_sample_rates(value):
+    """Converte "volume=2,ws=5" em {"volume": 2.0, "ws": 5.0}"""
+    rates = dict(DEFAULT_SAMPLE_RATES)
+    for item in filter(None, (value or "").split(",")):
+        event, _, rate = item.partition("=")
+        rates[event.strip()] = float(rate)
+    return rates
+
+
+def setup_logging(level=logging.INFO, json_path=None, sample_rates=None):
+    """Configura o logging assíncrono compartilhado pelos dois servidores.
+
+    As chamadas de log só enfileiram o registro; uma thread em segundo
+    plano formata e grava no console e, opcionalmente, em um arquivo
+    JSON-lines com rotação.
+    """
+    global _listener
+    if _listener is not None:
+        return _listener
+
+    handlers = []
+    console = logging.StreamHandler()
+    console.setFormatter(SkippedCountFormatter(CONSOLE_FORMAT))
+    handlers.append(console)
+
+    json_path = json_path or os.environ.get(LOG_JSON_ENV)
+    if json_path:
+        json_handler = RotatingFileHandler(
+            json_path,
+            maxBytes=int(os.environ.get(LOG_JSON_MAX_BYTES_ENV, 5 * 1024 * 1024)),
+            backupCount=int(os.environ.get(LOG_JSON_BACKUPS_ENV, 3)),
+            encoding="utf-8",
+        )
+        json_handler.setFormatter(JsonLinesFormatter())
+        handlers.append(json_handler)
+
+    log_queue = queue.SimpleQueue()
+    queue_handler = LazyQueueHandler(log_queue)
+    queue_handler.addFilter(SamplingFilter(
+        sample_rates if sample_rates is not None else parse_sample_rates(os.environ.get(LOG_SAMPLE_ENV))
+    ))
+
+    root = logging.getLogger()
+    root.handlers[:] = [queue_handler]
+    root.setLevel(level)
+
+    _listener = QueueListener(log_queue, *handlers, respect_handler_level=True)
+    _listener.start()
+    atexit.register(_listener.stop)
+    return _listener
+
+
+def add_log_handler(handler):
+    """Adiciona um handler ao listener (executa fora da thread da requisição)"""
+    listener = setup_logging()
+    listener.handlers = listener.handlers + (handler,)
@@ -0,0 +1,272 @@
+import os
+import time
+from contextlib import contextmanager
+from audio_backend import AudioBackendError
+from volume_scheduler import VolumeChange
+from ramp_engine import CURVES, MAX_RAMP_DURATION, MAX_RAMP_DELAY
+from fair_gate import PRIORITY_TRANSPORT, PRIORITY_VOLUME, QUEUE_FULL, TIMEOUT
+from tracing import span
+
+# Limites do /batch
+MAX_BATCH_SIZE = 32
+MAX_WAIT_MS = 2000
+MAX_BATCH_WAIT_MS = 5000
+
+# Passo de {"step": "up"/"down"} em pontos percentuais
+VOLUME_STEP_ENV = 'AUDIOREMOTE_VOLUME_STEP'
+DEFAULT_VOLUME_STEP = float(os.environ.get(VOLUME_STEP_ENV, 5))
+
+
+class ControlError(Exception):
+    """Erro de uma operação de controle, com o status HTTP equivalente"""
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.message = message
+        self.status = status
+
+
+class MediaController:
+    """Operações de controle compartilhadas por REST, WebSocket e /batch.
+
+    Cada operação retorna ``(mensagem, status)`` e lança ControlError
+    quando a requisição é inválida ou o backend falha. ``client`` (o IP)
+    identifica quem pediu para a admissão justa do FairGate.
+    """
+
+    def __init__(self, input_dispatcher, volume_scheduler, metrics=None, volume_step=DEFAULT_VOLUME_STEP, sessions=None,
+                 ramps=None, gate=None):
+        self.input_dispatcher = input_dispatcher
+        self.volume_scheduler = volume_scheduler
+        self.sessions = sessions
+        self.ramps = ramps
+        self.gate = gate
+        self.metrics = metrics
+        self.volume_step = volume_step
+
+    @contextmanager
+    def admitted(self, client, priority):
+        """Executa o bloco na vez do cliente no FairGate"""
+        if self.gate is None:
+            yield
+            return
+        client = client or "local"
+        with span("admission"):
+            status = self.gate.acquire(client, priority)
+        if status == QUEUE_FULL:
+            raise ControlError("Muitas operações pendentes deste cliente", 429)
+        if status == TIMEOUT:
+            raise ControlError("Servidor ocupado, tente novamente", 503)
+        try:
+            yield
+        finally:
+            self.gate.release(client)
+
+    def command(self, action, client=None):
+        """Enfileira a tecla de mídia no InputDispatcher (202, injetada em seguida)"""
+        if action not in self.input_dispatcher.actions:
+            raise ControlError("Comando inválido", 400)
+
+        with self.admitted(client, PRIORITY_TRANSPORT), span("backend"):
+            accepted = self.input_dispatcher.submit(action)
+        if not accepted:
+            raise ControlError("Fila de comandos cheia", 503)
+        return f"{action} enviado", 202
+
+    def validate_volume(self, level):
+        if level is None:
+            raise ControlError("Nível de volume não fornecido", 400)
+        if isinstance(level, bool) or not isinstance(level, (int, float)) or not (0 <= level <= 100):
+            raise ControlError("Nível de volume inválido (0-100)", 400)
+
+    def parse_volume_change(self, data):
+        """Valida um ajuste ({"level"}, {"delta"}, {"step"} e/ou {"mute"}) e monta a VolumeChange"""
+        if not isinstance(data, dict):
+            raise ControlError("Nível de volume não fornecido", 400)
+        level, delta, step, mute = (data.get(key) for key in ("level", "delta", "step", "mute"))
+        if level is None and delta is None and step is None and mute is None:
+            raise ControlError("Nível de volume não fornecido", 400)
+
+        if sum(value is not None for value in (level, delta, step)) > 1:
+            raise ControlError("Use apenas um entre level, delta e step", 400)
+        if level is not None:
+            self.validate_volume(level)
+        if delta is not None and (isinstance(delta, bool) or not isinstance(delta, (int, float)) or not (-100 <= delta <= 100)):
+            raise ControlError("Delta de volume inválido (-100 a 100)", 400)
+        if step is not None and step not in ("up", "down"):
+            raise ControlError('Passo de volume inválido ("up" ou "down")', 400)
+        if mute is not None and not (isinstance(mute, bool) or mute == "toggle"):
+            raise ControlError('Mudo inválido (true, false ou "toggle")', 400)
+
+        if step is not None:
+            delta = self.volume_step if step == "up" else -self.volume_step
+        if level is None and mute is None and not delta:
+            raise ControlError("Ajuste de volume sem efeito (delta 0)", 400)
+        return VolumeChange(level=level, delta=delta or 0.0, mute=mute)
+
+    def change_volume(self, data, client=None):
+        """Agenda um ajuste de volume/mudo no VolumeScheduler.
+
+        Ajustes relativos e de mudo são combinados no servidor, então
+        botões de +/- em vários clientes ao mesmo tempo não perdem passos.
+        """
+        change = self.parse_volume_change(data)
+        with self.admitted(client, PRIORITY_VOLUME):
+            if change.sets_volume and self.ramps is not None:
+                # Ajuste manual vence a rampa em andamento
+                self.ramps.cancel("interrupted")
+            with span("backend"):
+                result = self.volume_scheduler.submit(change)
+        level = change.level
+        relative = level is None or change.mute is not None
+
+        if result.status == "failed":
+            raise ControlError(f"Erro ao ajustar o volume: {str(result.error)}", 500)
+
+        if result.status == "cancelled":
+            raise ControlError("Servidor encerrando, ajuste de volume cancelado", 503)
+
+        if result.status == "pending":
+            return ("Ajuste de volume agendado" if relative else f"Volume {level}% agendado"), 202
+
+        if result.status == "superseded":
+            # Substituído por um ajuste mais recente (arrastar do slider)
+            if relative:
+                return "Ajuste de volume substituído por ajuste mais recente", 202
+            return f"Volume {level}% substituído por ajuste mais recente", 202
+
+        if not relative:
+            return f"Volume ajustado para {level}%", 200
+        return describe_state(change, result.state, result.changed), 200
+
+    def start_ramp(self, data, client=None):
+        """Valida e agenda uma rampa ({"level", "duration", "curve", "delay", "then"})"""
+        if self.ramps is None:
+            raise ControlError("Rampas de volume indisponíveis", 501)
+        if not isinstance(data, dict):
+            raise ControlError("Nível de volume não fornecido", 400)
+
+        level = data.get("level")
+        self.validate_volume(level)
+        duration = data.get("duration")
+        if isinstance(duration, bool) or not isinstance(duration, (int, float)) or not (0 <= duration <= MAX_RAMP_DURATION):
+            raise ControlError(f"Duração inválida (0-{MAX_RAMP_DURATION} s)", 400)
+        delay = data.get("delay", 0)
+        if isinstance(delay, bool) or not isinstance(delay, (int, float)) or not (0 <= delay <= MAX_RAMP_DELAY):
+            raise ControlError(f"Atraso inválido (0-{MAX_RAMP_DELAY} s)", 400)
+        curve = data.get("curve", "linear")
+        if curve not in CURVES:
+            raise ControlError(f"Curva inválida ({', '.join(CURVES)})", 400)
+        then = data.get("then")
+        if then is not None and then not in self.input_dispatcher.actions:
+            raise ControlError("Comando final inválido", 400)
+
+        with self.admitted(client, PRIORITY_VOLUME):
+            return self.ramps.start(level, duration, curve, delay, then)
+
+    def change_session(self, key, data, client=None):
+        """Ajusta volume/mudo de um aplicativo (PID ou nome do processo).
+
+        Aceita o mesmo corpo de /volume; um nome com várias sessões (ex.:
+        um navegador com vários processos) ajusta todas.
+        """
+        change = self.parse_volume_change(data)
+        if self.sessions is None:
+            raise ControlError("Sessões de áudio indisponíveis", 501)
+        try:
+            with self.admitted(client, PRIORITY_VOLUME), span("backend"):
+                sessions = self.sessions.find(key)
+                if not sessions:
+                    raise ControlError("Sessão de áudio não encontrada", 404)
+                results = self.sessions.apply_change(sessions, change)
+        except AudioBackendError as e:
+            raise ControlError(f"Erro ao ajustar a sessão: {str(e)}", 500) from e
+
+        state, changed = results[0]
+        return f"{state['name']}: {describe_state(change, state, changed)}", 200
+
+    def set_volume(self, level, client=None):
+        """Agenda o volume absoluto (0-100) no VolumeScheduler"""
+        return self.change_volume({"level": level}, client)
+
+    def validate(self, operation):
+        """Valida uma operação no formato {"op": ..., ...} sem executá-la"""
+        if not isinstance(operation, dict):
+            raise ControlError("Operação inválida", 400)
+
+        op = operation.get("op")
+        if op == "cmd":
+            if operation.get("action") not in self.input_dispatcher.actions:
+                raise ControlError("Comando inválido", 400)
+        elif op == "vol":
+            self.parse_volume_change(operation)
+        elif op == "wait":
+            ms = operation.get("ms")
+            if isinstance(ms, bool) or not isinstance(ms, (int, float)) or not (0 <= ms <= MAX_WAIT_MS):
+                raise ControlError(f"Espera inválida (0-{MAX_WAIT_MS} ms)", 400)
+        elif op != "ping":
+            raise ControlError("Operação inválida", 400)
+
+    def execute(self, operation, client=None):
+        """Valida e executa uma operação, retornando (mensagem, status)"""
+        self.validate(operation)
+        op = operation["op"]
+        if op == "cmd":
+            return self.command(operation["action"], client)
+        if op == "vol":
+            return self.change_volume(operation, client)
+        if op == "wait":
+            time.sleep(operation["ms"] / 1000)
+            return f"Aguardou {operation['ms']} ms", 200
+        return "pong", 200
+
+    def run_batch(self, operations, stop_on_error=True, client=None):
+        """Valida o lote inteiro e executa as operações em ordem.
+
+        Retorna um resultado por operação com status e tempo em ms; após a
+        primeira falha as demais são marcadas como "skipped" se stop_on_error.
+        """
+        if not isinstance(operations, list) or not operations:
+            raise ControlError("Lista de operações não fornecida", 400)
+        if len(operations) > MAX_BATCH_SIZE:
+            raise ControlError(f"Lote muito grande (máximo {MAX_BATCH_SIZE})", 400)
+
+        for index, operation in enumerate(operations):
+            try:
+                self.validate(operation)
+            except ControlError as e:
+                raise ControlError(f"Operação {index}: {e.message}", e.status) from e
+
+        total_wait = sum(op["ms"] for op in operations if op["op"] == "wait")
+        if total_wait > MAX_BATCH_WAIT_MS:
+            raise ControlError(f"Espera total do lote acima de {MAX_BATCH_WAIT_MS} ms", 400)
+
+        results = []
+        failed = False
+        for operation in operations:
+            if failed and stop_on_error:
+                results.append({"op": operation["op"], "ok": False, "status": None, "skipped": True})
+                continue
+
+            start = time.perf_counter()
+            try:
+                text, status = self.execute(operation, client)
+                result = {"op": operation["op"], "ok": True, "status": status, "msg": text}
+            except ControlError as e:
+                failed = True
+                result = {"op": operation["op"], "ok": False, "status": e.status, "error": e.message}
+            result["ms"] = round((time.perf_counter() - start) * 1000, 3)
+            results.append(result)
+        return results
+
+
+def describe_state(change, state, changed):
+    """Mensagem de resposta de um ajuste relativo ou de mudo"""
+    parts = []
+    if change.sets_volume or change.mute is None:
+        volume = f"{round(state['volume'], 1):g}"
+        parts.append(f"Volume ajustado para {volume}%" if changed else f"Volume mantido em {volume}%")
+    if change.mute is not None:
+        parts.append("áudio mudo" if state["muted"] else "áudio ativado")
+    message = ", ".join(parts)
+    return message[0].upper() + message[1:]
@@ -0,0 +1,217 @@
+import time
+import bisect
+import threading
+from contextlib import contextmanager, nullcontext
+from flask import g, request
+
+# Limites dos buckets de latência (segundos)
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+
+class Histogram:
+    """Histograma de buckets fixos (acumulados só na exportação)"""
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q):
+        """Estimativa do quantil por interpolação dentro do bucket"""
+        if not self.count:
+            return None
+        target = q * self.count
+        seen = 0
+        for index, count in enumerate(self.counts):
+            if count and seen + count >= target:
+                lower = self.buckets[index - 1] if index > 0 else 0.0
+                upper = self.buckets[index] if index < len(self.buckets) else self.buckets[-1]
+                return lower + (upper - lower) * (target - seen) / count
+            seen += count
+        return self.buckets[-1]
+
+
+def _escape(value):
+    """Escapa barra invertida, aspas e quebra de linha (formato texto do Prometheus)"""
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(labels):
+    if not labels:
+        return ""
+    pairs = ",".join(f'{key}="{_escape(value)}"' for key, value in labels.items())
+    return "{" + pairs + "}"
+
+
+def _format_value(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class MetricsRegistry:
+    """Contadores e histogramas de latência por rota e por backend.
+
+    Cada observação custa um lock e um bisect. Componentes com contadores
+    próprios (agendador de volume, filtro de auth...) entram via
+    ``add_collector``, lido só na exportação.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._requests = {}
+        self._errors = {}
+        self._request_latency = {}
+        self._stage_latency = {}
+        self._stage_errors = {}
+        self._collectors = []
+
+    def observe_request(self, route, method, status, seconds):
+        with self._lock:
+            key = (route, method, status)
+            self._requests[key] = self._requests.get(key, 0) + 1
+            if status >= 400:
+                self._errors[(route, method)] = self._errors.get((route, method), 0) + 1
+            histogram = self._request_latency.get((route, method))
+            if histogram is None:
+                histogram = self._request_latency[(route, method)] = Histogram()
+            histogram.observe(seconds)
+
+    def observe_stage(self, stage, seconds, error=False):
+        with self._lock:
+            histogram = self._stage_latency.get(stage)
+            if histogram is None:
+                histogram = self._stage_latency[stage] = Histogram()
+            histogram.observe(seconds)
+            if error:
+                self._stage_errors[stage] = self._stage_errors.get(stage, 0) + 1
+
+    @contextmanager
+    def time_stage(self, stage):
+        """Mede um trecho (auth, key_injection, audio_endpoint...)"""
+        start = time.perf_counter()
+        error = False
+        try:
+            yield
+        except Exception:
+            error = True
+            raise
+        finally:
+            self.observe_stage(stage, time.perf_counter() - start, error)
+
+    def add_collector(self, collector):
+        """Registra uma função que retorna [(nome, tipo, ajuda, [(labels, valor)])]"""
+        self._collectors.append(collector)
+
+    def render_prometheus(self):
+        """Exporta tudo no formato texto do Prometheus"""
+        with self._lock:
+            requests = dict(self._requests)
+            errors = dict(self._errors)
+            request_latency = {key: (list(h.counts), h.sum, h.count) for key, h in self._request_latency.items()}
+            stage_latency = {key: (list(h.counts), h.sum, h.count) for key, h in self._stage_latency.items()}
+            stage_errors = dict(self._stage_errors)
+
+        lines = []
+
+        def family(name, kind, help_text, samples):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for labels, value in samples:
+                lines.append(f"{name}{_labels(labels)} {_format_value(value)}")
+
+        def histogram_family(name, help_text, histograms, label_names):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} histogram")
+            for key, (counts, total, count) in sorted(histograms.items()):
+                labels = dict(zip(label_names, key if isinstance(key, tuple) else (key,)))
+                cumulative = 0
+                for bound, bucket_count in zip(DEFAULT_BUCKETS, counts):
+                    cumulative += bucket_count
+                    lines.append(f"{name}_bucket{_labels(dict(labels, le=bound))} {cumulative}")
+                lines.append(f"{name}_bucket{_labels(dict(labels, le='+Inf'))} {count}")
+                lines.append(f"{name}_sum{_labels(labels)} {total!r}")
+                lines.append(f"{name}_count{_labels(labels)} {count}")
+
+        family("audioremote_requests_total", "counter", "Requisições HTTP por rota, método e status",
+               [({"route": r, "method": m, "status": s}, v) for (r, m, s), v in sorted(requests.items())])
+        family("audioremote_request_errors_total", "counter", "Requisições HTTP com status >= 400",
+               [({"route": r, "method": m}, v) for (r, m), v in sorted(errors.items())])
+        histogram_family("audioremote_request_duration_seconds", "Latência das requisições HTTP",
+                         request_latency, ("route", "method"))
+        histogram_family("audioremote_stage_duration_seconds", "Latência por etapa/backend",
+                         stage_latency, ("stage",))
+        family("audioremote_stage_errors_total", "counter", "Falhas por etapa/backend",
+               [({"stage": stage}, v) for stage, v in sorted(stage_errors.items())])
+
+        for collector in self._collectors:
+            for name, kind, help_text, samples in collector():
+                family(name, kind, help_text, samples)
+
+        return "\n".join(lines) + "\n"
+
+    def summary(self):
+        """Resumo compacto para a interface: contagem, erros e p50/p99 em ms"""
+        def describe(histogram, errors):
+            p50 = histogram.quantile(0.5)
+            p99 = histogram.quantile(0.99)
+            return {
+                "count": histogram.count,
+                "errors": errors,
+                "p50_ms": round(p50 * 1000, 2) if p50 is not None else None,
+                "p99_ms": round(p99 * 1000, 2) if p99 is not None else None,
+            }
+
+        with self._lock:
+            routes = {
+                f"{method} {route}": describe(h, self._errors.get((route, method), 0))
+                for (route, method), h in self._request_latency.items()
+            }
+            stages = {
+                stage: describe(h, self._stage_errors.get(stage, 0))
+                for stage, h in self._stage_latency.items()
+            }
+        return {"routes": routes, "stages": stages}
+
+
+def stage_timer(metrics, stage):
+    """time_stage quando há registry, senão um contexto vazio"""
+    return metrics.time_stage(stage) if metrics is not None else nullcontext()
+
+
+def stats_collector(prefix, stats):
+    """Exporta os valores numéricos de um stats() como métricas prefix_<chave>"""
+
+    def collect():
+        values = stats() or {}
+        return [
+            (f"{prefix}_{key}", "untyped", key.replace("_", " "), [({}, value)])
+            for key, value in values.items()
+            if isinstance(value, (int, float)) and not isinstance(value, bool)
+        ]
+
+    return collect
+
+
+def instrument_app(app, metrics, exclude=("/ws",)):
+    """Mede latência, contagem e erros de cada rota do app Flask.
+
+    Rotas de conexão longa (WebSocket) ficam de fora do histograma.
+    """
+
+    @app.before_request
+    def start_request_timer():
+        if request.path not in exclude:
+            g.metrics_start = time.perf_counter()
+
+    @app.after_request
+    def observe_request(response):
+        start = g.pop("metrics_start", None)
+        if start is not None:
+            route = request.url_rule.rule if request.url_rule else "<unmatched>"
+            metrics.observe_request(route, request.method, response.status_code, time.perf_counter() - start)
+        return response
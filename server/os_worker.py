@@ -0,0 +1,524 @@
+import os
+import time
+import atexit
+import queue
+import pickle
+import struct
+import logging
+import itertools
+import threading
+import multiprocessing
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+from audio_backend import AudioBackend, AudioBackendError, AUDIO_BACKEND_ENV, AUDIO_BACKENDS
+from keyboard_backend import KeyboardBackend, KEYBOARD_BACKEND_ENV, KEYBOARD_BACKENDS
+
+logger = logging.getLogger(__name__)
+
+# Onde rodam os backends de SO: "inline" (no processo do servidor) ou "process"
+OS_WORKER_ENV = 'AUDIOREMOTE_OS_WORKER'
+DEFAULT_OS_WORKER = os.environ.get(OS_WORKER_ENV, "inline")
+
+# Canal com o processo auxiliar: "shm" (anel em memória compartilhada) ou "pipe"
+OS_WORKER_TRANSPORT_ENV = 'AUDIOREMOTE_OS_WORKER_TRANSPORT'
+DEFAULT_OS_WORKER_TRANSPORT = os.environ.get(OS_WORKER_TRANSPORT_ENV, "shm")
+
+# Bytes de cada anel (um por sentido)
+RING_SIZE = 256 * 1024
+
+# Espera antes de cada reinício seguido do processo auxiliar (segundos)
+RESTART_DELAYS = (0.1, 0.5, 1.0, 2.0, 5.0)
+# Um processo que durou mais que isso zera a sequência de falhas
+STABLE_AFTER = 30.0
+
+
+class OSWorkerError(AudioBackendError):
+    """O processo auxiliar caiu, está reiniciando ou não respondeu"""
+
+
+class ShmRing:
+    """Fila de mensagens de um produtor e um consumidor em memória compartilhada.
+
+    Cabeçalho com dois contadores de bytes (escritos e lidos, cada um
+    alterado por um só lado) seguido do anel com registros
+    ``tamanho + dados``. O semáforo conta os registros prontos, então o
+    consumidor dorme nele em vez de testar o anel. Threads do mesmo lado
+    produtor devem usar ``lock``.
+    """
+    HEADER = struct.Struct("<QQ")
+    LENGTH = struct.Struct("<I")
+
+    def __init__(self, items, size=RING_SIZE, name=None):
+        from multiprocessing import shared_memory
+
+        self.items = items
+        self.capacity = size
+        if name is None:
+            self.shm = shared_memory.SharedMemory(create=True, size=self.HEADER.size + size)
+            self.HEADER.pack_into(self.shm.buf, 0, 0, 0)
+            self.owner = True
+        else:
+            self.shm = _attach_shared_memory(name)
+            self.owner = False
+        self.lock = threading.Lock()
+
+    def __getstate__(self):
+        # Vai para o processo auxiliar só com o nome do segmento
+        return {"items": self.items, "size": self.capacity, "name": self.shm.name}
+
+    def __setstate__(self, state):
+        self.__init__(state["items"], state["size"], state["name"])
+
+    def _write(self, position, data):
+        start = self.HEADER.size + position % self.capacity
+        first = min(len(data), self.HEADER.size + self.capacity - start)
+        buf = self.shm.buf
+        buf[start:start + first] = data[:first]
+        if first < len(data):
+            buf[self.HEADER.size:self.HEADER.size + len(data) - first] = data[first:]
+
+    def _read(self, position, length):
+        start = self.HEADER.size + position % self.capacity
+        first = min(length, self.HEADER.size + self.capacity - start)
+        buf = self.shm.buf
+        data = bytes(buf[start:start + first])
+        if first < length:
+            data += bytes(buf[self.HEADER.size:self.HEADER.size + length - first])
+        return data
+
+    def put(self, data, timeout=5.0):
+        record = self.LENGTH.pack(len(data)) + data
+        if len(record) > self.capacity:
+            raise ValueError(f"Mensagem de {len(data)} bytes maior que o anel")
+        deadline = time.monotonic() + timeout
+        with self.lock:
+            while True:
+                written, read = self.HEADER.unpack_from(self.shm.buf, 0)
+                if self.capacity - (written - read) >= len(record):
+                    break
+                # Anel cheio: o consumidor está atrasado
+                if time.monotonic() >= deadline:
+                    raise queue.Full
+                time.sleep(0.0005)
+            self._write(written, record)
+            struct.pack_into("<Q", self.shm.buf, 0, written + len(record))
+        self.items.release()
+
+    def get(self, timeout=None):
+        """Próxima mensagem ou None após ``timeout``"""
+        if not self.items.acquire(timeout=timeout):
+            return None
+        read = struct.unpack_from("<Q", self.shm.buf, 8)[0]
+        length = self.LENGTH.unpack(self._read(read, self.LENGTH.size))[0]
+        data = self._read(read + self.LENGTH.size, length)
+        struct.pack_into("<Q", self.shm.buf, 8, read + self.LENGTH.size + length)
+        return data
+
+    def close(self):
+        self.shm.close()
+        if self.owner:
+            try:
+                self.shm.unlink()
+            except FileNotFoundError:
+                pass
+
+
+class PipeChannel:
+    """Mesma interface do ShmRing sobre um multiprocessing.Pipe (alternativa)"""
+
+    def __init__(self, reader, writer):
+        self.reader = reader
+        self.writer = writer
+        self.lock = threading.Lock()
+
+    def __getstate__(self):
+        return {"reader": self.reader, "writer": self.writer}
+
+    def __setstate__(self, state):
+        self.__init__(state["reader"], state["writer"])
+
+    def put(self, data, timeout=5.0):
+        with self.lock:
+            self.writer.send_bytes(data)
+
+    def get(self, timeout=None):
+        try:
+            if not self.reader.poll(timeout):
+                return None
+            return self.reader.recv_bytes()
+        except (EOFError, OSError):
+            return None
+
+    def close(self):
+        for connection in (self.reader, self.writer):
+            connection.close()
+
+
+def _attach_shared_memory(name):
+    """Abre no processo auxiliar o segmento criado (e apagado) pelo servidor"""
+    from multiprocessing import shared_memory
+
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        # Python < 3.13: com spawn o resource_tracker é o mesmo do servidor,
+        # então o registro repetido é desfeito pelo unlink do servidor
+        return shared_memory.SharedMemory(name=name)
+
+
+def create_channels(context, transport):
+    """(pedidos, respostas) no transporte pedido; cai para pipe sem memória compartilhada"""
+    if transport == "shm":
+        try:
+            return ShmRing(context.Semaphore(0)), ShmRing(context.Semaphore(0)), "shm"
+        except (ImportError, OSError) as e:
+            logger.warning(f"Memória compartilhada indisponível ({e}); usando pipe")
+    elif transport != "pipe":
+        raise ValueError(f"Transporte desconhecido: {transport}")
+    request_reader, request_writer = context.Pipe(duplex=False)
+    result_reader, result_writer = context.Pipe(duplex=False)
+    return PipeChannel(request_reader, request_writer), PipeChannel(result_reader, result_writer), "pipe"
+
+
+def worker_main(requests, results, audio_name, keyboard_name, audio_options, keyboard_options):
+    """Processo auxiliar: executa as chamadas aos backends e envia os resultados.
+
+    Teclado e áudio têm uma thread cada, então uma chamada COM lenta não
+    atrasa as teclas. Avisos de volume e de sessões voltam como eventos.
+    """
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - os-worker - %(levelname)s - %(message)s')
+    from concurrent.futures import ThreadPoolExecutor
+
+    targets = {
+        "audio": AUDIO_BACKENDS[audio_name](**audio_options),
+        "keyboard": KEYBOARD_BACKENDS[keyboard_name](**keyboard_options),
+    }
+    executors = {name: ThreadPoolExecutor(max_workers=1, thread_name_prefix=name) for name in targets}
+
+    def send(message):
+        try:
+            results.put(pickle.dumps(message, protocol=pickle.HIGHEST_PROTOCOL))
+        except Exception as e:
+            logger.error(f"Falha ao responder ao servidor: {e}")
+
+    def run(call_id, target, method, args):
+        try:
+            value = getattr(targets[target], method)(*args)
+        except Exception as e:
+            send(("error", call_id, (type(e).__name__, str(e))))
+        else:
+            send(("result", call_id, value))
+
+    targets["audio"].subscribe(lambda volume, muted: send(("event", None, ("volume", (volume, muted)))))
+    targets["audio"].subscribe_sessions(lambda event, session: send(("event", None, ("session", (event, session)))))
+
+    parent = multiprocessing.parent_process()
+    while True:
+        data = requests.get(timeout=1.0)
+        if data is None:
+            if parent is not None and not parent.is_alive():
+                break
+            continue
+        call_id, target, method, args = pickle.loads(data)
+        if target is None:
+            # Pedido de encerramento
+            break
+        executors[target].submit(run, call_id, target, method, args)
+
+    for name, executor in executors.items():
+        executor.shutdown(wait=True)
+        targets[name].close()
+
+
+class _Generation:
+    """Um processo auxiliar e seus canais (trocados a cada reinício)"""
+
+    def __init__(self, number, process, requests, results, transport):
+        self.number = number
+        self.process = process
+        self.requests = requests
+        self.results = results
+        self.transport = transport
+        self.started_at = time.monotonic()
+        self.stopped = False
+
+
+class OSWorker:
+    """Backends de teclado e áudio em um processo auxiliar persistente.
+
+    O Tk, as threads do Flask e as chamadas pycaw/pynput deixam de dividir
+    o mesmo GIL: o servidor só serializa o pedido no anel e uma thread
+    leitora entrega as respostas (``submit`` retorna um Future). O
+    processo sobe na primeira chamada e, se cair, as chamadas pendentes
+    falham com OSWorkerError e ele é reiniciado com espera crescente; os
+    listeners recebem o aviso de "reset" para reler o estado.
+    """
+
+    def __init__(self, audio=None, keyboard=None, audio_options=None, keyboard_options=None,
+                 transport=DEFAULT_OS_WORKER_TRANSPORT, timeout=10.0, metrics=None):
+        self.audio_name = audio or os.environ.get(AUDIO_BACKEND_ENV, "pycaw")
+        self.keyboard_name = keyboard or os.environ.get(KEYBOARD_BACKEND_ENV, "pynput")
+        if self.audio_name not in AUDIO_BACKENDS:
+            raise ValueError(f"Backend de áudio desconhecido: {self.audio_name}")
+        if self.keyboard_name not in KEYBOARD_BACKENDS:
+            raise ValueError(f"Backend de teclado desconhecido: {self.keyboard_name}")
+        self.audio_options = audio_options or {}
+        self.keyboard_options = keyboard_options or {}
+        self.transport = transport
+        self.timeout = timeout
+        self.metrics = metrics
+        self.calls = 0
+        self.failed = 0
+        self.timeouts = 0
+        self.events = 0
+        self.restarts = 0
+        self.max_call_ms = 0.0
+        self._context = multiprocessing.get_context("spawn")
+        self._generation = None
+        self._generations = itertools.count(1)
+        self._crashes = 0
+        self._next_start = 0.0
+        self._ids = itertools.count(1)
+        self._pending = {}
+        self._listeners = {"volume": (), "session": ()}
+        self._closed = False
+        self._lock = threading.Lock()
+        self._atexit = False
+
+    def add_listener(self, channel, listener):
+        """listener(*args) para eventos "volume" ou "session" vindos do processo"""
+        self._listeners[channel] = self._listeners[channel] + (listener,)
+
+    def _spawn(self):
+        # Chamado com o lock
+        requests, results, transport = create_channels(self._context, self.transport)
+        process = self._context.Process(
+            target=worker_main, name="audioremote-os-worker", daemon=True,
+            args=(requests, results, self.audio_name, self.keyboard_name, self.audio_options, self.keyboard_options),
+        )
+        process.start()
+        if not self._atexit:
+            # Registrado depois do atexit do multiprocessing (importado pelo start()),
+            # roda antes dele: o processo sai sem ser morto e sem disparar um reinício
+            atexit.register(self.close)
+            self._atexit = True
+        generation = _Generation(next(self._generations), process, requests, results, transport)
+        threading.Thread(target=self._read, args=(generation,), name="os-worker-reader", daemon=True).start()
+        threading.Thread(target=self._monitor, args=(generation,), name="os-worker-monitor", daemon=True).start()
+        logger.info(f"🧩 Processo auxiliar iniciado (pid {process.pid}, {transport})")
+        return generation
+
+    def start(self):
+        """Sobe o processo auxiliar, se ainda não estiver rodando"""
+        with self._lock:
+            if self._closed:
+                raise OSWorkerError("Processo auxiliar encerrado")
+            if self._generation is None:
+                if time.monotonic() < self._next_start:
+                    raise OSWorkerError("Processo auxiliar reiniciando")
+                self._generation = self._spawn()
+            return self._generation
+
+    def submit(self, target, method, *args):
+        """Envia a chamada ao processo auxiliar e retorna um Future com o resultado"""
+        generation = self.start()
+        call_id = next(self._ids)
+        future = Future()
+        future.started = time.perf_counter()
+        future.generation = generation
+        self._pending[call_id] = future
+        self.calls += 1
+        try:
+            generation.requests.put(pickle.dumps((call_id, target, method, args), protocol=pickle.HIGHEST_PROTOCOL))
+        except Exception as e:
+            self._pending.pop(call_id, None)
+            self.failed += 1
+            raise OSWorkerError(f"Falha ao enviar ao processo auxiliar: {e}") from e
+        if generation.stopped and self._pending.pop(call_id, None) is not None:
+            # O processo caiu entre o envio e o registro do pedido
+            future.set_exception(OSWorkerError("Processo auxiliar reiniciou"))
+        return future
+
+    def call(self, target, method, *args):
+        """submit() e espera o resultado (erros viram OSWorkerError/AudioBackendError)"""
+        future = self.submit(target, method, *args)
+        try:
+            return future.result(self.timeout)
+        except FutureTimeout:
+            self.timeouts += 1
+            # Chamada travada (COM/hook): derruba o processo e o monitor o reinicia
+            generation = future.generation
+            if not generation.stopped and generation.process.is_alive():
+                logger.error(f"⏱️ {target}.{method} travou o processo auxiliar; encerrando")
+                generation.process.kill()
+            raise OSWorkerError(f"Processo auxiliar não respondeu a {target}.{method}") from None
+
+    def _resolve(self, call_id, kind, value):
+        future = self._pending.pop(call_id, None)
+        if future is None:
+            return
+        elapsed = time.perf_counter() - future.started
+        self.max_call_ms = max(self.max_call_ms, elapsed * 1000)
+        if self.metrics is not None:
+            self.metrics.observe_stage("os_worker_call", elapsed, kind == "error")
+        if kind == "result":
+            future.set_result(value)
+            return
+        self.failed += 1
+        name, message = value
+        future.set_exception(AudioBackendError(message) if name == "AudioBackendError" else OSWorkerError(f"{name}: {message}"))
+
+    def _read(self, generation):
+        while not generation.stopped:
+            try:
+                data = generation.results.get(timeout=0.5)
+                if data is None:
+                    continue
+                kind, call_id, value = pickle.loads(data)
+            except Exception as e:
+                # Canal fechado por _stop enquanto a thread esperava
+                if not generation.stopped:
+                    logger.error(f"Erro ao ler do processo auxiliar: {e}")
+                continue
+            if kind != "event":
+                self._resolve(call_id, kind, value)
+                continue
+            self.events += 1
+            channel, args = value
+            for listener in self._listeners[channel]:
+                try:
+                    listener(*args)
+                except Exception as e:
+                    logger.warning(f"Erro no listener do processo auxiliar: {e}")
+
+    def _monitor(self, generation):
+        generation.process.join()
+        with self._lock:
+            if self._generation is not generation:
+                return
+            self._generation = None
+            if self._closed:
+                return
+            lived = time.monotonic() - generation.started_at
+            self._crashes = 1 if lived > STABLE_AFTER else self._crashes + 1
+            delay = RESTART_DELAYS[min(self._crashes, len(RESTART_DELAYS)) - 1]
+            self._next_start = time.monotonic() + delay
+        logger.error(f"❌ Processo auxiliar terminou (código {generation.process.exitcode}); "
+                     f"reiniciando em {delay:.1f}s")
+        self._stop(generation, "Processo auxiliar reiniciou")
+
+        time.sleep(delay)
+        with self._lock:
+            if self._closed or self._generation is not None:
+                return
+            self._generation = self._spawn()
+            self.restarts += 1
+        # O estado visto pelo servidor pode estar desatualizado
+        for listener in self._listeners["volume"]:
+            listener(None, None)
+        for listener in self._listeners["session"]:
+            listener("reset", None)
+
+    def _stop(self, generation, reason):
+        """Falha as chamadas pendentes da geração e fecha seus canais"""
+        generation.stopped = True
+        for call_id, future in list(self._pending.items()):
+            if future.generation is generation and self._pending.pop(call_id, None) is not None:
+                self.failed += 1
+                future.set_exception(OSWorkerError(reason))
+        for channel in (generation.requests, generation.results):
+            try:
+                channel.close()
+            except Exception:
+                pass
+
+    def stats(self):
+        generation = self._generation
+        alive = generation is not None and generation.process.is_alive()
+        return {
+            "mode": "process",
+            "transport": generation.transport if generation else None,
+            "pid": generation.process.pid if alive else None,
+            "alive": alive,
+            "restarts": self.restarts,
+            "calls": self.calls,
+            "pending": len(self._pending),
+            "failed": self.failed,
+            "timeouts": self.timeouts,
+            "events": self.events,
+            "max_call_ms": round(self.max_call_ms, 3),
+        }
+
+    def close(self, timeout=2.0):
+        """Pede o encerramento do processo auxiliar (e o termina se não sair)"""
+        with self._lock:
+            self._closed = True
+            generation, self._generation = self._generation, None
+        if generation is None:
+            return
+        try:
+            generation.requests.put(pickle.dumps((None, None, None, ())), timeout=0.5)
+        except Exception:
+            pass
+        generation.process.join(timeout)
+        if generation.process.is_alive():
+            generation.process.terminate()
+            generation.process.join(timeout)
+        self._stop(generation, "Processo auxiliar encerrado")
+
+
+class RemoteAudioBackend(AudioBackend):
+    """AudioBackend que executa cada chamada no processo auxiliar"""
+    name = "process"
+
+    def __init__(self, worker):
+        self.worker = worker
+        worker.add_listener("volume", self._notify)
+        worker.add_listener("session", self._notify_session)
+
+    def set_volume(self, level):
+        self.worker.call("audio", "set_volume", level)
+
+    def get_volume(self):
+        return self.worker.call("audio", "get_volume")
+
+    def set_mute(self, muted):
+        self.worker.call("audio", "set_mute", muted)
+
+    def get_mute(self):
+        return self.worker.call("audio", "get_mute")
+
+    def get_state(self):
+        return self.worker.call("audio", "get_state")
+
+    def apply_change(self, change):
+        # Uma ida e volta: leitura e escrita acontecem no processo auxiliar
+        return self.worker.call("audio", "apply_change", change)
+
+    def get_sessions(self):
+        return self.worker.call("audio", "get_sessions")
+
+    def set_session_volume(self, pid, level):
+        self.worker.call("audio", "set_session_volume", pid, level)
+
+    def set_session_mute(self, pid, muted):
+        self.worker.call("audio", "set_session_mute", pid, muted)
+
+    def apply_session_change(self, pid, change):
+        return self.worker.call("audio", "apply_session_change", pid, change)
+
+    def invalidate(self):
+        self.worker.call("audio", "invalidate")
+
+
+class RemoteKeyboardBackend(KeyboardBackend):
+    """KeyboardBackend que injeta as teclas no processo auxiliar"""
+    name = "process"
+
+    def __init__(self, worker):
+        self.worker = worker
+
+    def tap(self, action):
+        self.worker.call("keyboard", "tap", action)
+
+    def load(self):
+        self.worker.call("keyboard", "load")
@@ -0,0 +1,269 @@
+import os
+import math
+import time
+import heapq
+import logging
+import itertools
+import threading
+from audio_backend import AudioBackendError, VOLUME_EPSILON
+from volume_scheduler import VolumeChange
+
+logger = logging.getLogger(__name__)
+
+# Intervalo entre dois passos de uma rampa de volume
+RAMP_TICK_ENV = 'AUDIOREMOTE_RAMP_TICK_MS'
+DEFAULT_RAMP_TICK = float(os.environ.get(RAMP_TICK_ENV, 50)) / 1000
+
+# Limites de POST /volume/ramp (segundos)
+MAX_RAMP_DURATION = 3600
+MAX_RAMP_DELAY = 12 * 3600
+
+# Progresso da rampa (0-1) -> fração do caminho até o nível final
+CURVES = {
+    "linear": lambda t: t,
+    "ease-in": lambda t: t * t,
+    "ease-out": lambda t: 1 - (1 - t) * (1 - t),
+    "smooth": lambda t: t * t * (3 - 2 * t),
+}
+
+
+class Timer:
+    """Timer agendado no TimerHeap; ``cancel`` é barato (removido ao chegar no topo)"""
+    __slots__ = ("due", "callback", "cancelled")
+
+    def __init__(self, due, callback):
+        self.due = due
+        self.callback = callback
+        self.cancelled = False
+
+    def cancel(self):
+        self.cancelled = True
+
+
+class TimerHeap:
+    """Timers em um heap atendidos por uma única thread.
+
+    Qualquer quantidade de timers (rampas, timers de desligamento...)
+    compartilha a mesma thread, que dorme até o próximo vencimento. Os
+    callbacks rodam nessa thread e não devem bloquear.
+    """
+
+    def __init__(self, name="timers"):
+        self.fired = 0
+        self.max_lag_ms = 0.0
+        self._heap = []
+        self._seq = itertools.count()
+        self._closed = False
+        self._cond = threading.Condition()
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self._thread.start()
+
+    def call_at(self, due, callback):
+        """Agenda callback() para o instante ``due`` (time.monotonic)"""
+        timer = Timer(due, callback)
+        with self._cond:
+            heapq.heappush(self._heap, (due, next(self._seq), timer))
+            if self._heap[0][2] is timer:
+                # Vence antes do que a thread está esperando
+                self._cond.notify()
+        return timer
+
+    def call_later(self, delay, callback):
+        return self.call_at(time.monotonic() + delay, callback)
+
+    def _next_timer(self):
+        with self._cond:
+            while not self._closed:
+                if not self._heap:
+                    self._cond.wait()
+                    continue
+                due, _, timer = self._heap[0]
+                if timer.cancelled:
+                    heapq.heappop(self._heap)
+                    continue
+                delay = due - time.monotonic()
+                if delay > 0:
+                    self._cond.wait(delay)
+                    continue
+                heapq.heappop(self._heap)
+                return timer
+            return None
+
+    def _run(self):
+        while True:
+            timer = self._next_timer()
+            if timer is None:
+                break
+            self.fired += 1
+            self.max_lag_ms = max(self.max_lag_ms, (time.monotonic() - timer.due) * 1000)
+            try:
+                timer.callback()
+            except Exception as e:
+                logger.error(f"Erro em timer agendado: {e}")
+
+    def pending(self):
+        with self._cond:
+            return sum(not timer.cancelled for _, _, timer in self._heap)
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._heap = []
+            self._cond.notify_all()
+        self._thread.join(timeout=1)
+
+
+class Ramp:
+    """Uma rampa de volume: do nível atual até ``level`` em ``duration`` segundos"""
+
+    def __init__(self, ramp_id, level, duration, curve, delay=0.0, then=None):
+        self.id = ramp_id
+        self.level = level
+        self.duration = duration
+        self.curve = curve
+        self.delay = delay
+        self.then = then
+        self.status = "scheduled"
+        self.start_level = None
+        self.current = None
+        self.started_at = None
+        self.timer = None
+
+    def progress(self, now=None):
+        if self.started_at is None:
+            return 0.0
+        if self.duration <= 0:
+            return 1.0
+        elapsed = (now or time.monotonic()) - self.started_at
+        return min(1.0, elapsed / self.duration)
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "status": self.status,
+            "level": self.level,
+            "duration": self.duration,
+            "curve": self.curve,
+            "delay": self.delay,
+            "then": self.then,
+            "start_level": self.start_level,
+            "current": None if self.current is None else round(self.current, 2),
+            "progress": round(self.progress(), 3),
+        }
+
+
+class RampEngine:
+    """Rampas de volume aplicadas pelo servidor em passos de ``tick``.
+
+    Há no máximo uma rampa ativa: uma nova substitui a anterior
+    ("superseded") e um ajuste manual de volume a interrompe. Cada passo
+    é um timer no TimerHeap (nenhuma thread por rampa) e vai para o
+    VolumeScheduler sem esperar, então a escrita continua única e
+    combinada com os demais ajustes.
+    """
+
+    def __init__(self, volume_scheduler, state_cache, input_dispatcher=None, tick=DEFAULT_RAMP_TICK,
+                 timers=None):
+        self.volume_scheduler = volume_scheduler
+        self.state_cache = state_cache
+        self.input_dispatcher = input_dispatcher
+        self.tick = tick
+        self.timers = timers or TimerHeap(name="ramp-timers")
+        self.counts = dict.fromkeys(("started", "completed", "cancelled", "superseded", "interrupted", "failed"), 0)
+        self.steps = 0
+        self._ids = itertools.count(1)
+        self._ramp = None
+        self._lock = threading.Lock()
+
+    def start(self, level, duration, curve="linear", delay=0.0, then=None):
+        """Agenda uma rampa (substituindo a ativa) e retorna a Ramp"""
+        ramp = Ramp(next(self._ids), level, duration, curve, delay, then)
+        with self._lock:
+            if self._ramp is not None:
+                self._finish(self._ramp, "superseded")
+            self._ramp = ramp
+            self.counts["started"] += 1
+            ramp.timer = self.timers.call_later(delay, lambda: self._step(ramp))
+        return ramp
+
+    def current(self):
+        return self._ramp
+
+    def cancel(self, status="cancelled"):
+        """Cancela a rampa ativa; retorna a rampa cancelada ou None"""
+        with self._lock:
+            ramp = self._ramp
+            if ramp is not None:
+                self._finish(ramp, status)
+        return ramp
+
+    def _finish(self, ramp, status):
+        # Chamado com o lock
+        ramp.status = status
+        ramp.timer.cancel()
+        if self._ramp is ramp:
+            self._ramp = None
+        self.counts[status] += 1
+
+    def _load_start_level(self, ramp):
+        """Lê o volume atual para o cache e reagenda o primeiro passo da rampa"""
+        try:
+            self.state_cache.get()
+        except AudioBackendError as e:
+            logger.error(f"❌ Rampa {ramp.id} cancelada: {e}")
+            with self._lock:
+                if self._ramp is ramp:
+                    self._finish(ramp, "failed")
+            return
+        with self._lock:
+            if self._ramp is ramp:
+                ramp.timer = self.timers.call_later(0, lambda: self._step(ramp))
+
+    def _step(self, ramp):
+        now = time.monotonic()
+        if ramp.started_at is None:
+            state = self.state_cache.peek()
+            if state is None:
+                # Estado desconhecido: a leitura pode bloquear no COM, então sai da thread dos timers
+                threading.Thread(target=self._load_start_level, args=(ramp,), name="ramp-start", daemon=True).start()
+                return
+            start_level = state["volume"]
+            ramp.start_level = round(start_level, 2)
+            ramp.current = start_level
+            ramp.started_at = now
+            ramp.status = "running"
+
+        progress = ramp.progress(now)
+        level = ramp.start_level + (ramp.level - ramp.start_level) * CURVES[ramp.curve](progress)
+        with self._lock:
+            if self._ramp is not ramp:
+                return
+            if progress >= 1 or abs(level - ramp.current) >= VOLUME_EPSILON:
+                # Não espera a escrita: a thread dos timers nunca bloqueia no COM
+                self.volume_scheduler.submit(VolumeChange(level=round(level, 2)), timeout=0)
+                ramp.current = level
+                self.steps += 1
+
+            if progress < 1:
+                # Passos alinhados ao início; passos atrasados são pulados
+                index = math.floor((now - ramp.started_at) / self.tick) + 1
+                ramp.timer = self.timers.call_at(ramp.started_at + index * self.tick, lambda: self._step(ramp))
+                return
+            self._finish(ramp, "completed")
+
+        if ramp.then and self.input_dispatcher is not None:
+            self.input_dispatcher.submit(ramp.then)
+
+    def stats(self):
+        return dict(
+            self.counts,
+            active=int(self._ramp is not None),
+            steps=self.steps,
+            timers=self.timers.pending(),
+            max_lag_ms=round(self.timers.max_lag_ms, 3),
+            tick_ms=round(self.tick * 1000, 1),
+        )
+
+    def close(self):
+        self.cancel()
+        self.timers.close()
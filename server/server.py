@@ -1,177 +1,106 @@
-import os
-import secrets
 import logging
-import socket
-from flask import Flask, request, jsonify
-from flask_cors import CORS
-from pynput.keyboard import Key, Controller
-from pycaw.pycaw import AudioUtilities, IAudioEndpointVolume
-from comtypes import CLSCTX_ALL, CoInitialize, CoUninitialize
-from functools import wraps
+import argparse
+import multiprocessing
+import threading
+from core import ServerCore, TOKEN_FILE
+from credentials import CredentialStore, CredentialError, credentials_path, DEFAULT_SCOPES
+from log_pipeline import setup_logging
 
-# Configuração de logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s'
-)
 logger = logging.getLogger(__name__)
 
-# Gera ou carrega token de autenticação
-TOKEN_FILE = 'server_token.txt'
 
-def load_or_create_token():
-    """Carrega token existente ou cria um novo"""
-    if os.path.exists(TOKEN_FILE):
-        with open(TOKEN_FILE, 'r') as f:
-            token = f.read().strip()
-            logger.info("🔑 Token carregado do arquivo")
-            return token
-    else:
-        token = secrets.token_urlsafe(32)
-        with open(TOKEN_FILE, 'w') as f:
-            f.write(token)
-        logger.info(f"🔑 Novo token gerado e salvo")
-        return token
-
-def get_local_ip():
-    """Obtém o IP local da máquina"""
+def print_banner(core):
+    """Mostra token e endereço para configurar o app mobile"""
+    print("\n" + "="*60)
+    print(f" TOKEN DE AUTENTICAÇÃO:")
+    print(f"   {core.token}")
+    devices = core.credentials.devices()
+    if devices:
+        print(f"   (+ {len(devices)} dispositivo(s) pareado(s); veja --list-devices)")
+    print(f"\n IP DO SERVIDOR:")
+    print(f"   {core.local_ip}:{core.port}")
+    others = core.addresses[1:]
+    if others:
+        print(f"   (outros endereços: {', '.join(others)})")
+    if core.tls:
+        print(f"\n CERTIFICADO TLS (SHA-256):")
+        print(f"   {core.tls_fingerprint}")
+    print(f"\n   Configure este IP e token no app mobile!")
+    print(f"   URL completa: {core.url}")
+    print("="*60 + "\n")
+
+
+def manage_devices(args):
+    """--add-device/--revoke-device/--list-devices: edita server_devices.json e sai.
+
+    Um servidor já rodando recarrega o arquivo sozinho.
+    """
+    store = CredentialStore(credentials_path(TOKEN_FILE))
     try:
-        # Cria um socket UDP para descobrir o IP local
-        s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-        # Não precisa realmente conectar, apenas precisa do binding
-        s.connect(('10.255.255.255', 1))
-        local_ip = s.getsockname()[0]
-        s.close()
-        return local_ip
-    except Exception:
-        # Fallback para localhost se não conseguir determinar
-        try:
-            hostname = socket.gethostname()
-            return socket.gethostbyname(hostname)
-        except:
-            return '127.0.0.1'
-
-API_TOKEN = load_or_create_token()
-LOCAL_IP = get_local_ip()
-
-print("\n" + "="*60)
-print(f" TOKEN DE AUTENTICAÇÃO:")
-print(f"   {API_TOKEN}")
-print(f"\n IP DO SERVIDOR:")
-print(f"   {LOCAL_IP}:5000")
-print(f"\n   Configure este IP e token no app mobile!")
-print(f"   URL completa: http://{LOCAL_IP}:5000")
-print("="*60 + "\n")
-
-# Cria app Flask
-app = Flask(__name__)
-CORS(app)
-keyboard = Controller()
-
-# Decorator para verificar autenticação
-def require_auth(f):
-    @wraps(f)
-    def decorated_function(*args, **kwargs):
-        auth_header = request.headers.get('Authorization')
-        
-        if not auth_header:
-            logger.warning(f"❌ Requisição sem token de {request.remote_addr}")
-            return jsonify({"error": "Token de autenticação necessário"}), 401
-        
-        if not auth_header.startswith('Bearer '):
-            logger.warning(f"❌ Formato de token inválido de {request.remote_addr}")
-            return jsonify({"error": "Formato de token inválido"}), 401
-        
-        token = auth_header.replace('Bearer ', '')
-        
-        if token != API_TOKEN:
-            logger.warning(f"❌ Token inválido de {request.remote_addr}")
-            return jsonify({"error": "Token inválido"}), 401
-        
-        return f(*args, **kwargs)
-    return decorated_function
-
-
-@app.route('/command/<action>', methods=['POST'])
-@require_auth
-def command(action):
-    """Executa comandos de controle de mídia"""
-    keymap = {
-        "playpause": Key.media_play_pause,
-        "next": Key.media_next,
-        "prev": Key.media_previous,
-    }
-    
-    if action not in keymap:
-        logger.warning(f" Comando inválido: {action}")
-        return jsonify({"error": "Comando inválido"}), 400
-    
+        if args.add_device:
+            device, token = store.add(args.add_device, args.scopes)
+            print(f"Dispositivo {device.name} ({device.id}) com {', '.join(device.scope_names)}")
+            print(f"Token (mostrado só agora): {token}")
+        elif args.revoke_device:
+            device = store.revoke(args.revoke_device)
+            print(f"Dispositivo {device.name} ({device.id}) revogado")
+        for device in store.devices():
+            print(f"  {device.id}  {device.name:<24} {','.join(device.scope_names)}")
+    except (CredentialError, OSError, ValueError) as e:
+        print(f"Erro: {e}")
+        return 1
+    return 0
+
+
+def run_console(tls=None, udp_shared_token=None):
+    """Roda o servidor sem interface (também usado por server_gui.py --headless)"""
+    # Configuração de logging (assíncrono, compartilhado com server_gui.py)
+    setup_logging()
+    core = ServerCore(tls=tls, udp_shared_token=udp_shared_token)
     try:
-        keyboard.press(keymap[action])
-        keyboard.release(keymap[action])
-        logger.info(f"🎵 Comando executado: {action} de {request.remote_addr}")
-        return f"{action} enviado", 200
+        print_banner(core)
     except Exception as e:
-        logger.error(f"❌ Erro ao executar comando {action}: {e}")
-        return jsonify({"error": str(e)}), 500
+        # Ex.: certificado TLS não pôde ser gerado
+        logger.error(f"❌ Erro ao iniciar servidor: {e}")
+        core.close()
+        return
+
+    logger.info("🚀 Iniciando servidor AudioRemote...")
+    logger.info(f"📍 Servidor rodando em {core.url}")
+    logger.info(f"💡 Pressione Ctrl+C para parar o servidor")
 
-@app.route('/volume', methods=['POST'])
-@require_auth
-def volume():
-    """Ajusta o volume do sistema"""
-    data = request.json
-    
-    if not data or 'level' not in data:
-        logger.warning(" Nível de volume não fornecido")
-        return jsonify({"error": "Nível de volume não fornecido"}), 400
-    
-    level = data['level']
-    
-    if not isinstance(level, (int, float)) or not (0 <= level <= 100):
-        logger.warning(f" Nível de volume inválido: {level}")
-        return jsonify({"error": "Nível de volume inválido (0-100)"}), 400
-    
     try:
-        CoInitialize()
-        devices = AudioUtilities.GetSpeakers()
-        interface = devices.Activate(IAudioEndpointVolume._iid_, CLSCTX_ALL, None)
-        volume_interface = interface.QueryInterface(IAudioEndpointVolume)
-        volume_interface.SetMasterVolumeLevelScalar(level / 100, None)
-        logger.info(f" Volume ajustado para {level}% de {request.remote_addr}")
-        return f"Volume ajustado para {level}%", 200
+        http_server = core.start()
     except Exception as e:
-        logger.error(f"❌ Erro ao ajustar o volume: {e}")
-        return jsonify({"error": f"Erro ao ajustar o volume: {str(e)}"}), 500
-    finally:
-        CoUninitialize()
-
-@app.route("/ping")
-def ping():
-    """Endpoint para testar conectividade (sem autenticação)"""
-    return "pong", 200
-
-@app.route("/info")
-def info():
-    """Retorna informações do servidor (sem autenticação)"""
-    return jsonify({
-        "name": "AudioRemote Server",
-        "version": "2.0.0",
-        "auth_required": True,
-        "ip": LOCAL_IP,
-        "port": 5000,
-        "url": f"http://{LOCAL_IP}:5000"
-    }), 200
-
+        logger.error(f"❌ Erro ao iniciar servidor: {e}")
+        core.close()
+        return
 
-if __name__ == "__main__":
-    logger.info("🚀 Iniciando servidor AudioRemote...")
-    logger.info(f"📍 Servidor rodando em http://{LOCAL_IP}:5000")
-    logger.info(f"💡 Pressione Ctrl+C para parar o servidor")
-    
+    # Importa pynput/pycaw enquanto o servidor já atende
+    threading.Thread(target=core.warm_up, name="warm-up", daemon=True).start()
     try:
-        app.run(host="0.0.0.0", port=5000, debug=False)
+        http_server.serve_forever()
     except KeyboardInterrupt:
         logger.info("\n👋 Servidor encerrado pelo usuário")
-    except Exception as e:
-        logger.error(f"❌ Erro ao iniciar servidor: {e}")
+    finally:
+        core.close()
+
 
+if __name__ == "__main__":
+    # Executável do PyInstaller: o processo auxiliar (AUDIOREMOTE_OS_WORKER) reusa este binário
+    multiprocessing.freeze_support()
+    parser = argparse.ArgumentParser(description="AudioRemote Server")
+    parser.add_argument("--tls", action="store_true", default=None,
+                        help="HTTPS com certificado autoassinado (padrão: AUDIOREMOTE_TLS)")
+    parser.add_argument("--udp-devices-only", dest="udp_shared_token", action="store_false", default=None,
+                        help="comandos UDP só de dispositivos pareados, não com o token do servidor "
+                             "(padrão: AUDIOREMOTE_UDP_SHARED_TOKEN)")
+    parser.add_argument("--add-device", metavar="NOME", help="pareia um dispositivo e mostra o token dele")
+    parser.add_argument("--scopes", default=",".join(DEFAULT_SCOPES),
+                        help="escopos do dispositivo: command, volume e/ou admin (padrão: %(default)s)")
+    parser.add_argument("--revoke-device", metavar="ID", help="revoga um dispositivo pelo id ou nome")
+    parser.add_argument("--list-devices", action="store_true", help="lista os dispositivos pareados")
+    args = parser.parse_args()
+    if args.add_device or args.revoke_device or args.list_devices:
+        raise SystemExit(manage_devices(args))
+    run_console(tls=args.tls, udp_shared_token=args.udp_shared_token)
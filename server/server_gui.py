@@ -1,37 +1,57 @@
 import os
-import secrets
 import logging
-import socket
+import secrets
+import argparse
 import threading
-import tkinter as tk
-from tkinter import ttk, messagebox
-from PIL import Image, ImageTk
-from flask import Flask, request, jsonify
-from flask_cors import CORS
-from pynput.keyboard import Key, Controller
-from pycaw.pycaw import AudioUtilities, IAudioEndpointVolume
-from comtypes import CLSCTX_ALL, CoInitialize, CoUninitialize
-from functools import wraps
+import multiprocessing
+from collections import deque
+from core import ServerCore
+from log_pipeline import setup_logging, add_log_handler, SkippedCountFormatter
 
-# Configuração de logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s'
-)
 logger = logging.getLogger(__name__)
 
-TOKEN_FILE = 'server_token.txt'
+# Log de atividades: linhas mantidas no widget e mensagens pendentes
+LOG_MAX_LINES = 500
+LOG_QUEUE_LIMIT = 5000
+LOG_DRAIN_IDLE_MS = 200
+LOG_DRAIN_BUSY_MS = 20
+LOG_BATCH_MIN = 50
+LOG_BATCH_MAX = 1000
+
+# Intervalo de atualização do painel de métricas
+METRICS_REFRESH_MS = 1000
+
+def import_gui_modules():
+    """Importa o Tk só quando a janela vai ser criada (o modo headless não usa)"""
+    global tk, messagebox, simpledialog
+    import tkinter as tk
+    from tkinter import messagebox, simpledialog
+
+class GuiLogHandler(logging.Handler):
+    """Encaminha os registros do logging para o log de atividades"""
+    
+    def __init__(self, sink):
+        super().__init__(logging.INFO)
+        self.sink = sink
+        self.setFormatter(SkippedCountFormatter('%(message)s'))
+    
+    def emit(self, record):
+        self.sink(self.format(record))
 
 class AudioRemoteServer:
-    def __init__(self):
+    def __init__(self, tls=None, udp_shared_token=None):
+        import_gui_modules()
+        # Configuração de logging (assíncrono, compartilhado com server.py)
+        setup_logging()
         self.root = tk.Tk()
         self.root.title("AudioRemote Server v2.0")
-        self.root.geometry("600x850")
+        self.root.geometry("600x1020")
         self.root.resizable(True, True)
         self.root.minsize(600, 750)
         
         # Define ícone da janela
         try:
+            from PIL import Image, ImageTk
             icon_path = os.path.join(os.path.dirname(__file__), 'assets', 'icon.png')
             if os.path.exists(icon_path):
                 icon = Image.open(icon_path)
@@ -43,45 +63,14 @@ class AudioRemoteServer:
         self.server_running = False
         self.flask_thread = None
         self.show_logs = tk.BooleanVar(value=True)
-        self.token = self.load_or_create_token()
-        self.local_ip = self.get_local_ip()
+        # deque.append/popleft são atômicos: threads do Flask só enfileiram
+        self.log_queue = deque()
+        self.log_dropped = 0
+        self.log_batch = LOG_BATCH_MIN
         
+        self.core = ServerCore(tls=tls, udp_shared_token=udp_shared_token)
+        self.use_tls = tk.BooleanVar(value=self.core.tls)
         self.setup_ui()
-        self.setup_flask()
-        
-    def load_or_create_token(self):
-        """Carrega token existente ou cria um novo"""
-        if os.path.exists(TOKEN_FILE):
-            with open(TOKEN_FILE, 'r') as f:
-                return f.read().strip()
-        else:
-            token = secrets.token_urlsafe(32)
-            with open(TOKEN_FILE, 'w') as f:
-                f.write(token)
-            return token
-    
-    def save_token(self, new_token):
-        """Salva novo token personalizado"""
-        with open(TOKEN_FILE, 'w') as f:
-            f.write(new_token)
-        self.token = new_token
-        global API_TOKEN
-        API_TOKEN = new_token
-    
-    def get_local_ip(self):
-        """Obtém o IP local da máquina"""
-        try:
-            s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-            s.connect(('10.255.255.255', 1))
-            local_ip = s.getsockname()[0]
-            s.close()
-            return local_ip
-        except Exception:
-            try:
-                hostname = socket.gethostname()
-                return socket.gethostbyname(hostname)
-            except:
-                return '127.0.0.1'
     
     def setup_ui(self):
         """Configura a interface gráfica"""
@@ -117,7 +106,7 @@ class AudioRemoteServer:
         ip_value_frame = tk.Frame(ip_section, bg="#ffffff")
         ip_value_frame.pack(fill=tk.X, padx=18, pady=(0, 10))
         
-        self.ip_label = tk.Label(ip_value_frame, text=f"{self.local_ip}:5000",
+        self.ip_label = tk.Label(ip_value_frame, text=f"{self.core.local_ip}:{self.core.port}",
                                 font=("Consolas", 14, "bold"), fg="#1DB954", bg="#ffffff",
                                 anchor="w")
         self.ip_label.pack(side=tk.LEFT, fill=tk.X, expand=True)
@@ -125,9 +114,16 @@ class AudioRemoteServer:
         ip_copy_btn = tk.Button(ip_value_frame, text="Copy", font=("Segoe UI", 9, "bold"),
                                bg="#1DB954", fg="white", relief=tk.FLAT, cursor="hand2",
                                padx=18, pady=6, activebackground="#17a34a",
-                               command=lambda: self.copy_to_clipboard(f"{self.local_ip}:5000"))
+                               command=lambda: self.copy_to_clipboard(f"{self.core.local_ip}:{self.core.port}"))
         ip_copy_btn.pack(side=tk.RIGHT, padx=(12, 0))
         
+        # Outras interfaces (VPN, Docker, segunda placa de rede...)
+        other_addresses = self.core.addresses[1:]
+        if other_addresses:
+            other_label = tk.Label(ip_section, text=f"Also reachable at: {', '.join(other_addresses)}",
+                                   font=("Segoe UI", 9), bg="#ffffff", fg="#888888", anchor="w")
+            other_label.pack(fill=tk.X, padx=18, pady=(0, 10))
+        
         # Token de Autenticação
         token_section = tk.Frame(main_frame, bg="#ffffff", relief=tk.SOLID, bd=1, highlightbackground="#e0e0e0", highlightthickness=1)
         token_section.pack(fill=tk.X, pady=(0, 15))
@@ -142,7 +138,7 @@ class AudioRemoteServer:
         self.token_entry = tk.Entry(token_value_frame, font=("Consolas", 10), 
                                     fg="#333333", relief=tk.SOLID, bg="#f7f7f7", bd=1)
         self.token_entry.pack(side=tk.LEFT, fill=tk.X, expand=True, ipady=6, ipadx=10)
-        self.token_entry.insert(0, self.token)
+        self.token_entry.insert(0, self.core.token)
         
         token_copy_btn = tk.Button(token_value_frame, text="Copy", font=("Segoe UI", 9, "bold"),
                                   bg="#1DB954", fg="white", relief=tk.FLAT, cursor="hand2",
@@ -166,6 +162,38 @@ class AudioRemoteServer:
                             command=self.save_custom_token)
         save_btn.pack(side=tk.LEFT)
         
+        # Dispositivos pareados: cada um com seu token, revogável sem afetar os outros
+        devices_section = tk.Frame(main_frame, bg="#ffffff", relief=tk.SOLID, bd=1, highlightbackground="#e0e0e0", highlightthickness=1)
+        devices_section.pack(fill=tk.X, pady=(0, 15))
+        
+        devices_title = tk.Label(devices_section, text="PAIRED DEVICES", 
+                                 font=("Segoe UI", 9, "bold"), bg="#ffffff", fg="#5a5a5a")
+        devices_title.pack(anchor="w", padx=18, pady=(15, 8))
+        
+        self.devices_list = tk.Listbox(devices_section, height=3, font=("Consolas", 9),
+                                       fg="#333333", bg="#f7f7f7", relief=tk.SOLID, bd=1,
+                                       activestyle="none")
+        self.devices_list.pack(fill=tk.X, padx=18, pady=(0, 10))
+        
+        devices_btn_frame = tk.Frame(devices_section, bg="#ffffff")
+        devices_btn_frame.pack(fill=tk.X, padx=18, pady=(0, 15))
+        
+        add_device_btn = tk.Button(devices_btn_frame, text="Add Device", font=("Segoe UI", 9, "bold"),
+                                   bg="#10b981", fg="white", relief=tk.FLAT, cursor="hand2",
+                                   padx=16, pady=7, activebackground="#059669",
+                                   command=self.add_device)
+        add_device_btn.pack(side=tk.LEFT, padx=(0, 10))
+        
+        revoke_device_btn = tk.Button(devices_btn_frame, text="Revoke", font=("Segoe UI", 9, "bold"),
+                                      bg="#ef4444", fg="white", relief=tk.FLAT, cursor="hand2",
+                                      padx=16, pady=7, activebackground="#dc2626",
+                                      command=self.revoke_device)
+        revoke_device_btn.pack(side=tk.LEFT)
+        
+        self.shown_devices = []
+        self.devices_version = None
+        self.refresh_devices()
+        
         # Status e Controles
         control_section = tk.Frame(main_frame, bg="#ffffff", relief=tk.SOLID, bd=1, highlightbackground="#e0e0e0", highlightthickness=1)
         control_section.pack(fill=tk.X, pady=(0, 15))
@@ -186,6 +214,28 @@ class AudioRemoteServer:
                                      font=("Segoe UI", 11), bg="#ffffff", fg="#333333")
         self.status_label.pack(side=tk.LEFT)
         
+        # HTTPS com certificado autoassinado (só muda com o servidor parado)
+        tls_frame = tk.Frame(control_section, bg="#ffffff")
+        tls_frame.pack(fill=tk.X, padx=18, pady=(0, 10))
+        
+        self.tls_toggle = tk.Checkbutton(tls_frame, text="Use HTTPS (self-signed certificate)",
+                                         variable=self.use_tls, font=("Segoe UI", 9),
+                                         bg="#ffffff", activebackground="#ffffff")
+        self.tls_toggle.pack(anchor="w")
+        
+        fingerprint_frame = tk.Frame(tls_frame, bg="#ffffff")
+        fingerprint_frame.pack(fill=tk.X)
+        
+        self.fingerprint_label = tk.Label(fingerprint_frame, text="", font=("Consolas", 8),
+                                          bg="#ffffff", fg="#6c757d", justify=tk.LEFT,
+                                          anchor="w", wraplength=420)
+        self.fingerprint_label.pack(side=tk.LEFT, fill=tk.X, expand=True)
+        
+        self.fingerprint_copy_btn = tk.Button(fingerprint_frame, text="Copy", font=("Segoe UI", 9, "bold"),
+                                              bg="#1DB954", fg="white", relief=tk.FLAT, cursor="hand2",
+                                              padx=15, pady=4, activebackground="#17a34a",
+                                              command=lambda: self.copy_to_clipboard(self.core.tls_fingerprint))
+        
         # Botões de controle
         btn_frame = tk.Frame(control_section, bg="#ffffff")
         btn_frame.pack(fill=tk.X, padx=18, pady=(0, 15))
@@ -204,6 +254,19 @@ class AudioRemoteServer:
                                   command=self.stop_server)
         self.stop_btn.pack(fill=tk.X)
         
+        # Resumo de métricas
+        metrics_section = tk.Frame(main_frame, bg="#ffffff", relief=tk.SOLID, bd=1, highlightbackground="#e0e0e0", highlightthickness=1)
+        metrics_section.pack(fill=tk.X, pady=(0, 15))
+        
+        metrics_title = tk.Label(metrics_section, text="LIVE METRICS", 
+                                 font=("Segoe UI", 9, "bold"), bg="#ffffff", fg="#5a5a5a")
+        metrics_title.pack(anchor="w", padx=18, pady=(15, 8))
+        
+        self.metrics_label = tk.Label(metrics_section, text="No requests yet", 
+                                      font=("Consolas", 9), bg="#ffffff", fg="#333333",
+                                      justify=tk.LEFT, anchor="w")
+        self.metrics_label.pack(fill=tk.X, padx=18, pady=(0, 15))
+        
         # Log de Atividades
         log_section = tk.Frame(main_frame, bg="#ffffff", relief=tk.SOLID, bd=1, highlightbackground="#e0e0e0", highlightthickness=1)
         log_section.pack(fill=tk.BOTH, expand=True)
@@ -221,6 +284,10 @@ class AudioRemoteServer:
                                    command=self.toggle_logs)
         log_toggle.pack(side=tk.RIGHT)
         
+        self.log_dropped_label = tk.Label(log_header, text="", 
+                                          font=("Segoe UI", 9), bg="#ffffff", fg="#ef4444")
+        self.log_dropped_label.pack(side=tk.RIGHT, padx=(0, 10))
+        
         self.log_container = tk.Frame(log_section, bg="#ffffff")
         self.log_container.pack(fill=tk.BOTH, expand=True, padx=18, pady=(0, 15))
         
@@ -237,108 +304,60 @@ class AudioRemoteServer:
         log_scroll.config(command=self.log_text.yview)
         
         self.log("Server ready to start")
-    
-    def setup_flask(self):
-        """Configura o app Flask"""
-        global app, API_TOKEN, keyboard
-        
-        API_TOKEN = self.token
-        app = Flask(__name__)
-        CORS(app)
-        keyboard = Controller()
-        
-        def require_auth(f):
-            @wraps(f)
-            def decorated_function(*args, **kwargs):
-                auth_header = request.headers.get('Authorization')
-                
-                if not auth_header:
-                    self.log(f"[AUTH ERROR] Request without token from {request.remote_addr}")
-                    return jsonify({"error": "Token de autenticação necessário"}), 401
-                
-                if not auth_header.startswith('Bearer '):
-                    self.log(f"[AUTH ERROR] Invalid format from {request.remote_addr}")
-                    return jsonify({"error": "Formato de token inválido"}), 401
-                
-                token = auth_header.replace('Bearer ', '')
-                
-                if token != API_TOKEN:
-                    self.log(f"[AUTH ERROR] Invalid token from {request.remote_addr}")
-                    return jsonify({"error": "Token inválido"}), 401
-                
-                return f(*args, **kwargs)
-            return decorated_function
-        
-        @app.route('/command/<action>', methods=['POST'])
-        @require_auth
-        def command(action):
-            keymap = {
-                "playpause": Key.media_play_pause,
-                "next": Key.media_next,
-                "prev": Key.media_previous,
-            }
-            
-            if action not in keymap:
-                self.log(f"[WARNING] Invalid command: {action}")
-                return jsonify({"error": "Comando inválido"}), 400
-            
-            try:
-                keyboard.press(keymap[action])
-                keyboard.release(keymap[action])
-                self.log(f"[MEDIA] {action.upper()} from {request.remote_addr}")
-                return f"{action} enviado", 200
-            except Exception as e:
-                self.log(f"[ERROR] {e}")
-                return jsonify({"error": str(e)}), 500
-        
-        @app.route('/volume', methods=['POST'])
-        @require_auth
-        def volume():
-            data = request.json
-            
-            if not data or 'level' not in data:
-                return jsonify({"error": "Nível de volume não fornecido"}), 400
-            
-            level = data['level']
-            
-            if not isinstance(level, (int, float)) or not (0 <= level <= 100):
-                return jsonify({"error": "Nível de volume inválido (0-100)"}), 400
-            
-            try:
-                CoInitialize()
-                devices = AudioUtilities.GetSpeakers()
-                interface = devices.Activate(IAudioEndpointVolume._iid_, CLSCTX_ALL, None)
-                volume_interface = interface.QueryInterface(IAudioEndpointVolume)
-                volume_interface.SetMasterVolumeLevelScalar(level / 100, None)
-                self.log(f"[VOLUME] Set to {level}% from {request.remote_addr}")
-                return f"Volume ajustado para {level}%", 200
-            except Exception as e:
-                self.log(f"[ERROR] Volume adjustment failed: {e}")
-                return jsonify({"error": f"Erro ao ajustar o volume: {str(e)}"}), 500
-            finally:
-                CoUninitialize()
-        
-        @app.route("/ping")
-        def ping():
-            return "pong", 200
-        
-        @app.route("/info")
-        def info():
-            return jsonify({
-                "name": "AudioRemote Server",
-                "version": "2.0.0",
-                "auth_required": True,
-                "ip": self.local_ip,
-                "port": 5000,
-                "url": f"http://{self.local_ip}:5000"
-            }), 200
+        add_log_handler(GuiLogHandler(self.log))
+        self.root.after(LOG_DRAIN_IDLE_MS, self.drain_logs)
+        self.root.after(METRICS_REFRESH_MS, self.refresh_metrics)
     
     def log(self, message):
-        """Adiciona mensagem ao log"""
-        self.log_text.config(state=tk.NORMAL)
-        self.log_text.insert(tk.END, f"{message}\n")
-        self.log_text.see(tk.END)
-        self.log_text.config(state=tk.DISABLED)
+        """Enfileira mensagem para o log (seguro para qualquer thread)"""
+        if len(self.log_queue) >= LOG_QUEUE_LIMIT:
+            self.log_dropped += 1
+            return
+        self.log_queue.append(message)
+    
+    def drain_logs(self):
+        """Descarrega o log pendente no widget em lotes (thread do Tk)"""
+        lines = []
+        queue = self.log_queue
+        for _ in range(min(self.log_batch, len(queue))):
+            lines.append(queue.popleft())
+        
+        if lines:
+            self.log_text.config(state=tk.NORMAL)
+            self.log_text.insert(tk.END, "\n".join(lines) + "\n")
+            # Mantém só as últimas LOG_MAX_LINES linhas
+            excess = int(self.log_text.index("end-1c").split(".")[0]) - 1 - LOG_MAX_LINES
+            if excess > 0:
+                self.log_text.delete("1.0", f"{excess + 1}.0")
+            self.log_text.see(tk.END)
+            self.log_text.config(state=tk.DISABLED)
+        
+        if self.log_dropped:
+            self.log_dropped_label.config(text=f"dropped {self.log_dropped} lines")
+        
+        # Sob carga drena mais rápido e em lotes maiores; ocioso, volta ao normal
+        if queue:
+            self.log_batch = min(self.log_batch * 2, LOG_BATCH_MAX)
+            delay = LOG_DRAIN_BUSY_MS
+        else:
+            self.log_batch = LOG_BATCH_MIN
+            delay = LOG_DRAIN_IDLE_MS
+        self.root.after(delay, self.drain_logs)
+    
+    def refresh_metrics(self):
+        """Atualiza o painel de métricas (thread do Tk)"""
+        summary = self.core.metrics.summary()
+        lines = []
+        for name, data in sorted(summary["routes"].items()) + sorted(summary["stages"].items()):
+            lines.append(f"{name[:24]:<24} n={data['count']:<6} err={data['errors']:<4} "
+                         f"p50={data['p50_ms']}ms p99={data['p99_ms']}ms")
+        if lines:
+            self.metrics_label.config(text="\n".join(lines))
+        # Dispositivos adicionados/revogados por fora (server.py --add-device, edição do arquivo)
+        self.core.credentials.maybe_reload()
+        if self.core.credentials.version != self.devices_version:
+            self.refresh_devices()
+        self.root.after(METRICS_REFRESH_MS, self.refresh_metrics)
     
     def toggle_logs(self):
         """Mostra ou oculta a área de logs"""
@@ -358,7 +377,7 @@ class AudioRemoteServer:
         new_token = secrets.token_urlsafe(32)
         self.token_entry.delete(0, tk.END)
         self.token_entry.insert(0, new_token)
-        self.save_token(new_token)
+        self.core.save_token(new_token)
         self.log("[TOKEN] New token generated")
         messagebox.showinfo("Token Gerado", "Novo token gerado com sucesso!")
     
@@ -368,27 +387,90 @@ class AudioRemoteServer:
         if len(custom_token) < 1:
             messagebox.showwarning("Token Inválido", "O token não pode estar vazio!")
             return
-        self.save_token(custom_token)
+        self.core.save_token(custom_token)
         self.log("[TOKEN] Custom token saved")
         messagebox.showinfo("Token Salvo", "Token personalizado salvo com sucesso!")
     
+    def refresh_devices(self):
+        """Atualiza a lista de dispositivos pareados"""
+        self.shown_devices = self.core.credentials.devices()
+        self.devices_version = self.core.credentials.version
+        self.devices_list.delete(0, tk.END)
+        for device in self.shown_devices:
+            self.devices_list.insert(tk.END, f"{device.name[:24]:<24} {','.join(device.scope_names):<15} {device.id}")
+    
+    def add_device(self):
+        """Pareia um dispositivo e mostra o token dele (uma única vez)"""
+        name = simpledialog.askstring("Novo Dispositivo", "Nome do dispositivo:", parent=self.root)
+        if not name or not name.strip():
+            return
+        volume = messagebox.askyesno("Permissões", "Permitir controle de volume?\n(Não = só teclas de mídia)")
+        try:
+            device, token = self.core.credentials.add(name, ("command", "volume") if volume else ("command",))
+        except Exception as e:
+            messagebox.showerror("Erro", f"Não foi possível adicionar o dispositivo:\n{e}")
+            return
+        self.refresh_devices()
+        self.root.clipboard_clear()
+        self.root.clipboard_append(token)
+        self.log(f"[DEVICES] {device.name} added ({', '.join(device.scope_names)})")
+        messagebox.showinfo("Dispositivo Adicionado",
+                            f"Token de {device.name} (já copiado; não será mostrado de novo):\n\n{token}")
+    
+    def revoke_device(self):
+        """Revoga o dispositivo selecionado (os demais continuam conectados)"""
+        selection = self.devices_list.curselection()
+        if not selection:
+            messagebox.showwarning("Nenhum Dispositivo", "Selecione um dispositivo na lista.")
+            return
+        device = self.shown_devices[selection[0]]
+        if not messagebox.askyesno("Revogar", f"Revogar o acesso de {device.name}?"):
+            return
+        try:
+            self.core.credentials.revoke(device.id)
+        except Exception as e:
+            messagebox.showerror("Erro", f"Não foi possível revogar o dispositivo:\n{e}")
+            return
+        self.refresh_devices()
+        self.log(f"[DEVICES] {device.name} revoked")
+    
     def start_server(self):
         """Inicia o servidor Flask"""
         if self.server_running:
             return
         
+        self.core.tls = self.use_tls.get()
+        try:
+            http_server = self.core.start()
+        except Exception as e:
+            self.log(f"[ERROR] {e}")
+            messagebox.showerror("Erro", f"Não foi possível iniciar o servidor:\n{e}")
+            return
+        
         self.server_running = True
         self.start_btn.config(state=tk.DISABLED)
         self.stop_btn.config(state=tk.NORMAL)
+        self.tls_toggle.config(state=tk.DISABLED)
         self.status_label.config(text="Server Running", fg="#28a745")
         self.status_dot.delete("all")
         self.status_dot.create_oval(2, 2, 10, 10, fill="#28a745", outline="")
         
-        self.log(f"[SERVER] Started at http://{self.local_ip}:5000")
+        if self.core.tls:
+            self.fingerprint_label.config(text=f"SHA-256: {self.core.tls_fingerprint}")
+            self.fingerprint_copy_btn.pack(side=tk.RIGHT)
+        else:
+            self.fingerprint_label.config(text="")
+            self.fingerprint_copy_btn.pack_forget()
+        
+        self.log(f"[SERVER] Started at {self.core.url}")
+        if self.core.udp_server is not None:
+            accepted = "server token and paired devices" if self.core.udp_shared_token else "paired devices only"
+            self.log(f"[SERVER] UDP commands on port {self.core.udp_server.port} ({accepted})")
         
         # Inicia Flask em thread separada
-        self.flask_thread = threading.Thread(target=self.run_flask, daemon=True)
+        self.flask_thread = threading.Thread(target=self.run_flask, args=(http_server,), daemon=True)
         self.flask_thread.start()
+        threading.Thread(target=self.core.warm_up, name="warm-up", daemon=True).start()
     
     def stop_server(self):
         """Para o servidor Flask"""
@@ -399,22 +481,27 @@ class AudioRemoteServer:
         self.server_running = False
         self.start_btn.config(state=tk.NORMAL)
         self.stop_btn.config(state=tk.DISABLED)
+        self.tls_toggle.config(state=tk.NORMAL)
         self.status_label.config(text="Server Stopped", fg="#dc3545")
         self.status_dot.delete("all")
         self.status_dot.create_oval(2, 2, 10, 10, fill="#dc3545", outline="")
         
-        self.log("[SERVER] Stopping... (Application restart required for full stop)")
+        self.log("[SERVER] Stopping...")
         
-        # Avisa que é necessário reiniciar
-        messagebox.showinfo("Servidor Parado", 
-                           "Servidor marcado como parado.\n\n"
-                           "Nota: Para parar completamente o Flask, \n"
-                           "feche e reabra a aplicação.")
+        # shutdown() aguarda o loop do servidor terminar; não trava a interface
+        http_server = self.core.detach()
+        threading.Thread(target=self.shutdown_http_server, args=(http_server,), daemon=True).start()
+    
+    def shutdown_http_server(self, http_server):
+        """Encerra o servidor HTTP e libera a porta"""
+        http_server.shutdown()
+        http_server.server_close()
+        self.log("[SERVER] Stopped")
     
-    def run_flask(self):
+    def run_flask(self, http_server):
         """Executa o servidor Flask"""
         try:
-            app.run(host="0.0.0.0", port=5000, debug=False, use_reloader=False)
+            http_server.serve_forever()
         except Exception as e:
             self.log(f"[ERROR] {e}")
             self.server_running = False
@@ -432,8 +519,29 @@ class AudioRemoteServer:
     def on_close(self):
         """Fecha a aplicação"""
         if messagebox.askokcancel("Sair", "Deseja realmente fechar o servidor?"):
+            self.core.close()
             self.root.destroy()
 
-if __name__ == "__main__":
-    server = AudioRemoteServer()
+def main():
+    # Executável do PyInstaller: o processo auxiliar (AUDIOREMOTE_OS_WORKER) reusa este binário
+    multiprocessing.freeze_support()
+    parser = argparse.ArgumentParser(description="AudioRemote Server")
+    parser.add_argument("--headless", action="store_true",
+                        help="roda sem janela (ex.: ao iniciar com o Windows)")
+    parser.add_argument("--tls", action="store_true", default=None,
+                        help="HTTPS com certificado autoassinado (padrão: AUDIOREMOTE_TLS)")
+    parser.add_argument("--udp-devices-only", dest="udp_shared_token", action="store_false", default=None,
+                        help="comandos UDP só de dispositivos pareados, não com o token do servidor "
+                             "(padrão: AUDIOREMOTE_UDP_SHARED_TOKEN)")
+    args = parser.parse_args()
+    
+    if args.headless:
+        from server import run_console
+        run_console(tls=args.tls, udp_shared_token=args.udp_shared_token)
+        return
+    
+    server = AudioRemoteServer(tls=args.tls, udp_shared_token=args.udp_shared_token)
     server.run()
+
+if __name__ == "__main__":
+    main()
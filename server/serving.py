@@ -0,0 +1,893 @@
+import os
+import ssl
+import sys
+import time
+import queue
+import socket
+import logging
+import selectors
+import socketserver
+import threading
+import http.client
+from collections import deque
+from email.utils import formatdate
+from http import HTTPStatus
+from urllib.parse import unquote_to_bytes, urlsplit
+from werkzeug.serving import WSGIRequestHandler, make_server
+
+logger = logging.getLogger(__name__)
+
+# Configuração do servidor HTTP (variáveis de ambiente)
+SERVER_MODE_ENV = 'AUDIOREMOTE_SERVER_MODE'
+WORKERS_ENV = 'AUDIOREMOTE_WORKERS'
+QUEUE_SIZE_ENV = 'AUDIOREMOTE_QUEUE_SIZE'
+KEEPALIVE_ENV = 'AUDIOREMOTE_KEEPALIVE'
+MAX_STREAMS_ENV = 'AUDIOREMOTE_MAX_STREAMS'
+
+DEFAULT_MODE = "threaded"
+DEFAULT_WORKERS = 8
+DEFAULT_QUEUE_SIZE = 64
+DEFAULT_KEEPALIVE = 5.0
+DEFAULT_MAX_STREAMS = 16
+
+# Conexões keep-alive ociosas no seletor (o select() do Windows aceita até 512 sockets)
+MAX_IDLE_CONNECTIONS = 256
+
+# Limites da requisição: linha inicial, corpo não lido descartado para
+# reaproveitar a conexão e corpo chunked
+MAX_LINE = 64 * 1024
+MAX_DRAIN = 64 * 1024
+MAX_CHUNKED_BODY = 1024 * 1024
+RECV_SIZE = 64 * 1024
+HEX_DIGITS = b"0123456789abcdefABCDEF"
+
+# Chaves do environ WSGI lidas pelo tracing (só na primeira requisição da conexão)
+ACCEPTED_ENVIRON = "audioremote.accepted"
+HANDSHAKE_ENVIRON = "audioremote.tls_handshake"
+
+_REJECT_RESPONSE = (
+    b"HTTP/1.1 503 Service Unavailable\r\n"
+    b"Content-Length: 0\r\n"
+    b"Retry-After: 1\r\n"
+    b"Connection: close\r\n\r\n"
+)
+
+
+class _BadRequest(Exception):
+    """Requisição malformada: responde ``status`` e fecha a conexão"""
+
+    def __init__(self, status):
+        super().__init__(status.phrase)
+        self.status = status
+
+
+class _SocketReader:
+    """Leitura do socket com buffer próprio; o que sobra é a próxima requisição"""
+
+    def __init__(self, sock):
+        self.sock = sock
+        self.buffer = bytearray()
+
+    def _fill(self):
+        data = self.sock.recv(RECV_SIZE)
+        self.buffer += data
+        return bool(data)
+
+    @property
+    def pending(self):
+        """Bytes da próxima requisição já recebidos (no buffer ou decifrados pelo TLS)"""
+        if self.buffer:
+            return True
+        pending = getattr(self.sock, "pending", None)
+        return bool(pending and pending())
+
+    def readline(self, limit=-1):
+        limit = limit if limit is not None and limit >= 0 else sys.maxsize
+        while True:
+            index = self.buffer.find(b"\n", 0, limit)
+            if index >= 0 or len(self.buffer) >= limit:
+                size = index + 1 if index >= 0 else limit
+                break
+            if not self._fill():
+                size = len(self.buffer)
+                break
+        line = bytes(self.buffer[:size])
+        del self.buffer[:size]
+        return line
+
+    def read(self, size):
+        if not self.buffer and not self._fill():
+            return b""
+        data = bytes(self.buffer[:size])
+        del self.buffer[:size]
+        return data
+
+
+class _Body:
+    """wsgi.input limitado ao Content-Length da requisição"""
+
+    def __init__(self, reader, length):
+        self._reader = reader
+        self.remaining = length
+
+    def read(self, size=-1):
+        if size is None or size < 0 or size > self.remaining:
+            size = self.remaining
+        chunks = []
+        while size > 0:
+            data = self._reader.read(size)
+            if not data:
+                break
+            chunks.append(data)
+            size -= len(data)
+            self.remaining -= len(data)
+        return b"".join(chunks)
+
+    def readline(self, size=-1):
+        limit = self.remaining if size is None or size < 0 else min(size, self.remaining)
+        if limit <= 0:
+            return b""
+        line = self._reader.readline(limit)
+        self.remaining -= len(line)
+        return line
+
+    def __iter__(self):
+        while True:
+            line = self.readline()
+            if not line:
+                return
+            yield line
+
+    def drain(self):
+        """Descarta o que a view não leu; False se o cliente desconectou antes"""
+        while self.remaining > 0:
+            if not self.read(min(self.remaining, RECV_SIZE)):
+                return False
+        return True
+
+
+def _read_chunked(reader):
+    """Corpo chunked inteiro (até MAX_CHUNKED_BODY)"""
+    body = bytearray()
+    while True:
+        line = reader.readline(MAX_LINE)
+        digits = line.split(b";", 1)[0].strip()
+        # Só dígitos hexadecimais: int() também aceitaria "+", "_" e "0x"
+        if not digits or digits.strip(HEX_DIGITS):
+            raise _BadRequest(HTTPStatus.BAD_REQUEST)
+        size = int(digits, 16)
+        if size == 0:
+            break
+        if len(body) + size > MAX_CHUNKED_BODY:
+            raise _BadRequest(HTTPStatus.REQUEST_ENTITY_TOO_LARGE)
+        chunk = _Body(reader, size).read()
+        if len(chunk) != size or reader.readline(MAX_LINE).strip():
+            raise _BadRequest(HTTPStatus.BAD_REQUEST)
+        body += chunk
+    # Trailers são ignorados
+    while reader.readline(MAX_LINE).strip():
+        pass
+    return bytes(body)
+
+
+def _simple_response(status, extra=b""):
+    return (f"HTTP/1.1 {status.value} {status.phrase}\r\n".encode() + extra +
+            b"Content-Length: 0\r\nConnection: close\r\n\r\n")
+
+
+class _Connection:
+    """Conexão aceita: socket, buffer de leitura e dados de tracing da primeira requisição"""
+    __slots__ = ("sock", "address", "reader", "accepted", "handshake", "secured", "linger")
+
+    def __init__(self, sock, address, accepted, secured):
+        self.sock = sock
+        self.address = address
+        self.reader = _SocketReader(sock)
+        self.accepted = accepted
+        self.handshake = None
+        self.secured = secured
+        # Fechando com corpo não lido: o resto é descartado antes do close
+        self.linger = False
+
+    def close(self):
+        try:
+            self.sock.close()
+        except OSError:
+            pass
+
+
+class _UpgradeSocket:
+    """Socket entregue ao app em upgrades (werkzeug.socket).
+
+    O simple-websocket faz o próprio handshake e usa o socket diretamente;
+    qualquer uso marca a conexão como assumida pelo app, e a resposta
+    WSGI devolvida depois é descartada.
+    """
+
+    def __init__(self, sock):
+        self._sock = sock
+        self.taken = False
+
+    def __getattr__(self, name):
+        self.taken = True
+        return getattr(self._sock, name)
+
+
+class _Exchange:
+    """Uma requisição e a sua resposta (HTTP/1.1, keep-alive e chunked)"""
+
+    def __init__(self, server, conn, method, target, version, headers):
+        self.server = server
+        self.conn = conn
+        self.method = method
+        self.target = target
+        self.version = version
+        self.headers = headers
+        connection = headers.get("Connection", "").lower()
+        self.upgrade = "upgrade" in connection and "Upgrade" in headers
+        self.keep = version == "HTTP/1.1" and "close" not in connection and not self.upgrade
+        self.body = None
+        self.status = None
+        self.response_headers = None
+        self.headers_sent = False
+        self.has_body = True
+        self.chunked = False
+        self.length = None
+        self.sent = 0
+
+    @property
+    def path(self):
+        """Alvo sem a query string, que pode trazer segredos: é o que vai para os logs"""
+        return self.target.partition("?")[0]
+
+    def environ(self):
+        headers = self.headers
+        if self.target.startswith("/") or self.target == "*":
+            path, _, query = self.target.partition("?")
+        else:
+            split = urlsplit(self.target)
+            path, query = split.path or "/", split.query
+        server = self.server
+        environ = {
+            "REQUEST_METHOD": self.method,
+            "SCRIPT_NAME": "",
+            "PATH_INFO": unquote_to_bytes(path).decode("latin-1"),
+            "QUERY_STRING": query,
+            "REQUEST_URI": self.target,
+            "RAW_URI": self.target,
+            "SERVER_NAME": server.server_address[0],
+            "SERVER_PORT": str(server.port),
+            "SERVER_PROTOCOL": self.version,
+            "REMOTE_ADDR": self.conn.address[0],
+            "REMOTE_PORT": str(self.conn.address[1]),
+            "wsgi.version": (1, 0),
+            "wsgi.url_scheme": "https" if server.ssl_context is not None else "http",
+            "wsgi.errors": sys.stderr,
+            "wsgi.multithread": True,
+            "wsgi.multiprocess": False,
+            "wsgi.run_once": False,
+        }
+        for name, value in headers.items():
+            key = name.upper().replace("-", "_")
+            if key not in ("CONTENT_TYPE", "CONTENT_LENGTH"):
+                key = f"HTTP_{key}"
+            environ[key] = f"{environ[key]},{value}" if key in environ else value
+
+        encoding = headers.get_all("Transfer-Encoding")
+        if encoding:
+            codings = [coding.strip().lower() for coding in ",".join(encoding).split(",")]
+            if codings[-1] != "chunked":
+                # Sem chunked no fim, o tamanho do corpo não pode ser determinado
+                raise _BadRequest(HTTPStatus.BAD_REQUEST)
+            if codings != ["chunked"]:
+                # gzip/deflate antes do chunked não são suportados
+                raise _BadRequest(HTTPStatus.NOT_IMPLEMENTED)
+            if "Content-Length" in headers:
+                # Transfer-Encoding vence, mas a conexão não é reaproveitada (request smuggling)
+                self.keep = False
+                environ.pop("CONTENT_LENGTH", None)
+            self._continue()
+            data = _read_chunked(self.conn.reader)
+            environ["CONTENT_LENGTH"] = str(len(data))
+            # Já decodificado: o app lê até o fim
+            environ["wsgi.input_terminated"] = True
+            self.body = environ["wsgi.input"] = _BufferedBody(data)
+        else:
+            length = environ.get("CONTENT_LENGTH") or "0"
+            # Só dígitos: int() aceitaria sinal, espaços e "_"; valores repetidos chegam unidos por vírgula
+            if not (length.isascii() and length.isdigit()):
+                raise _BadRequest(HTTPStatus.BAD_REQUEST)
+            length = int(length)
+            if length:
+                self._continue()
+            self.body = environ["wsgi.input"] = _Body(self.conn.reader, length)
+
+        if self.conn.accepted is not None:
+            environ[ACCEPTED_ENVIRON] = self.conn.accepted
+            if self.conn.handshake is not None:
+                environ[HANDSHAKE_ENVIRON] = self.conn.handshake
+            self.conn.accepted = self.conn.handshake = None
+        return environ
+
+    def _continue(self):
+        if self.version == "HTTP/1.1" and self.headers.get("Expect", "").lower() == "100-continue":
+            self.conn.sock.sendall(b"HTTP/1.1 100 Continue\r\n\r\n")
+
+    def start_response(self, status, headers, exc_info=None):
+        if exc_info is not None:
+            try:
+                if self.headers_sent:
+                    raise exc_info[1].with_traceback(exc_info[2])
+            finally:
+                exc_info = None
+        self.status, self.response_headers = status, list(headers)
+        return self.write
+
+    @property
+    def content_type(self):
+        for name, value in self.response_headers or ():
+            if name.lower() == "content-type":
+                return value
+        return ""
+
+    def _head(self):
+        code = int(self.status[:3])
+        headers = self.response_headers
+        names = {name.lower() for name, _ in headers}
+        self.has_body = self.method != "HEAD" and code >= 200 and code not in (204, 304)
+        if self.body is not None and self.body.remaining > MAX_DRAIN:
+            # Corpo grande não lido: descartar custaria mais que reconectar
+            self.keep = False
+            self.conn.linger = True
+        if "content-length" in names:
+            self.length = next(int(value) for name, value in headers if name.lower() == "content-length")
+        elif self.has_body:
+            if self.version == "HTTP/1.1":
+                self.chunked = True
+                headers.append(("Transfer-Encoding", "chunked"))
+            else:
+                self.keep = False
+        if "date" not in names:
+            headers.append(("Date", formatdate(usegmt=True)))
+        if not self.keep:
+            headers.append(("Connection", "close"))
+        lines = [f"HTTP/1.1 {self.status}\r\n"]
+        lines.extend(f"{name}: {value}\r\n" for name, value in headers)
+        lines.append("\r\n")
+        return "".join(lines).encode("latin-1")
+
+    def write(self, data):
+        if self.status is None:
+            raise AssertionError("write() antes de start_response()")
+        payload = b""
+        if not self.headers_sent:
+            payload = self._head()
+            self.headers_sent = True
+        if data and self.has_body:
+            self.sent += len(data)
+            payload += b"%x\r\n%s\r\n" % (len(data), data) if self.chunked else data
+        if payload:
+            self.conn.sock.sendall(payload)
+
+    def finish(self):
+        """Termina a resposta; False se a conexão não pode ser reaproveitada"""
+        if not self.headers_sent:
+            self.write(b"")
+        if self.chunked:
+            self.conn.sock.sendall(b"0\r\n\r\n")
+        elif self.has_body and self.length is not None and self.sent != self.length:
+            self.keep = False
+        return self.keep and self.body.drain()
+
+
+class _BufferedBody(_Body):
+    """Corpo chunked já lido inteiro"""
+
+    def __init__(self, data):
+        reader = _SocketReader(None)
+        reader.buffer += data
+        super().__init__(reader, len(data))
+
+
+class PooledWSGIServer(socketserver.TCPServer):
+    """Servidor HTTP/1.1 com pool fixo de workers e fila limitada.
+
+    Um worker só fica com a conexão enquanto há requisição para atender.
+    Conexões keep-alive ociosas esperam em um seletor (uma thread para
+    todas, até ``keepalive`` segundos) e voltam para a fila quando chega
+    a próxima requisição; com a fila cheia a resposta é 503. Requisições
+    longas, WebSocket (/ws) e SSE (text/event-stream), rodam em threads
+    próprias, no máximo ``max_streams``, sem ocupar o pool.
+
+    Com ``ssl_context`` o handshake TLS roda no worker, não na thread que
+    aceita conexões, e é contado como completo ou retomado (sessão).
+    """
+    allow_reuse_address = True
+    daemon_threads = True
+
+    def __init__(self, host, port, app, workers=DEFAULT_WORKERS,
+                 queue_size=DEFAULT_QUEUE_SIZE, keepalive=DEFAULT_KEEPALIVE,
+                 ssl_context=None, max_streams=DEFAULT_MAX_STREAMS):
+        self.address_family = socket.AF_INET6 if ":" in host else socket.AF_INET
+        # Backlog do listen() acompanha o tamanho da fila
+        self.request_queue_size = queue_size
+        super().__init__((host, port), None)
+        self.port = self.server_address[1]
+        self.app = app
+        self.ssl_context = ssl_context
+        if ssl_context is not None:
+            self.socket = ssl_context.wrap_socket(self.socket, server_side=True, do_handshake_on_connect=False)
+        self.keepalive = self.handshake_timeout = keepalive
+        self.workers = workers
+        self.max_streams = max_streams
+        self.rejected = 0
+        self.streams_rejected = 0
+        self.tls_counts = {"full": 0, "resumed": 0, "failed": 0}
+        self.tls_seconds = {"full": 0.0, "resumed": 0.0}
+        self._tls_lock = threading.Lock()
+        self._closed = False
+        self._ready = queue.Queue(maxsize=queue_size)
+        # Conexões ociosas: só a thread do seletor mexe em _idle e no seletor
+        self._idle = {}
+        self._parking = deque()
+        self._selector = selectors.DefaultSelector()
+        self._wakeup, self._wakeup_writer = socket.socketpair()
+        self._wakeup.setblocking(False)
+        self._wakeup_writer.setblocking(False)
+        self._selector.register(self._wakeup, selectors.EVENT_READ)
+        self._streams = set()
+        self._streams_lock = threading.Lock()
+        self._threads = [
+            threading.Thread(target=self._worker, name=f"http-worker-{i}", daemon=True)
+            for i in range(workers)
+        ]
+        self._threads.append(threading.Thread(target=self._poll, name="http-keepalive", daemon=True))
+        for thread in self._threads:
+            thread.start()
+
+    def process_request(self, request, client_address):
+        # Respostas pequenas em vários writes (cabeçalho, corpo, registros
+        # TLS) não devem esperar o ACK atrasado do cliente (Nagle)
+        try:
+            request.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        except OSError:
+            pass
+        request.settimeout(self.keepalive)
+        conn = _Connection(request, client_address, time.perf_counter(), self.ssl_context is None)
+        # Só ocupa um worker quando a primeira requisição (ou o ClientHello) chegar
+        self._park(conn)
+
+    def _dispatch(self, conn):
+        try:
+            self._ready.put_nowait(conn)
+        except queue.Full:
+            self.rejected += 1
+            try:
+                conn.sock.sendall(_REJECT_RESPONSE)
+            except OSError:
+                pass
+            conn.close()
+
+    def _park(self, conn):
+        """Conexão ociosa vai para o seletor até chegar a próxima requisição"""
+        if self._closed:
+            conn.close()
+            return
+        self._parking.append(conn)
+        try:
+            self._wakeup_writer.send(b"\0")
+        except OSError:
+            # Buffer cheio: a thread do seletor já tem o que acordar
+            pass
+
+    def _poll(self):
+        """Thread do seletor: devolve à fila as conexões que ficaram legíveis"""
+        while not self._closed:
+            timeout = None
+            if self._idle:
+                timeout = max(0.0, next(iter(self._idle.values())) - time.monotonic())
+            for key, _ in self._selector.select(timeout):
+                if key.data is None:
+                    try:
+                        while self._wakeup.recv(4096):
+                            pass
+                    except OSError:
+                        pass
+                    continue
+                conn = key.data
+                if conn.linger and self._discard(conn):
+                    continue
+                self._selector.unregister(conn.sock)
+                del self._idle[conn]
+                if conn.linger:
+                    conn.close()
+                else:
+                    if conn.accepted is not None:
+                        # O accept conta a partir da chegada da primeira requisição:
+                        # uma conexão aberta antes e deixada ociosa não entra no span
+                        conn.accepted = time.perf_counter()
+                    self._dispatch(conn)
+            while self._parking:
+                conn = self._parking.popleft()
+                try:
+                    self._selector.register(conn.sock, selectors.EVENT_READ, conn)
+                except (OSError, ValueError):
+                    conn.close()
+                    continue
+                self._idle[conn] = time.monotonic() + self.keepalive
+            # _idle está em ordem de prazo: todas as conexões têm o mesmo keepalive
+            now = time.monotonic()
+            while self._idle:
+                conn, deadline = next(iter(self._idle.items()))
+                if deadline > now and len(self._idle) <= MAX_IDLE_CONNECTIONS:
+                    break
+                self._selector.unregister(conn.sock)
+                del self._idle[conn]
+                conn.close()
+        for conn in list(self._idle) + list(self._parking):
+            conn.close()
+        self._idle.clear()
+        self._selector.close()
+        self._wakeup.close()
+        self._wakeup_writer.close()
+
+    @staticmethod
+    def _discard(conn):
+        """Lê e descarta o que o cliente ainda envia; False no EOF"""
+        try:
+            return bool(conn.sock.recv(RECV_SIZE))
+        except OSError:
+            return False
+
+    def _close(self, conn):
+        """Fecha a conexão; com corpo não lido, fecha só a escrita e descarta o resto no seletor.
+
+        Um close() com dados não lidos no socket envia RST, e o cliente
+        que ainda está enviando o corpo pode perder a resposta.
+        """
+        if not conn.linger or self._closed:
+            conn.close()
+            return
+        try:
+            conn.sock.shutdown(socket.SHUT_WR)
+        except OSError:
+            conn.close()
+            return
+        self._park(conn)
+
+    def _worker(self):
+        while True:
+            conn = self._ready.get()
+            if conn is None:
+                break
+            try:
+                self._serve(conn)
+            except Exception:
+                logger.exception("Erro inesperado na conexão HTTP")
+                conn.close()
+
+    def _serve(self, conn):
+        """Atende as requisições já recebidas; ociosa, a conexão volta ao seletor"""
+        if not conn.secured:
+            if not self._handshake(conn):
+                conn.close()
+                return
+            conn.secured = True
+        while True:
+            keep = self._handle(conn)
+            if keep is None:
+                # Conexão entregue a uma thread de stream
+                return
+            if not keep or self._closed:
+                self._close(conn)
+                return
+            if not conn.reader.pending:
+                break
+        self._park(conn)
+
+    def _read_request(self, conn):
+        """_Exchange da próxima requisição, ou None se o cliente fechou a conexão"""
+        reader = conn.reader
+        line = reader.readline(MAX_LINE + 1)
+        while line in (b"\r\n", b"\n"):
+            line = reader.readline(MAX_LINE + 1)
+        if not line:
+            return None
+        if len(line) > MAX_LINE:
+            raise _BadRequest(HTTPStatus.REQUEST_URI_TOO_LONG)
+        parts = line.decode("latin-1").split()
+        if len(parts) != 3 or not parts[2].startswith("HTTP/"):
+            raise _BadRequest(HTTPStatus.BAD_REQUEST)
+        if parts[2] not in ("HTTP/1.0", "HTTP/1.1"):
+            raise _BadRequest(HTTPStatus.HTTP_VERSION_NOT_SUPPORTED)
+        target = parts[1]
+        # origin-form, absolute-form ou "*" (OPTIONS)
+        if not (target.startswith("/") or target == "*" or target.lower().startswith(("http://", "https://"))):
+            raise _BadRequest(HTTPStatus.BAD_REQUEST)
+        try:
+            headers = http.client.parse_headers(reader)
+        except http.client.HTTPException:
+            raise _BadRequest(HTTPStatus.REQUEST_HEADER_FIELDS_TOO_LARGE) from None
+        return _Exchange(self, conn, parts[0], parts[1], parts[2], headers)
+
+    def _handle(self, conn):
+        """Uma requisição: True para manter a conexão, False para fechar, None se foi entregue"""
+        try:
+            exchange = self._read_request(conn)
+            if exchange is None:
+                return False
+            environ = exchange.environ()
+        except _BadRequest as e:
+            try:
+                conn.sock.sendall(_simple_response(e.status))
+            except OSError:
+                pass
+            return False
+        except OSError:
+            # Timeout, cliente desconectou ou erro TLS
+            return False
+        if exchange.upgrade:
+            return self._start_stream(self._upgrade, exchange, environ)
+        return self._respond(exchange, environ)
+
+    def _respond(self, exchange, environ):
+        try:
+            result = self.app(environ, exchange.start_response)
+        except Exception:
+            logger.exception(f"Erro ao atender {exchange.method} {exchange.path}")
+            return self._fail(exchange)
+        try:
+            if exchange.content_type.startswith("text/event-stream"):
+                # SSE segura a conexão indefinidamente: sai do pool
+                started = self._start_stream(self._stream_response, exchange, result)
+                if started is None:
+                    result = None
+                return started
+            for data in result:
+                exchange.write(data)
+            return exchange.finish()
+        except OSError:
+            return False
+        except Exception:
+            logger.exception(f"Erro ao atender {exchange.method} {exchange.path}")
+            return self._fail(exchange)
+        finally:
+            if result is not None and hasattr(result, "close"):
+                result.close()
+
+    def _fail(self, exchange):
+        if not exchange.headers_sent:
+            try:
+                exchange.conn.sock.sendall(_simple_response(HTTPStatus.INTERNAL_SERVER_ERROR))
+            except OSError:
+                pass
+        return False
+
+    def _start_stream(self, target, exchange, argument):
+        """Roda target em uma thread própria; None se iniciou, False (após 503) no limite"""
+        conn = exchange.conn
+        with self._streams_lock:
+            rejected = self._closed or len(self._streams) >= self.max_streams
+            if rejected:
+                self.streams_rejected += 1
+            else:
+                self._streams.add(conn)
+        if rejected:
+            try:
+                conn.sock.sendall(_REJECT_RESPONSE)
+            except OSError:
+                pass
+            return False
+        thread = threading.Thread(target=self._run_stream, args=(target, exchange, argument),
+                                  name="http-stream", daemon=True)
+        thread.start()
+        return None
+
+    def _run_stream(self, target, exchange, argument):
+        conn = exchange.conn
+        try:
+            target(exchange, argument)
+        except Exception:
+            logger.exception(f"Erro no stream {exchange.path}")
+        finally:
+            with self._streams_lock:
+                self._streams.discard(conn)
+            conn.close()
+
+    def _upgrade(self, exchange, environ):
+        """WebSocket: o app assume o socket; um upgrade recusado recebe a resposta normal"""
+        upgrade_socket = environ["werkzeug.socket"] = _UpgradeSocket(exchange.conn.sock)
+        result = self.app(environ, exchange.start_response)
+        try:
+            if not upgrade_socket.taken:
+                for data in result:
+                    exchange.write(data)
+                exchange.finish()
+        except OSError:
+            pass
+        finally:
+            if hasattr(result, "close"):
+                result.close()
+
+    def _stream_response(self, exchange, result):
+        try:
+            for data in result:
+                exchange.write(data)
+            exchange.finish()
+        except OSError:
+            # Cliente desconectou
+            pass
+        finally:
+            if hasattr(result, "close"):
+                result.close()
+
+    def _handshake(self, conn):
+        """Handshake TLS no worker; False se o cliente desistiu ou recusou o certificado"""
+        start = time.perf_counter()
+        try:
+            conn.sock.settimeout(self.handshake_timeout)
+            conn.sock.do_handshake()
+        except (ssl.SSLError, OSError):
+            with self._tls_lock:
+                self.tls_counts["failed"] += 1
+            return False
+        end = time.perf_counter()
+        conn.handshake = (start, end)
+        kind = "resumed" if conn.sock.session_reused else "full"
+        with self._tls_lock:
+            self.tls_counts[kind] += 1
+            self.tls_seconds[kind] += end - start
+        return True
+
+    def stats(self):
+        stats = {
+            "mode": "threaded",
+            "workers": self.workers,
+            "queued": self._ready.qsize(),
+            "queue_size": self._ready.maxsize,
+            "rejected": self.rejected,
+            "idle_connections": len(self._idle),
+            "streams": len(self._streams),
+            "max_streams": self.max_streams,
+            "streams_rejected": self.streams_rejected,
+        }
+        if self.ssl_context is not None:
+            with self._tls_lock:
+                counts, seconds = dict(self.tls_counts), dict(self.tls_seconds)
+            for kind in ("full", "resumed"):
+                stats[f"tls_{kind}_handshakes"] = counts[kind]
+                stats[f"tls_{kind}_avg_ms"] = round(seconds[kind] / counts[kind] * 1000, 3) if counts[kind] else None
+            stats["tls_failed_handshakes"] = counts["failed"]
+        return stats
+
+    def server_close(self):
+        super().server_close()
+        with self._streams_lock:
+            self._closed = True
+            streams = list(self._streams)
+        try:
+            self._wakeup_writer.send(b"\0")
+        except OSError:
+            pass
+        for conn in streams:
+            try:
+                conn.sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+        for _ in range(self.workers):
+            # Os workers terminam depois de esvaziar a fila
+            self._ready.put(None)
+
+
+class _DevRequestHandler(WSGIRequestHandler):
+    def log_request(self, code="-", size="-"):
+        # A query string pode trazer segredos: o log do Werkzeug mostra só o caminho
+        self.path = self.path.partition("?")[0]
+        super().log_request(code, size)
+
+
+class WerkzeugDevServer:
+    """Servidor de desenvolvimento do Werkzeug (comportamento antigo do app.run)"""
+
+    def __init__(self, host, port, app, ssl_context=None, **_):
+        self._server = make_server(host, port, app, threaded=True, ssl_context=ssl_context,
+                                   request_handler=_DevRequestHandler)
+        self.port = self._server.port
+
+    def serve_forever(self):
+        self._server.serve_forever()
+
+    def shutdown(self):
+        self._server.shutdown()
+
+    def server_close(self):
+        self._server.server_close()
+
+    def stats(self):
+        return {"mode": "dev"}
+
+
+class WaitressServer:
+    """Servidor WSGI de produção waitress (importado só neste modo).
+
+    Não suporta WebSocket; use o modo "threaded" se o canal /ws for necessário.
+    """
+
+    def __init__(self, host, port, app, workers=DEFAULT_WORKERS,
+                 queue_size=DEFAULT_QUEUE_SIZE, keepalive=DEFAULT_KEEPALIVE,
+                 ssl_context=None):
+        if ssl_context is not None:
+            raise ValueError("O modo waitress não suporta TLS")
+        from waitress.server import create_server
+
+        self.workers = workers
+        self._server = create_server(
+            app,
+            host=host,
+            port=port,
+            threads=workers,
+            connection_limit=queue_size,
+            backlog=queue_size,
+            channel_timeout=keepalive,
+            ident="AudioRemote",
+        )
+        self.port = self._server.effective_port
+
+    def serve_forever(self):
+        self._server.run()
+
+    def shutdown(self):
+        # Termina as tarefas em andamento e fecha o socket de escuta. Os
+        # canais abertos são fechados pela própria thread do loop (will_close,
+        # como faz a manutenção do waitress) e run() retorna sem nenhum
+        self._server.task_dispatcher.shutdown()
+        for channel in self._server.active_channels.copy().values():
+            channel.will_close = True
+        self._server.close()
+
+    def server_close(self):
+        pass
+
+    def stats(self):
+        return {
+            "mode": "waitress",
+            "workers": self.workers,
+            "queued": len(self._server.task_dispatcher.queue),
+            "active_channels": len(self._server.active_channels),
+        }
+
+
+SERVER_MODES = {
+    "threaded": PooledWSGIServer,
+    "waitress": WaitressServer,
+    "dev": WerkzeugDevServer,
+}
+
+
+def create_http_server(app, host, port, mode=None, workers=None, queue_size=None,
+                       keepalive=None, ssl_context=None):
+    """Cria o servidor HTTP no modo configurado (padrão: threaded).
+
+    O socket já fica escutando ao retornar; use serve_forever() em uma
+    thread e shutdown() + server_close() para parar.
+    """
+    mode = mode or os.environ.get(SERVER_MODE_ENV, DEFAULT_MODE)
+    if mode not in SERVER_MODES:
+        raise ValueError(f"Modo de servidor desconhecido: {mode}")
+
+    options = {
+        "workers": workers or int(os.environ.get(WORKERS_ENV, DEFAULT_WORKERS)),
+        "queue_size": queue_size or int(os.environ.get(QUEUE_SIZE_ENV, DEFAULT_QUEUE_SIZE)),
+        "keepalive": keepalive or float(os.environ.get(KEEPALIVE_ENV, DEFAULT_KEEPALIVE)),
+        "ssl_context": ssl_context,
+    }
+    if mode == "threaded":
+        options["max_streams"] = int(os.environ.get(MAX_STREAMS_ENV, DEFAULT_MAX_STREAMS))
+    try:
+        server = SERVER_MODES[mode](host, port, app, **options)
+    except SystemExit as e:
+        # O Werkzeug encerra o processo quando a porta está em uso
+        raise OSError(f"Não foi possível escutar em {host}:{port}") from e
+
+    logger.info(f"🌐 Servidor HTTP em modo {mode} ({options['workers']} workers)")
+    return server
@@ -0,0 +1,108 @@
+import secrets
+import threading
+
+
+class SessionIndex:
+    """Índice das sessões de áudio por aplicativo (PID e nome do processo).
+
+    A primeira consulta enumera as sessões no backend; depois o índice é
+    mantido pelos avisos de sessão criada, alterada e expirada, sem
+    enumerar de novo a cada requisição. Cada mudança incrementa a versão
+    que compõe o ETag de GET /sessions.
+    """
+
+    def __init__(self, backend):
+        self.backend = backend
+        self.loads = 0
+        self.events = 0
+        self._sessions = {}
+        self._loaded = False
+        self._version = 0
+        # Distingue os ETags de execuções diferentes do servidor
+        self._generation = secrets.token_hex(4)
+        self._lock = threading.Lock()
+        backend.subscribe_sessions(self._on_event)
+
+    def _on_event(self, event, session):
+        with self._lock:
+            self.events += 1
+            if event == "reset":
+                # Troca de dispositivo: relê tudo na próxima consulta
+                self._sessions = {}
+                self._loaded = False
+            elif not self._loaded:
+                return
+            elif event == "expired":
+                if self._sessions.pop(session["pid"], None) is None:
+                    return
+            else:
+                if self._sessions.get(session["pid"]) == session:
+                    return
+                self._sessions[session["pid"]] = session
+            self._version += 1
+
+    def _ensure_loaded(self):
+        # Avisos que chegam durante a enumeração esperam o lock e são aplicados depois
+        with self._lock:
+            if self._loaded:
+                return
+            sessions = self.backend.get_sessions()
+            self._sessions = {session["pid"]: session for session in sessions}
+            self._loaded = True
+            self._version += 1
+            self.loads += 1
+
+    @property
+    def etag(self):
+        return f"{self._generation}-{self._version}"
+
+    def snapshot(self):
+        """Retorna (sessões ordenadas por nome, ETag)"""
+        self._ensure_loaded()
+        with self._lock:
+            sessions = sorted(self._sessions.values(), key=lambda s: (s["name"].lower(), s["pid"]))
+            return [dict(session) for session in sessions], self.etag
+
+    def find(self, key):
+        """Sessões de um PID ("1234") ou de um processo ("spotify" ou "Spotify.exe")"""
+        self._ensure_loaded()
+        with self._lock:
+            if key.isdigit():
+                session = self._sessions.get(int(key))
+                return [dict(session)] if session else []
+            name = key.lower()
+            return [dict(session) for session in self._sessions.values()
+                    if session["name"].lower() in (name, f"{name}.exe")]
+
+    def apply_change(self, sessions, change):
+        """Aplica a VolumeChange a cada sessão e retorna [(sessão resultante, se houve escrita)]
+
+        O estado de partida é lido no backend, no mesmo passo da escrita
+        (o índice só é atualizado quando o aviso da sessão chega). O
+        resultado já entra no índice antes de retornar.
+        """
+        results = []
+        for session in sessions:
+            state, changed = self.backend.apply_session_change(session["pid"], change)
+            session = dict(session, **state)
+            if changed:
+                self._store(session)
+            results.append((session, changed))
+        return results
+
+    def _store(self, session):
+        with self._lock:
+            current = self._sessions.get(session["pid"])
+            if current is None or current == session:
+                return
+            self._sessions[session["pid"]] = dict(current, volume=session["volume"], muted=session["muted"])
+            self._version += 1
+
+    def stats(self):
+        return {
+            "loaded": self._loaded,
+            "sessions": len(self._sessions),
+            "version": self._version,
+            "loads": self.loads,
+            "events": self.events,
+        }
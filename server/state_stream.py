@@ -0,0 +1,155 @@
+import os
+import json
+import logging
+import threading
+from audio_backend import AudioBackendError
+
+logger = logging.getLogger(__name__)
+
+# Streams SSE simultâneos (cada um ocupa uma thread de stream do servidor HTTP)
+SSE_MAX_CLIENTS_ENV = 'AUDIOREMOTE_SSE_MAX_CLIENTS'
+DEFAULT_SSE_MAX_CLIENTS = int(os.environ.get(SSE_MAX_CLIENTS_ENV, 4))
+
+# Comentário enviado em streams ociosos (detecta clientes desconectados)
+SSE_HEARTBEAT = 15.0
+
+
+class _Stream:
+    """Stream SSE aberto; a vaga é liberada uma única vez, no fim da iteração ou no close().
+
+    Um gerador que nunca começou a ser iterado não executa o seu
+    ``finally``; o servidor WSGI sempre chama ``close()`` na resposta.
+    """
+
+    def __init__(self, cache, events):
+        self._cache = cache
+        self._events = events
+        self.open = True
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        try:
+            return next(self._events)
+        except StopIteration:
+            self.close()
+            raise
+
+    def close(self):
+        if self._cache._release_stream(self):
+            self._events.close()
+
+
+class AudioStateCache:
+    """Volume/mudo atuais mantidos pelas notificações do backend de áudio.
+
+    GET /state lê só o cache; o backend é consultado apenas quando o
+    estado é desconhecido (início ou troca de dispositivo). Cada mudança
+    incrementa ``version`` e acorda os streams SSE abertos.
+    """
+
+    def __init__(self, backend, max_streams=DEFAULT_SSE_MAX_CLIENTS):
+        self.backend = backend
+        self.max_streams = max_streams
+        self.version = 0
+        self.streams = 0
+        self.reads = 0
+        self.events = 0
+        self.rejected_streams = 0
+        self._state = None
+        self._epoch = 0
+        self._cond = threading.Condition()
+        backend.subscribe(self._on_change)
+
+    def _on_change(self, volume, muted):
+        state = None if volume is None else {"volume": round(volume, 1), "muted": muted}
+        with self._cond:
+            if state is not None and state == self._state:
+                return
+            self._state = state
+            self.version += 1
+            self.events += 1
+            self._cond.notify_all()
+
+    def get(self):
+        """Estado atual com a versão; lê o backend se o cache estiver vazio"""
+        with self._cond:
+            if self._state is not None:
+                return dict(self._state, version=self.version)
+            version = self.version
+
+        raw = self.backend.get_state()
+        state = {"volume": round(raw["volume"], 1), "muted": raw["muted"]}
+        with self._cond:
+            self.reads += 1
+            # Uma notificação mais recente prevalece sobre a leitura
+            if self.version == version:
+                self._state = state
+            return dict(self._state or state, version=self.version)
+
+    def peek(self):
+        """Estado em cache com a versão, ou None; nunca consulta o backend"""
+        with self._cond:
+            if self._state is None:
+                return None
+            return dict(self._state, version=self.version)
+
+    def wait_for_change(self, version, timeout):
+        """Aguarda a versão mudar; False em timeout ou se os streams foram encerrados"""
+        with self._cond:
+            epoch = self._epoch
+            self._cond.wait_for(lambda: self.version != version or self._epoch != epoch, timeout)
+            return self.version != version and self._epoch == epoch
+
+    def open_stream(self, heartbeat=SSE_HEARTBEAT):
+        """Iterável de eventos SSE (libera a vaga no close), ou None se o limite foi atingido"""
+        with self._cond:
+            if self.streams >= self.max_streams:
+                self.rejected_streams += 1
+                return None
+            self.streams += 1
+            epoch = self._epoch
+        return _Stream(self, self._events(epoch, heartbeat))
+
+    def _release_stream(self, stream):
+        """Libera a vaga do stream; False se já tinha sido liberada"""
+        with self._cond:
+            if not stream.open:
+                return False
+            stream.open = False
+            self.streams -= 1
+            return True
+
+    def _events(self, epoch, heartbeat):
+        version = None
+        while self._epoch == epoch:
+            if version is not None and not self.wait_for_change(version, heartbeat):
+                if self._epoch != epoch:
+                    break
+                yield ": keepalive\n\n"
+                continue
+            try:
+                state = self.get()
+            except AudioBackendError as e:
+                # Tenta de novo na próxima mudança ou heartbeat
+                version = self.version
+                yield f"event: error\ndata: {json.dumps({'error': str(e)})}\n\n"
+                continue
+            version = state["version"]
+            yield f"event: state\nid: {version}\ndata: {json.dumps(state)}\n\n"
+
+    def close_streams(self):
+        """Encerra os streams abertos (ao parar o servidor HTTP)"""
+        with self._cond:
+            self._epoch += 1
+            self._cond.notify_all()
+
+    def stats(self):
+        return {
+            "version": self.version,
+            "events": self.events,
+            "backend_reads": self.reads,
+            "streams": self.streams,
+            "rejected_streams": self.rejected_streams,
+        }
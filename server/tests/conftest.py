@@ -0,0 +1,11 @@
+import os
+import sys
+
+# Os módulos do servidor ficam soltos em server/ (como nos benchmarks)
+SERVER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if SERVER_DIR not in sys.path:
+    sys.path.insert(0, SERVER_DIR)
+
+# Backends em memória: os testes rodam fora do Windows
+os.environ.setdefault("AUDIOREMOTE_AUDIO_BACKEND", "fake")
+os.environ.setdefault("AUDIOREMOTE_KEYBOARD_BACKEND", "fake")
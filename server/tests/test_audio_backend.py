@@ -0,0 +1,45 @@
+import pytest
+from audio_backend import PycawAudioBackend
+
+
+@pytest.fixture
+def backend():
+    backend = PycawAudioBackend()
+    # Sem thread COM: _run é chamado direto, com um endpoint falso
+    backend._started = True
+    backend._endpoint = object()
+    backend.acquired = 0
+
+    def acquire():
+        backend.acquired += 1
+        return object()
+
+    backend._acquire = acquire
+    return backend
+
+
+def test_run_retries_once_after_endpoint_error(backend):
+    calls = []
+
+    def func(endpoint):
+        calls.append(endpoint)
+        if len(calls) == 1:
+            raise OSError("dispositivo removido")
+        return "ok"
+
+    assert backend._run(func) == "ok"
+    assert backend.acquired == 1
+    assert len(calls) == 2
+
+
+def test_run_does_not_retry_other_errors(backend):
+    calls = []
+
+    def func(endpoint):
+        calls.append(endpoint)
+        raise KeyError("Sessão 42 não encontrada")
+
+    with pytest.raises(KeyError):
+        backend._run(func)
+    assert backend.acquired == 0
+    assert len(calls) == 1
@@ -0,0 +1,39 @@
+import time
+from auth_guard import AuthGuard, LOG, SUPPRESS, BLOCK
+
+
+def test_authenticated_requests_are_never_limited():
+    guard = AuthGuard()
+    for _ in range(1000):
+        assert guard.check("10.0.0.1") == 0
+    assert guard.stats()["tracked_clients"] == 0
+
+
+def test_failures_below_the_limit_do_not_block():
+    guard = AuthGuard(max_failures=3, failure_window=0.05)
+    for _ in range(2):
+        guard.record_failure("10.0.0.1", "invalid")
+    time.sleep(0.06)
+    # A janela expirou: a contagem recomeça
+    assert guard.record_failure("10.0.0.1", "invalid") != BLOCK
+    assert guard.check("10.0.0.1") == 0
+
+
+def test_repeated_failures_are_summarized():
+    guard = AuthGuard(max_failures=100)
+    assert guard.record_failure("10.0.0.1", "invalid") == LOG
+    assert guard.record_failure("10.0.0.1", "invalid") == SUPPRESS
+    assert guard.record_failure("10.0.0.1", "invalid") == SUPPRESS
+    # O resumo sai sem precisar de uma nova falha
+    assert guard.drain_summaries() == [("10.0.0.1", "invalid", 2)]
+    assert guard.drain_summaries() == []
+    assert guard.record_failure("10.0.0.1", "invalid") == LOG
+
+
+def test_block_after_max_failures():
+    guard = AuthGuard(max_failures=3, block_seconds=60)
+    decisions = [guard.record_failure("10.0.0.1", "invalid") for _ in range(3)]
+    assert decisions[-1] == BLOCK
+    assert guard.check("10.0.0.1") > 0
+    assert guard.check("10.0.0.2") == 0
+    assert guard.stats()["blocked_clients"] == 1
@@ -0,0 +1,84 @@
+import pytest
+from core import ServerCore
+from media_controller import ControlError, MediaController, MAX_BATCH_SIZE
+
+
+@pytest.fixture
+def core(tmp_path):
+    core = ServerCore(token_file=str(tmp_path / "server_token.txt"))
+    yield core
+    core.close()
+
+
+@pytest.fixture
+def post(core):
+    client = core.app.test_client()
+
+    def post(body, token=None):
+        headers = {"Authorization": f"Bearer {token or core.token}"}
+        return client.post("/batch", json=body, headers=headers)
+
+    return post
+
+
+def test_batch_runs_in_order(core, post):
+    response = post({"ops": [{"op": "cmd", "action": "next"}, {"op": "vol", "level": 30}, {"op": "ping"}]})
+    assert response.status_code == 200
+    results = response.get_json()["results"]
+    assert [(r["op"], r["ok"], r["status"]) for r in results] == [("cmd", True, 202), ("vol", True, 200),
+                                                                 ("ping", True, 200)]
+    assert all("ms" in r for r in results)
+    assert core.audio.get_volume() == 30
+
+
+@pytest.mark.parametrize("body", [
+    {},
+    {"ops": []},
+    {"ops": "ping"},
+    {"ops": [{"op": "cmd", "action": "next"}, {"op": "bogus"}]},
+    {"ops": [{"op": "vol", "level": 101}]},
+    {"ops": [{"op": "wait", "ms": 2001}]},
+    {"ops": [{"op": "wait", "ms": True}]},
+])
+def test_invalid_batches_run_nothing(core, post, body):
+    response = post(body)
+    assert response.status_code == 400
+    assert core.input_dispatcher.stats()["submitted"] == 0
+
+
+def test_batch_size_limit(post):
+    assert post({"ops": [{"op": "ping"}] * MAX_BATCH_SIZE}).status_code == 200
+    response = post({"ops": [{"op": "ping"}] * (MAX_BATCH_SIZE + 1)})
+    assert response.status_code == 400
+
+
+def test_total_wait_limit(post):
+    assert post({"ops": [{"op": "wait", "ms": 0}] * 3}).status_code == 200
+    # Cada espera é válida, mas a soma passa de 5000 ms
+    response = post({"ops": [{"op": "wait", "ms": 2000}] * 3})
+    assert response.status_code == 400
+    assert "5000" in response.get_json()["error"]
+
+
+def test_operation_scopes(core, post):
+    device, token = core.credentials.add("botões", "command")
+    assert post({"ops": [{"op": "cmd", "action": "next"}]}, token).status_code == 200
+    response = post({"ops": [{"op": "cmd", "action": "next"}, {"op": "vol", "level": 10}]}, token)
+    assert response.status_code == 403
+
+
+class FullQueue:
+    actions = ("playpause", "next", "prev")
+
+    def submit(self, action):
+        return False
+
+
+@pytest.mark.parametrize("stop_on_error, statuses", [(True, [503, None]), (False, [503, 200])])
+def test_stop_on_error(stop_on_error, statuses):
+    controller = MediaController(FullQueue(), volume_scheduler=None)
+    results = controller.run_batch([{"op": "cmd", "action": "next"}, {"op": "ping"}], stop_on_error=stop_on_error)
+    assert [r["status"] for r in results] == statuses
+    assert results[1].get("skipped", False) is stop_on_error
+    with pytest.raises(ControlError):
+        controller.run_batch([{"op": "ping"}] * (MAX_BATCH_SIZE + 1))
@@ -0,0 +1,78 @@
+import os
+import json
+import pytest
+from credentials import CredentialStore, CredentialError, SERVER_TOKEN_DEVICE, udp_key
+
+
+@pytest.fixture
+def store(tmp_path):
+    # Sem intervalo: cada verificação confere o mtime do arquivo
+    return CredentialStore(str(tmp_path / "server_devices.json"), reload_interval=0)
+
+
+def test_add_and_verify(store):
+    device, token = store.add("celular", "command")
+    assert store.verify(token).id == device.id
+    assert store.verify(token + "x") is None
+    assert store.find(device.id).name == "celular"
+    assert device.allows("command") and not device.allows("volume")
+
+
+def test_revoke_takes_effect_immediately(store):
+    device, token = store.add("celular")
+    other, other_token = store.add("tablet")
+    store.revoke("celular")
+    assert store.verify(token) is None
+    assert store.current(device) is None
+    assert store.find(device.id) is None
+    assert store.verify(other_token).id == other.id
+    assert store.current(SERVER_TOKEN_DEVICE) is SERVER_TOKEN_DEVICE
+    with pytest.raises(CredentialError):
+        store.revoke("celular")
+
+
+def test_reload_picks_up_external_edits(store):
+    device, token = store.add("celular", "command")
+    with open(store.path, encoding="utf-8") as f:
+        data = json.load(f)
+    data["devices"][0]["scopes"] = ["volume"]
+    with open(store.path, "w", encoding="utf-8") as f:
+        json.dump(data, f)
+    # Garante um mtime diferente mesmo em sistemas de arquivos com resolução baixa
+    stat = os.stat(store.path)
+    os.utime(store.path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    current = store.current(device)
+    assert current.scope_names == ["volume"]
+    assert store.stats()["reloads"] >= 2
+
+
+def test_invalid_file_keeps_previous_devices(store):
+    device, token = store.add("celular")
+    with open(store.path, "w", encoding="utf-8") as f:
+        f.write("{invalid")
+    stat = os.stat(store.path)
+    os.utime(store.path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    assert store.verify(token).id == device.id
+    assert store.stats()["reload_errors"] == 1
+
+
+@pytest.mark.parametrize("content", [
+    "[]",
+    '{"devices": [1]}',
+    '{"devices": [{"name": "sem hash"}]}',
+    '{"devices": [{"id": "a", "token_sha256": "zz"}]}',
+    '{"devices": [{"id": "a", "token_sha256": "' + "0" * 64 + '", "scopes": 5}]}',
+])
+def test_schema_errors_become_credential_errors(store, content):
+    with open(store.path, "w", encoding="utf-8") as f:
+        f.write(content)
+    with pytest.raises(CredentialError):
+        store.add("celular")
+
+
+def test_udp_key_is_not_the_verification_hash(store):
+    device, token = store.add("celular")
+    assert device.udp_key == udp_key(token)
+    assert device.udp_key != device.token_hash
+    with open(store.path, encoding="utf-8") as f:
+        assert json.load(f)["devices"][0]["udp_key"] == device.udp_key
@@ -0,0 +1,96 @@
+import json
+import socket
+import threading
+import pytest
+import discovery
+from discovery import DiscoveryResponder, Interface, PROBE, list_interfaces
+
+
+INTERFACES = [
+    Interface("Wi-Fi", "192.168.1.20", "255.255.255.0"),
+    Interface("Ethernet", "10.0.0.5", "255.255.0.0"),
+    Interface("tailscale0", "100.101.102.103", "255.192.0.0"),
+]
+
+
+@pytest.fixture
+def responder(monkeypatch):
+    monkeypatch.setattr(discovery, "list_interfaces", lambda default_ip=None: list(INTERFACES))
+    responder = DiscoveryResponder(lambda: {"name": "pc", "tls": False}, 5000, port=0, host="127.0.0.1")
+    yield responder
+    responder.shutdown()
+
+
+def decode(response):
+    return json.loads(response.decode())
+
+
+def test_answers_with_the_interface_of_the_sender_subnet(responder):
+    wifi = decode(responder.handle(PROBE, ("192.168.1.77", 40000)))
+    assert wifi["ip"] == "192.168.1.20"
+    assert wifi["url"] == "http://192.168.1.20:5000"
+    assert wifi["addresses"] == ["192.168.1.20", "10.0.0.5", "100.101.102.103"]
+
+    # /16: endereço fora do /24 do IP local, mas dentro da máscara
+    assert decode(responder.handle(PROBE, ("10.0.200.1", 40000)))["ip"] == "10.0.0.5"
+    assert decode(responder.handle(PROBE, ("100.64.0.9", 40000)))["ip"] == "100.101.102.103"
+    assert responder.stats()["answered"] == 3
+
+
+def test_ignores_senders_outside_the_local_subnets(responder):
+    assert responder.handle(PROBE, ("192.168.2.77", 40000)) is None
+    assert responder.handle(PROBE, ("8.8.8.8", 40000)) is None
+    assert responder.handle(PROBE, ("not-an-ip", 40000)) is None
+    # Datagrama que não é sonda
+    assert responder.handle(b"HELLO", ("192.168.1.77", 40000)) is None
+    stats = responder.stats()
+    assert stats["probes"] == 4
+    assert stats["ignored"] == 4
+    assert stats["answered"] == 0
+
+
+def test_tls_changes_the_url_scheme(monkeypatch):
+    monkeypatch.setattr(discovery, "list_interfaces", lambda default_ip=None: INTERFACES[:1])
+    responder = DiscoveryResponder(lambda: {"tls": True}, 5443, port=0, host="127.0.0.1")
+    try:
+        assert decode(responder.response_for("192.168.1.2"))["url"] == "https://192.168.1.20:5443"
+    finally:
+        responder.shutdown()
+
+
+def test_probe_over_udp(monkeypatch):
+    monkeypatch.setattr(discovery, "list_interfaces",
+                        lambda default_ip=None: [Interface("lo", "127.0.0.1", "255.0.0.0")])
+    responder = DiscoveryResponder(lambda: {"name": "pc"}, 5000, port=0, host="127.0.0.1")
+    thread = threading.Thread(target=responder.serve_forever, daemon=True)
+    thread.start()
+    client = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    client.settimeout(2.0)
+    try:
+        client.sendto(PROBE, ("127.0.0.1", responder.port))
+        data, _ = client.recvfrom(4096)
+        assert decode(data)["ip"] == "127.0.0.1"
+    finally:
+        client.close()
+        responder.shutdown()
+        thread.join(2.0)
+
+
+def test_list_interfaces_filters_and_ranks(monkeypatch):
+    monkeypatch.setattr(discovery, "_psutil_interfaces", lambda: [
+        Interface("vEthernet (WSL)", "172.20.0.1", "255.255.240.0"),
+        Interface("lo", "127.0.0.1", "255.0.0.0"),
+        Interface("Ethernet 2", "169.254.10.1", "255.255.0.0"),
+        Interface("tailscale0", "100.101.102.103", "255.192.0.0"),
+        Interface("Wi-Fi", "192.168.1.20"),
+        Interface("Wi-Fi", "192.168.1.20"),
+        Interface("Ethernet", "10.0.0.5", "255.255.0.0"),
+    ])
+    names = [(interface.name, interface.ip) for interface in list_interfaces(default_ip="10.0.0.5")]
+    # Sem loopback, link-local e duplicados; virtuais no fim e CGNAT depois da faixa privada
+    assert names == [
+        ("Ethernet", "10.0.0.5"),
+        ("Wi-Fi", "192.168.1.20"),
+        ("vEthernet (WSL)", "172.20.0.1"),
+        ("tailscale0", "100.101.102.103"),
+    ]
@@ -0,0 +1,76 @@
+import time
+import threading
+from fair_gate import FairGate, ADMITTED, PRIORITY_TRANSPORT, PRIORITY_VOLUME
+
+
+def wait_for(condition, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.001)
+
+
+def test_eviction_keeps_the_new_client_when_others_are_busy():
+    gate = FairGate(capacity=2, per_client=1, max_clients=2, timeout=0.05)
+    assert gate.acquire("a") == ADMITTED
+    assert gate.acquire("b") == ADMITTED
+    # Todos ocupados: o cliente novo não pode ser o despejado
+    result = []
+    thread = threading.Thread(target=lambda: result.append(gate.acquire("c")))
+    thread.start()
+    gate.release("a")
+    thread.join()
+    assert result == [ADMITTED]
+    assert "c" in gate.stats()["clients"]
+    gate.release("c")
+    gate.release("b")
+
+
+def test_eviction_forgets_the_least_recent_idle_client():
+    gate = FairGate(max_clients=2)
+    for name in ("a", "b", "c"):
+        assert gate.acquire(name) == ADMITTED
+        gate.release(name)
+    assert list(gate.stats()["clients"]) == ["b", "c"]
+
+
+def test_more_waiting_clients_than_max_clients():
+    gate = FairGate(capacity=1, per_client=1, max_clients=2, timeout=2.0)
+    assert gate.acquire("busy") == ADMITTED
+    results = []
+
+    def run(name):
+        status = gate.acquire(name)
+        results.append(status)
+        if status == ADMITTED:
+            gate.release(name)
+
+    threads = [threading.Thread(target=run, args=(f"c{n}",)) for n in range(5)]
+    for thread in threads:
+        thread.start()
+    wait_for(lambda: gate.stats()["waiting"] + len(results) >= len(threads))
+    gate.release("busy")
+    for thread in threads:
+        thread.join()
+    assert results == [ADMITTED] * len(threads)
+
+
+def test_transport_goes_before_volume():
+    gate = FairGate(capacity=1, per_client=1, timeout=1.0)
+    assert gate.acquire("a") == ADMITTED
+    order = []
+
+    def run(name, priority):
+        if gate.acquire(name, priority) == ADMITTED:
+            order.append(name)
+            gate.release(name)
+
+    volume = threading.Thread(target=run, args=("volume", PRIORITY_VOLUME))
+    volume.start()
+    wait_for(lambda: gate.stats()["waiting"] == 1)
+    transport = threading.Thread(target=run, args=("transport", PRIORITY_TRANSPORT))
+    transport.start()
+    wait_for(lambda: gate.stats()["waiting"] == 2)
+    gate.release("a")
+    volume.join()
+    transport.join()
+    assert order == ["transport", "volume"]
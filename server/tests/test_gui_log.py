@@ -0,0 +1,125 @@
+from collections import deque
+from types import SimpleNamespace
+import pytest
+import server_gui
+from server_gui import (
+    AudioRemoteServer, LOG_QUEUE_LIMIT, LOG_MAX_LINES, LOG_BATCH_MIN, LOG_BATCH_MAX,
+    LOG_DRAIN_IDLE_MS, LOG_DRAIN_BUSY_MS,
+)
+
+
+class FakeText:
+    """Imita o tk.Text só no que o drain_logs usa (índices "linha.coluna")"""
+
+    def __init__(self):
+        self.content = ""
+        self.state = None
+
+    def config(self, state):
+        self.state = state
+
+    def insert(self, index, text):
+        assert self.state == "normal"
+        self.content += text
+
+    def index(self, index):
+        assert index == "end-1c"
+        lines = self.content.split("\n")
+        return f"{len(lines)}.{len(lines[-1])}"
+
+    def delete(self, start, end):
+        assert start == "1.0"
+        line = int(end.split(".")[0])
+        self.content = "\n".join(self.content.split("\n")[line - 1:])
+
+    def see(self, index):
+        pass
+
+    def lines(self):
+        return self.content.splitlines()
+
+
+class FakeLabel:
+    def __init__(self):
+        self.text = ""
+
+    def config(self, text):
+        self.text = text
+
+
+class FakeRoot:
+    def __init__(self):
+        self.scheduled = []
+
+    def after(self, delay, callback):
+        self.scheduled.append(delay)
+
+
+class GuiLog:
+    """Só a parte de log do AudioRemoteServer, sem criar a janela"""
+    log = AudioRemoteServer.log
+    drain_logs = AudioRemoteServer.drain_logs
+
+    def __init__(self):
+        self.log_queue = deque()
+        self.log_dropped = 0
+        self.log_batch = LOG_BATCH_MIN
+        self.log_text = FakeText()
+        self.log_dropped_label = FakeLabel()
+        self.root = FakeRoot()
+
+
+@pytest.fixture
+def gui(monkeypatch):
+    # Sem janela: o drain_logs só precisa das constantes do módulo tk
+    monkeypatch.setattr(server_gui, "tk", SimpleNamespace(NORMAL="normal", DISABLED="disabled", END="end"),
+                        raising=False)
+    return GuiLog()
+
+
+def test_queue_drops_beyond_the_limit(gui):
+    for index in range(LOG_QUEUE_LIMIT + 3):
+        gui.log(f"linha {index}")
+    assert len(gui.log_queue) == LOG_QUEUE_LIMIT
+    assert gui.log_dropped == 3
+
+    gui.drain_logs()
+    assert gui.log_dropped_label.text == "dropped 3 lines"
+    assert gui.log_text.state == "disabled"
+
+
+def test_drain_batches_grow_under_load_and_reset_when_idle(gui):
+    for index in range(LOG_BATCH_MIN * 4):
+        gui.log(f"linha {index}")
+
+    gui.drain_logs()
+    assert len(gui.log_text.lines()) == LOG_BATCH_MIN
+    assert gui.log_batch == LOG_BATCH_MIN * 2
+    assert gui.root.scheduled[-1] == LOG_DRAIN_BUSY_MS
+
+    gui.drain_logs()
+    assert len(gui.log_text.lines()) == LOG_BATCH_MIN * 3
+    gui.drain_logs()
+    assert not gui.log_queue
+    assert gui.log_batch == LOG_BATCH_MIN
+    assert gui.root.scheduled[-1] == LOG_DRAIN_IDLE_MS
+    assert gui.log_text.lines()[-1] == f"linha {LOG_BATCH_MIN * 4 - 1}"
+
+
+def test_batch_is_capped(gui):
+    gui.log_batch = LOG_BATCH_MAX
+    for index in range(LOG_BATCH_MAX * 2 + 1):
+        gui.log(f"linha {index}")
+    gui.drain_logs()
+    assert gui.log_batch == LOG_BATCH_MAX
+
+
+def test_widget_keeps_only_the_last_lines(gui):
+    for index in range(LOG_MAX_LINES + 120):
+        gui.log(f"linha {index}")
+    while gui.log_queue:
+        gui.drain_logs()
+    lines = gui.log_text.lines()
+    assert len(lines) == LOG_MAX_LINES
+    assert lines[0] == "linha 120"
+    assert lines[-1] == f"linha {LOG_MAX_LINES + 119}"
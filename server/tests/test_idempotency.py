@@ -0,0 +1,71 @@
+import pytest
+from flask import Flask, g, request
+from credentials import Device, SERVER_TOKEN_DEVICE
+from idempotency import IdempotencyCache, REPLAYED_HEADER
+
+DEVICES = {
+    "phone": Device("a1", "phone", "0" * 64, ("volume",)),
+    "tablet": Device("b2", "tablet", "1" * 64, ("volume",)),
+    "server": SERVER_TOKEN_DEVICE,
+}
+
+
+@pytest.fixture
+def client():
+    app = Flask(__name__)
+    cache = IdempotencyCache()
+    app.calls = 0
+
+    @app.before_request
+    def authenticate():
+        g.device = DEVICES[request.headers["X-Device"]]
+
+    @app.route("/volume", methods=["POST"])
+    @cache.route
+    def volume():
+        app.calls += 1
+        if request.get_json().get("fail"):
+            return "erro", 500
+        return f"chamada {app.calls}", 200
+
+    client = app.test_client()
+    client.cache = cache
+    return client
+
+
+def post(client, body, key="k1", device="phone", addr="10.0.0.1"):
+    return client.post("/volume", json=body, headers={"Idempotency-Key": key, "X-Device": device},
+                       environ_base={"REMOTE_ADDR": addr})
+
+
+def test_replay_returns_original_response(client):
+    first = post(client, {"level": 30})
+    second = post(client, {"level": 30})
+    assert first.get_data() == second.get_data() == b"chamada 1"
+    assert REPLAYED_HEADER not in first.headers
+    assert second.headers[REPLAYED_HEADER] == "true"
+    assert client.application.calls == 1
+    assert client.cache.stats()["hits"] == 1
+    assert client.cache.stats()["stored"] == 1
+
+
+def test_same_key_with_other_body_conflicts(client):
+    post(client, {"level": 30})
+    response = post(client, {"level": 80})
+    assert response.status_code == 422
+    assert client.cache.stats()["conflicts"] == 1
+
+
+def test_keys_are_scoped_by_identity(client):
+    assert post(client, {"level": 30}, device="phone").get_data() == b"chamada 1"
+    assert post(client, {"level": 30}, device="tablet").get_data() == b"chamada 2"
+    # O token do servidor é compartilhado: separa pelo IP
+    assert post(client, {"level": 30}, device="server", addr="10.0.0.2").get_data() == b"chamada 3"
+    assert post(client, {"level": 30}, device="server", addr="10.0.0.3").get_data() == b"chamada 4"
+    assert post(client, {"level": 30}, device="server", addr="10.0.0.3").get_data() == b"chamada 4"
+
+
+def test_server_errors_are_not_stored(client):
+    assert post(client, {"fail": True}).status_code == 500
+    assert post(client, {"fail": True}).status_code == 500
+    assert client.application.calls == 2
@@ -0,0 +1,101 @@
+import time
+import threading
+import pytest
+from keyboard_backend import FakeKeyboardBackend
+from input_dispatcher import InputDispatcher
+
+
+class GatedKeyboard(FakeKeyboardBackend):
+    """Segura a primeira tecla até ``release``: o resto fica na fila"""
+
+    def __init__(self):
+        super().__init__()
+        self.release = threading.Event()
+        self.started = threading.Event()
+        self.taps = []
+
+    def tap(self, action):
+        self.started.set()
+        self.release.wait(2)
+        self.taps.append(action)
+        super().tap(action)
+
+
+@pytest.fixture
+def make_dispatcher():
+    dispatchers = []
+
+    def make(keyboard, **options):
+        dispatcher = InputDispatcher(keyboard, **options)
+        dispatchers.append(dispatcher)
+        return dispatcher
+
+    yield make
+    for dispatcher in dispatchers:
+        dispatcher.keyboard.release.set()
+        dispatcher.close()
+
+
+def wait_idle(dispatcher, timeout=2):
+    deadline = time.monotonic() + timeout
+    while dispatcher.stats()["queued"] and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+
+def test_repeated_skips_are_merged(make_dispatcher):
+    keyboard = GatedKeyboard()
+    dispatcher = make_dispatcher(keyboard, playpause_window=0)
+    assert dispatcher.submit("prev")
+    keyboard.started.wait(1)
+    for _ in range(3):
+        assert dispatcher.submit("next")
+    assert dispatcher.stats()["queued"] == 1
+    keyboard.release.set()
+    dispatcher.close()
+    assert keyboard.taps == ["prev", "next", "next", "next"]
+    assert dispatcher.stats()["merged"] == 2
+
+
+def test_double_playpause_within_window_is_cancelled(make_dispatcher):
+    keyboard = GatedKeyboard()
+    keyboard.release.set()
+    dispatcher = make_dispatcher(keyboard, playpause_window=0.2)
+    dispatcher.submit("playpause")
+    time.sleep(0.05)
+    # Segundo toque dentro da janela: nenhum dos dois chega ao player
+    dispatcher.submit("playpause")
+    time.sleep(0.3)
+    assert keyboard.taps == []
+    assert dispatcher.stats()["cancelled"] == 2
+
+    start = time.monotonic()
+    dispatcher.submit("playpause")
+    wait_idle(dispatcher)
+    while not keyboard.taps and time.monotonic() - start < 2:
+        time.sleep(0.01)
+    assert keyboard.taps == ["playpause"]
+    assert time.monotonic() - start >= 0.2
+
+
+def test_default_window_is_not_zero():
+    dispatcher = InputDispatcher(FakeKeyboardBackend())
+    try:
+        assert dispatcher.playpause_window > 0
+    finally:
+        dispatcher.close()
+
+
+def test_queue_is_bounded(make_dispatcher):
+    keyboard = GatedKeyboard()
+    dispatcher = make_dispatcher(keyboard, queue_size=2, playpause_window=0)
+    assert dispatcher.submit("next")
+    keyboard.started.wait(1)
+    # Ações alternadas não se juntam
+    assert dispatcher.submit("prev")
+    assert dispatcher.submit("next")
+    assert not dispatcher.submit("prev")
+    stats = dispatcher.stats()
+    assert stats["rejected"] == 1 and stats["queued"] == 2
+    keyboard.release.set()
+    dispatcher.close()
+    assert keyboard.taps == ["next", "prev", "next"]
@@ -0,0 +1,115 @@
+import sys
+import json
+import logging
+import log_pipeline
+from log_pipeline import (
+    SamplingFilter, JsonLinesFormatter, SkippedCountFormatter, parse_sample_rates,
+)
+
+
+def make_record(message="ajuste", event=None, **extra):
+    record = logging.LogRecord("server", logging.INFO, __file__, 1, message, None, None)
+    if event is not None:
+        record.event = event
+    for name, value in extra.items():
+        setattr(record, name, value)
+    return record
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_sampling_passes_events_without_a_rate():
+    sampler = SamplingFilter({"volume": 2})
+    assert all(sampler.filter(make_record()) for _ in range(10))
+    assert all(sampler.filter(make_record(event="ws")) for _ in range(10))
+
+
+def test_sampling_limits_each_second_and_reports_skipped(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(log_pipeline.time, "monotonic", clock)
+    sampler = SamplingFilter({"volume": 2})
+
+    passed = [sampler.filter(make_record(event="volume")) for _ in range(5)]
+    assert passed == [True, True, False, False, False]
+
+    # Nova janela: o primeiro registro carrega a contagem omitida
+    clock.now += 1.0
+    record = make_record(event="volume")
+    assert sampler.filter(record)
+    assert record.skipped == 3
+    follow_up = make_record(event="volume")
+    assert sampler.filter(follow_up)
+    assert not hasattr(follow_up, "skipped")
+
+
+def test_sampling_ignores_zero_rates():
+    sampler = SamplingFilter({"volume": 0})
+    assert all(sampler.filter(make_record(event="volume")) for _ in range(10))
+
+
+def test_parse_sample_rates_keeps_defaults():
+    assert parse_sample_rates(None) == {"volume": 2}
+    assert parse_sample_rates("volume=0, ws=5") == {"volume": 0.0, "ws": 5.0}
+
+
+def test_json_lines_formatter_fields():
+    record = make_record("volume %d%%", event="volume", skipped=4, client="10.0.0.1")
+    record.args = (50,)
+    entry = json.loads(JsonLinesFormatter().format(record))
+    assert entry["msg"] == "volume 50%"
+    assert entry["level"] == "INFO"
+    assert entry["logger"] == "server"
+    assert entry["event"] == "volume"
+    assert entry["skipped"] == 4
+    assert entry["client"] == "10.0.0.1"
+    assert "exc" not in entry
+
+
+def test_json_lines_formatter_exception_and_unicode():
+    try:
+        raise RuntimeError("falhou")
+    except RuntimeError:
+        record = logging.LogRecord("server", logging.ERROR, __file__, 1, "sessão", None, True)
+        record.exc_info = sys.exc_info()
+    line = JsonLinesFormatter().format(record)
+    assert "\n" not in line
+    entry = json.loads(line)
+    assert entry["msg"] == "sessão"
+    assert "RuntimeError: falhou" in entry["exc"]
+    assert "event" not in entry
+
+
+def test_skipped_count_formatter():
+    formatter = SkippedCountFormatter("%(message)s")
+    assert formatter.format(make_record("volume")) == "volume"
+    assert formatter.format(make_record("volume", skipped=7)) == "volume (+7 omitidos)"
+
+
+def test_json_handler_writes_one_object_per_line(tmp_path):
+    path = tmp_path / "server.jsonl"
+    handler = logging.FileHandler(path, encoding="utf-8")
+    handler.setFormatter(JsonLinesFormatter())
+    sampler = SamplingFilter({"volume": 1})
+    handler.addFilter(sampler)
+
+    log = logging.getLogger("test_log_pipeline")
+    log.propagate = False
+    log.setLevel(logging.INFO)
+    log.addHandler(handler)
+    try:
+        for level in range(3):
+            log.info("volume %d", level, extra={"event": "volume"})
+        log.info("conectado", extra={"client": "10.0.0.2"})
+    finally:
+        log.removeHandler(handler)
+        handler.close()
+
+    entries = [json.loads(line) for line in path.read_text(encoding="utf-8").splitlines()]
+    assert [entry["msg"] for entry in entries] == ["volume 0", "conectado"]
+    assert entries[1]["client"] == "10.0.0.2"
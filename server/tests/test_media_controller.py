@@ -0,0 +1,54 @@
+import json
+import pytest
+from media_controller import ControlError, MediaController, describe_state
+from volume_scheduler import VolumeChange
+from ws_channel import handle_message
+
+
+@pytest.fixture
+def controller():
+    return MediaController(input_dispatcher=None, volume_scheduler=None)
+
+
+@pytest.mark.parametrize("data", [{"delta": 0}, {"delta": 0.0}])
+def test_zero_delta_is_rejected(controller, data):
+    with pytest.raises(ControlError) as error:
+        controller.parse_volume_change(data)
+    assert error.value.status == 400
+
+
+def test_zero_step_is_rejected():
+    controller = MediaController(input_dispatcher=None, volume_scheduler=None, volume_step=0)
+    with pytest.raises(ControlError) as error:
+        controller.parse_volume_change({"step": "up"})
+    assert error.value.status == 400
+
+
+def test_zero_delta_with_mute_is_accepted(controller):
+    change = controller.parse_volume_change({"delta": 0, "mute": True})
+    assert change.mute is True
+    assert not change.sets_volume
+
+
+def test_describe_state():
+    state = {"volume": 42.0, "muted": False}
+    assert describe_state(VolumeChange(delta=5), state, True) == "Volume ajustado para 42%"
+    assert describe_state(VolumeChange(delta=5, mute=False), state, True) == "Volume ajustado para 42%, áudio ativado"
+    assert describe_state(VolumeChange(mute="toggle"), dict(state, muted=True), True) == "Áudio mudo"
+    # Sem alteração de volume nem de mudo, a mensagem continua válida
+    assert describe_state(VolumeChange(delta=0), state, False) == "Volume mantido em 42%"
+
+
+class FailingController:
+    def execute(self, message, client=None):
+        raise RuntimeError("falha inesperada")
+
+
+def test_handle_message_reports_unexpected_errors():
+    ack = handle_message(FailingController(), json.dumps({"id": 7, "op": "ping"}))
+    assert ack == {"id": 7, "ok": False, "status": 500, "error": "Erro interno"}
+
+
+def test_handle_message_zero_delta(controller):
+    ack = handle_message(controller, json.dumps({"id": 1, "op": "vol", "delta": 0}))
+    assert ack["status"] == 400
@@ -0,0 +1,108 @@
+from flask import Flask
+from metrics import Histogram, MetricsRegistry, DEFAULT_BUCKETS, stats_collector, instrument_app
+
+
+def sample_lines(text, name):
+    return [line for line in text.splitlines() if line.startswith(name)]
+
+
+def test_histogram_places_values_in_buckets():
+    histogram = Histogram(buckets=(0.01, 0.1, 1.0))
+    for value in (0.005, 0.01, 0.05, 0.5, 3.0):
+        histogram.observe(value)
+    # O limite é inclusivo (le): 0.01 cai no primeiro bucket
+    assert histogram.counts == [2, 1, 1, 1]
+    assert histogram.count == 5
+    assert histogram.sum == 0.005 + 0.01 + 0.05 + 0.5 + 3.0
+
+
+def test_histogram_quantile():
+    histogram = Histogram(buckets=(0.01, 0.1, 1.0))
+    assert histogram.quantile(0.5) is None
+    for _ in range(10):
+        histogram.observe(0.05)
+    # Interpolação linear dentro do bucket (0.01, 0.1]
+    assert abs(histogram.quantile(0.5) - 0.055) < 1e-9
+    histogram.observe(5.0)
+    # Acima do último limite: fica no último limite conhecido
+    assert histogram.quantile(1.0) == 1.0
+
+
+def test_prometheus_histogram_is_cumulative():
+    metrics = MetricsRegistry()
+    metrics.observe_request("/volume", "POST", 200, 0.0001)
+    metrics.observe_request("/volume", "POST", 200, 0.003)
+    metrics.observe_request("/volume", "POST", 500, 10.0)
+    text = metrics.render_prometheus()
+
+    buckets = sample_lines(text, "audioremote_request_duration_seconds_bucket")
+    assert len(buckets) == len(DEFAULT_BUCKETS) + 1
+    counts = [int(line.rsplit(" ", 1)[1]) for line in buckets]
+    assert counts == sorted(counts)
+    assert buckets[0] == 'audioremote_request_duration_seconds_bucket{route="/volume",method="POST",le="0.0005"} 1'
+    assert buckets[-1] == 'audioremote_request_duration_seconds_bucket{route="/volume",method="POST",le="+Inf"} 3'
+    assert 'audioremote_request_duration_seconds_count{route="/volume",method="POST"} 3' in text
+    assert 'audioremote_requests_total{route="/volume",method="POST",status="500"} 1' in text
+    assert 'audioremote_request_errors_total{route="/volume",method="POST"} 1' in text
+    assert "# TYPE audioremote_request_duration_seconds histogram" in text
+    assert text.endswith("\n")
+
+
+def test_prometheus_escapes_label_values():
+    metrics = MetricsRegistry()
+    metrics.observe_stage('ses"são\\1\nfim', 0.001, error=True)
+    text = metrics.render_prometheus()
+    assert 'audioremote_stage_errors_total{stage="ses\\"são\\\\1\\nfim"} 1' in text
+    # Nenhuma amostra quebra em duas linhas
+    assert all(line.startswith(("#", "audioremote_")) for line in text.splitlines())
+
+
+def test_time_stage_counts_errors():
+    metrics = MetricsRegistry()
+    try:
+        with metrics.time_stage("audio_endpoint"):
+            raise RuntimeError("falhou")
+    except RuntimeError:
+        pass
+    with metrics.time_stage("audio_endpoint"):
+        pass
+    summary = metrics.summary()["stages"]["audio_endpoint"]
+    assert summary["count"] == 2
+    assert summary["errors"] == 1
+
+
+def test_collectors_export_numeric_stats_only():
+    metrics = MetricsRegistry()
+    metrics.add_collector(stats_collector("audioremote_scheduler", lambda: {
+        "pending": 3, "latency": 0.25, "closed": True, "mode": "fast",
+    }))
+    text = metrics.render_prometheus()
+    assert "audioremote_scheduler_pending 3" in text
+    assert "audioremote_scheduler_latency 0.25" in text
+    assert "audioremote_scheduler_closed" not in text
+    assert "audioremote_scheduler_mode" not in text
+
+
+def test_instrument_app_uses_the_route_rule():
+    app = Flask(__name__)
+    metrics = MetricsRegistry()
+    instrument_app(app, metrics)
+
+    @app.route("/sessions/<int:pid>")
+    def session(pid):
+        return {"pid": pid}
+
+    @app.route("/ws")
+    def ws():
+        return ""
+
+    client = app.test_client()
+    client.get("/sessions/1")
+    client.get("/sessions/2")
+    client.get("/missing")
+    client.get("/ws")
+
+    routes = metrics.summary()["routes"]
+    assert routes["GET /sessions/<int:pid>"]["count"] == 2
+    assert routes["GET <unmatched>"]["errors"] == 1
+    assert "GET /ws" not in routes
@@ -0,0 +1,110 @@
+import time
+import queue
+import threading
+import pytest
+from os_worker import ShmRing, OSWorker, OSWorkerError, RemoteAudioBackend
+
+
+@pytest.fixture
+def ring():
+    ring = ShmRing(threading.Semaphore(0), size=64)
+    yield ring
+    ring.close()
+
+
+def test_ring_wraps_records_around_the_end(ring):
+    # Registros de 4 + 20 bytes: o terceiro cruza o fim do anel de 64 bytes
+    for round_ in range(10):
+        messages = [bytes([round_, index]) * 10 for index in range(2)]
+        for message in messages:
+            ring.put(message)
+        assert [ring.get(timeout=1) for _ in messages] == messages
+    written, read = ShmRing.HEADER.unpack_from(ring.shm.buf, 0)
+    assert written == read == 10 * 2 * 24
+    assert ring.get(timeout=0.01) is None
+
+
+def test_ring_splits_the_length_prefix(ring):
+    # Avança até faltarem 2 bytes para o fim: o próprio tamanho fica dividido
+    ring.put(b"x" * 58)
+    assert ring.get(timeout=1) == b"x" * 58
+    ring.put(b"wrapped")
+    assert ring.get(timeout=1) == b"wrapped"
+
+
+def test_ring_full_and_oversized(ring):
+    ring.put(b"a" * 28)
+    ring.put(b"b" * 28)
+    with pytest.raises(queue.Full):
+        ring.put(b"c", timeout=0.01)
+    assert ring.get(timeout=1) == b"a" * 28
+    # Liberou espaço: cabe de novo, atravessando o fim do anel
+    ring.put(b"c" * 28)
+    assert ring.get(timeout=1) == b"b" * 28
+    assert ring.get(timeout=1) == b"c" * 28
+    with pytest.raises(ValueError):
+        ring.put(b"d" * 61)
+
+
+def test_ring_concurrent_producer_and_consumer(ring):
+    messages = [f"mensagem {index}".encode() for index in range(500)]
+
+    def produce():
+        for message in messages:
+            ring.put(message)
+
+    producer = threading.Thread(target=produce)
+    producer.start()
+    received = [ring.get(timeout=2) for _ in messages]
+    producer.join()
+    assert received == messages
+
+
+def wait_for(condition, timeout=10.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() >= deadline:
+            return False
+        time.sleep(0.02)
+    return True
+
+
+@pytest.mark.parametrize("transport", ["shm", "pipe"])
+def test_worker_restarts_after_a_crash(transport):
+    worker = OSWorker(audio="fake", keyboard="fake", transport=transport)
+    audio = RemoteAudioBackend(worker)
+    resets = []
+    worker.add_listener("session", lambda event, session: resets.append(event))
+    try:
+        audio.set_volume(0.3)
+        assert audio.get_volume() == pytest.approx(0.3)
+        first_pid = worker.stats()["pid"]
+
+        worker._generation.process.kill()
+        assert wait_for(lambda: worker.stats()["restarts"] == 1 and worker.stats()["alive"])
+        assert resets == ["reset"]
+        assert worker.stats()["pid"] != first_pid
+        assert worker.stats()["transport"] == transport
+
+        # Processo novo, estado novo do backend falso
+        audio.set_volume(0.7)
+        assert audio.get_volume() == pytest.approx(0.7)
+    finally:
+        worker.close()
+    assert not worker.stats()["alive"]
+    with pytest.raises(OSWorkerError):
+        worker.submit("audio", "get_volume")
+
+
+def test_pending_calls_fail_when_the_worker_dies():
+    worker = OSWorker(audio="fake", keyboard="fake", audio_options={"busy": 2.0}, timeout=10.0)
+    try:
+        worker.start()
+        future = worker.submit("audio", "set_volume", 0.5)
+        time.sleep(0.2)
+        worker._generation.process.kill()
+        with pytest.raises(OSWorkerError):
+            future.result(5)
+        assert worker.stats()["failed"] == 1
+    finally:
+        worker.close()
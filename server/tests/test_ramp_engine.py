@@ -0,0 +1,61 @@
+import time
+import threading
+from ramp_engine import RampEngine
+
+
+class FakeScheduler:
+    def __init__(self):
+        self.levels = []
+
+    def submit(self, change, timeout=None):
+        self.levels.append(change.level)
+
+
+class FakeStateCache:
+    def __init__(self, state=None):
+        self.state = state
+        self.reads = []
+
+    def peek(self):
+        return None if self.state is None else dict(self.state, version=1)
+
+    def get(self):
+        # Simula o COM: registra em qual thread a leitura aconteceu
+        self.reads.append(threading.current_thread().name)
+        time.sleep(0.05)
+        self.state = {"volume": 20.0, "muted": False}
+        return dict(self.state, version=1)
+
+
+def wait_done(engine, timeout=2):
+    deadline = time.monotonic() + timeout
+    while engine.current() is not None and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert engine.current() is None
+
+
+def test_ramp_uses_cached_level_without_reading_backend():
+    scheduler, cache = FakeScheduler(), FakeStateCache({"volume": 10.0, "muted": False})
+    engine = RampEngine(scheduler, cache, tick=0.01)
+    try:
+        ramp = engine.start(level=30, duration=0.05)
+        wait_done(engine)
+    finally:
+        engine.close()
+    assert ramp.status == "completed"
+    assert ramp.start_level == 10.0
+    assert scheduler.levels[-1] == 30
+    assert cache.reads == []
+
+
+def test_cold_cache_is_read_outside_the_timer_thread():
+    scheduler, cache = FakeScheduler(), FakeStateCache()
+    engine = RampEngine(scheduler, cache, tick=0.01)
+    try:
+        ramp = engine.start(level=40, duration=0.05)
+        wait_done(engine)
+    finally:
+        engine.close()
+    assert ramp.status == "completed"
+    assert ramp.start_level == 20.0
+    assert cache.reads == ["ramp-start"]
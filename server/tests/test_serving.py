@@ -0,0 +1,298 @@
+import time
+import socket
+import threading
+import http.client
+import pytest
+from flask import Flask, Response, request
+from flask_sock import Sock
+from simple_websocket import Client
+from serving import PooledWSGIServer
+
+
+@pytest.fixture
+def app():
+    app = Flask(__name__)
+    sock = Sock(app)
+    release = threading.Event()
+
+    @app.route("/ping")
+    def ping():
+        return "pong"
+
+    @app.route("/echo", methods=["POST"])
+    def echo():
+        return request.get_data()
+
+    @app.route("/ignore", methods=["POST"])
+    def ignore():
+        return "ok"
+
+    @app.route("/events")
+    def events():
+        def stream():
+            yield "data: 1\n\n"
+            release.wait(5)
+        return Response(stream(), mimetype="text/event-stream")
+
+    @sock.route("/ws")
+    def ws(socket):
+        while True:
+            socket.send(socket.receive())
+
+    app.release = release
+    yield app
+    release.set()
+
+
+@pytest.fixture
+def serve(app):
+    servers = []
+
+    def serve(**options):
+        options = dict({"workers": 2, "queue_size": 8, "keepalive": 5.0}, **options)
+        server = PooledWSGIServer("127.0.0.1", 0, app, **options)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+        return server
+
+    yield serve
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+def get(port, path="/ping", timeout=2):
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=timeout)
+    conn.request("GET", path)
+    response = conn.getresponse()
+    return conn, response
+
+
+def test_keepalive_reuses_connection(serve):
+    server = serve()
+    conn = http.client.HTTPConnection("127.0.0.1", server.port, timeout=2)
+    for _ in range(3):
+        conn.request("GET", "/ping")
+        response = conn.getresponse()
+        assert response.read() == b"pong"
+        assert response.getheader("Connection") != "close"
+    local = conn.sock.getsockname()
+    conn.request("POST", "/echo", body=b"abc")
+    assert conn.getresponse().read() == b"abc"
+    assert conn.sock.getsockname() == local
+
+
+def test_idle_connections_do_not_hold_workers(serve):
+    server = serve()
+    idle = []
+    for _ in range(server.workers * 4):
+        conn, response = get(server.port)
+        response.read()
+        idle.append(conn)
+
+    start = time.perf_counter()
+    conn, response = get(server.port)
+    assert response.read() == b"pong"
+    assert time.perf_counter() - start < 1.0
+    # A última conexão volta ao seletor logo depois da resposta
+    deadline = time.monotonic() + 1
+    while server.stats()["idle_connections"] < len(idle) and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert server.stats()["idle_connections"] >= len(idle)
+
+
+def test_streams_do_not_starve_http(app, serve):
+    server = serve(max_streams=3)
+    sockets = [Client.connect(f"ws://127.0.0.1:{server.port}/ws") for _ in range(2)]
+    conn, events = get(server.port, "/events")
+    assert events.getheader("Content-Type").startswith("text/event-stream")
+    assert events.readline() == b"data: 1\n"
+
+    for ws in sockets:
+        ws.send("oi")
+        assert ws.receive(timeout=2) == "oi"
+    for _ in range(server.workers * 2):
+        _, response = get(server.port)
+        assert response.read() == b"pong"
+
+    # Acima do limite de streams a resposta é 503
+    _, rejected = get(server.port, "/events")
+    assert rejected.status == 503
+    assert server.stats()["streams"] == 3
+    for ws in sockets:
+        ws.close()
+
+
+def test_unread_body_is_drained(serve):
+    server = serve()
+    conn = http.client.HTTPConnection("127.0.0.1", server.port, timeout=2)
+    conn.request("POST", "/ignore", body=b"x" * 1000)
+    response = conn.getresponse()
+    assert response.read() == b"ok"
+    assert response.getheader("Connection") != "close"
+    conn.request("GET", "/ping")
+    assert conn.getresponse().read() == b"pong"
+
+    conn.request("POST", "/ignore", body=b"x" * (1024 * 1024))
+    response = conn.getresponse()
+    assert response.read() == b"ok"
+    assert response.getheader("Connection") == "close"
+
+
+def test_chunked_body_and_pipelining(serve):
+    server = serve()
+    with socket.create_connection(("127.0.0.1", server.port), timeout=2) as sock:
+        sock.sendall(b"POST /echo HTTP/1.1\r\nHost: x\r\nTransfer-Encoding: chunked\r\n\r\n"
+                     b"3\r\nabc\r\n2\r\nde\r\n0\r\n\r\n"
+                     b"GET /ping HTTP/1.1\r\nHost: x\r\n\r\n")
+        data = b""
+        while data.count(b"HTTP/1.1 200") < 2 or not data.endswith(b"pong"):
+            chunk = sock.recv(4096)
+            assert chunk
+            data += chunk
+    assert b"\r\n\r\nabcde" in data
+
+
+def test_malformed_request_gets_400(serve):
+    server = serve()
+    with socket.create_connection(("127.0.0.1", server.port), timeout=2) as sock:
+        sock.sendall(b"GARBAGE\r\n\r\n")
+        assert sock.recv(4096).startswith(b"HTTP/1.1 400 ")
+
+
+def exchange(port, raw, timeout=2):
+    """Envia bytes crus e lê até o servidor fechar a conexão"""
+    with socket.create_connection(("127.0.0.1", port), timeout=timeout) as sock:
+        sock.sendall(raw)
+        data = b""
+        while True:
+            try:
+                chunk = sock.recv(65536)
+            except (ConnectionResetError, socket.timeout):
+                break
+            if not chunk:
+                break
+            data += chunk
+    return data
+
+
+def status_of(data):
+    return int(data.split(b" ", 2)[1])
+
+
+@pytest.mark.parametrize("line, status", [
+    (b"GET /ping\r\n", 400),
+    (b"GET /ping HTTP/1.1 extra\r\n", 400),
+    (b"GET /ping FOO/1.1\r\n", 400),
+    (b"GET /ping HTTP/2.0\r\n", 505),
+    (b"GET ping HTTP/1.1\r\n", 400),
+])
+def test_malformed_request_lines(serve, line, status):
+    server = serve()
+    assert status_of(exchange(server.port, line + b"Host: x\r\n\r\n")) == status
+
+
+def test_request_line_and_header_limits(serve):
+    server = serve()
+    long_target = b"/ping?" + b"a" * (64 * 1024)
+    assert status_of(exchange(server.port, b"GET " + long_target + b" HTTP/1.1\r\n\r\n")) == 414
+    long_header = b"X-Big: " + b"a" * (64 * 1024) + b"\r\n"
+    assert status_of(exchange(server.port, b"GET /ping HTTP/1.1\r\n" + long_header + b"\r\n")) == 431
+    many_headers = b"".join(b"X-H%d: 1\r\n" % i for i in range(101))
+    assert status_of(exchange(server.port, b"GET /ping HTTP/1.1\r\n" + many_headers + b"\r\n")) == 431
+    # O servidor continua atendendo
+    _, response = get(server.port)
+    assert response.read() == b"pong"
+
+
+@pytest.mark.parametrize("body, status", [
+    (b"zz\r\nabc\r\n0\r\n\r\n", 400),
+    (b"+3\r\nabc\r\n0\r\n\r\n", 400),
+    (b"0x3\r\nabc\r\n0\r\n\r\n", 400),
+    (b"3\r\nabcX\r\n0\r\n\r\n", 400),
+    (b"100001\r\n", 413),
+])
+def test_invalid_chunked_bodies(serve, body, status):
+    server = serve()
+    head = b"POST /echo HTTP/1.1\r\nHost: x\r\nTransfer-Encoding: chunked\r\n\r\n"
+    assert status_of(exchange(server.port, head + body)) == status
+
+
+def test_chunk_extensions_and_trailers(serve):
+    server = serve()
+    data = exchange(server.port, b"POST /echo HTTP/1.1\r\nHost: x\r\nTransfer-Encoding: chunked\r\nConnection: close\r\n\r\n"
+                                 b"3;name=value\r\nabc\r\n0\r\nX-Trailer: 1\r\n\r\n")
+    assert status_of(data) == 200 and data.endswith(b"abc")
+
+
+@pytest.mark.parametrize("encoding, status", [(b"gzip", 400), (b"chunked, gzip", 400), (b"gzip, chunked", 501)])
+def test_unsupported_transfer_encodings(serve, encoding, status):
+    server = serve()
+    raw = b"POST /echo HTTP/1.1\r\nHost: x\r\nTransfer-Encoding: " + encoding + b"\r\n\r\n0\r\n\r\n"
+    assert status_of(exchange(server.port, raw)) == status
+
+
+def test_transfer_encoding_wins_over_content_length_and_closes(serve):
+    server = serve()
+    data = exchange(server.port, b"POST /echo HTTP/1.1\r\nHost: x\r\nContent-Length: 100\r\n"
+                                 b"Transfer-Encoding: chunked\r\n\r\n2\r\nok\r\n0\r\n\r\n"
+                                 b"GET /ping HTTP/1.1\r\nHost: x\r\n\r\n")
+    assert status_of(data) == 200
+    assert b"Connection: close" in data
+    # A requisição "contrabandeada" depois do corpo não é atendida
+    assert data.count(b"HTTP/1.1 200") == 1 and data.endswith(b"ok")
+
+
+@pytest.mark.parametrize("length", [b"+2", b"-1", b"2, 3", b"0x2", b"abc"])
+def test_invalid_content_length(serve, length):
+    server = serve()
+    raw = b"POST /echo HTTP/1.1\r\nHost: x\r\nContent-Length: " + length + b"\r\n\r\nok"
+    assert status_of(exchange(server.port, raw)) == 400
+
+
+def test_http10_closes_and_absolute_target(serve):
+    server = serve()
+    data = exchange(server.port, b"GET /ping HTTP/1.0\r\n\r\n")
+    assert status_of(data) == 200 and b"Connection: close" in data and data.endswith(b"pong")
+    data = exchange(server.port, b"GET http://x/ping HTTP/1.1\r\nHost: x\r\nConnection: close\r\n\r\n")
+    assert data.endswith(b"pong")
+
+
+def test_expect_continue(serve):
+    server = serve()
+    with socket.create_connection(("127.0.0.1", server.port), timeout=2) as sock:
+        sock.sendall(b"POST /echo HTTP/1.1\r\nHost: x\r\nContent-Length: 3\r\nExpect: 100-continue\r\n\r\n")
+        assert sock.recv(4096) == b"HTTP/1.1 100 Continue\r\n\r\n"
+        sock.sendall(b"abc")
+        data = b""
+        while not data.endswith(b"abc"):
+            chunk = sock.recv(4096)
+            assert chunk
+            data += chunk
+    assert status_of(data) == 200
+
+
+def test_client_disconnect_mid_body(serve):
+    server = serve()
+    with socket.create_connection(("127.0.0.1", server.port), timeout=2) as sock:
+        sock.sendall(b"POST /echo HTTP/1.1\r\nHost: x\r\nContent-Length: 1000\r\n\r\npartial")
+    with socket.create_connection(("127.0.0.1", server.port), timeout=2) as sock:
+        sock.sendall(b"POST /echo HTTP/1.1\r\nHost: x\r\nTransfer-Encoding: chunked\r\n\r\n5\r\nab")
+    _, response = get(server.port)
+    assert response.read() == b"pong"
+
+
+def test_waitress_shutdown_with_open_connection(app):
+    pytest.importorskip("waitress")
+    from serving import WaitressServer
+    server = WaitressServer("127.0.0.1", 0, app, workers=2, queue_size=8, keepalive=30.0)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    conn, response = get(server.port)
+    assert response.read() == b"pong"
+
+    # A conexão keep-alive ociosa não impede o loop de terminar
+    server.shutdown()
+    thread.join(timeout=5)
+    assert not thread.is_alive()
+    conn.close()
@@ -0,0 +1,67 @@
+import threading
+from audio_backend import AudioBackend, FakeAudioBackend
+from session_index import SessionIndex
+from volume_scheduler import VolumeChange
+
+
+class DelayedNotificationBackend(FakeAudioBackend):
+    """Como no Windows: o aviso de sessão chega depois, em outra thread"""
+
+    def __init__(self):
+        super().__init__()
+        self.pending = []
+
+    def _notify_session(self, event, session):
+        self.pending.append((event, session))
+
+    def deliver(self):
+        pending, self.pending = self.pending, []
+        for event, session in pending:
+            AudioBackend._notify_session(self, event, session)
+
+
+def make_index(volume=50.0, muted=False):
+    backend = DelayedNotificationBackend()
+    backend.add_session(1234, "Spotify.exe", volume=volume, muted=muted)
+    index = SessionIndex(backend)
+    index.snapshot()
+    backend.deliver()
+    return backend, index
+
+
+def test_relative_changes_start_from_the_backend():
+    backend, index = make_index()
+    for _ in range(2):
+        index.apply_change(index.find("spotify"), VolumeChange(delta=5))
+    assert backend.sessions[1234]["volume"] == 60.0
+    # O índice já tem o resultado antes dos avisos chegarem
+    assert index.find("1234")[0]["volume"] == 60.0
+
+    backend.deliver()
+    assert index.find("1234")[0]["volume"] == 60.0
+
+
+def test_double_toggle_restores_mute():
+    backend, index = make_index()
+    results = [index.apply_change(index.find("spotify"), VolumeChange(mute="toggle"))[0] for _ in range(2)]
+    assert [session["muted"] for session, _ in results] == [True, False]
+    assert backend.sessions[1234]["muted"] is False
+
+
+def test_concurrent_steps_are_not_lost():
+    backend, index = make_index(volume=0.0)
+    threads = [threading.Thread(target=index.apply_change, args=(index.find("spotify"), VolumeChange(delta=1)))
+               for _ in range(20)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert backend.sessions[1234]["volume"] == 20.0
+
+
+def test_unchanged_session_is_not_written():
+    backend, index = make_index(volume=100.0)
+    calls = backend.calls
+    [(session, changed)] = index.apply_change(index.find("spotify"), VolumeChange(delta=5))
+    assert not changed and session["volume"] == 100.0
+    assert backend.calls == calls
@@ -0,0 +1,32 @@
+from state_stream import AudioStateCache
+
+
+class FakeBackend:
+    def __init__(self):
+        self.listeners = []
+
+    def subscribe(self, listener):
+        self.listeners.append(listener)
+
+    def get_state(self):
+        return {"volume": 40.0, "muted": False}
+
+
+def test_stream_never_iterated_releases_slot_on_close():
+    cache = AudioStateCache(FakeBackend(), max_streams=1)
+    stream = cache.open_stream()
+    assert cache.streams == 1
+    assert cache.open_stream() is None
+    stream.close()
+    stream.close()
+    assert cache.streams == 0
+    assert cache.open_stream() is not None
+
+
+def test_stream_releases_slot_when_streams_are_closed():
+    cache = AudioStateCache(FakeBackend(), max_streams=2)
+    stream = cache.open_stream(heartbeat=0.01)
+    assert next(stream).startswith("event: state")
+    cache.close_streams()
+    assert list(stream) == []
+    assert cache.streams == 0
@@ -0,0 +1,31 @@
+import os
+import stat
+import pytest
+from core import ServerCore
+from tls import ensure_certificate, fingerprint
+
+
+@pytest.fixture
+def token_file(tmp_path):
+    return str(tmp_path / "server_token.txt")
+
+
+@pytest.mark.skipif(os.name != "posix", reason="permissões POSIX")
+def test_private_key_is_not_readable_by_others(token_file):
+    cert_path, key_path = ensure_certificate(token_file)
+    assert stat.S_IMODE(os.stat(key_path).st_mode) == 0o600
+    assert len(fingerprint(cert_path)) == 95
+
+
+def test_fingerprint_follows_tls_flag(token_file):
+    core = ServerCore(token_file=token_file, tls=False)
+    try:
+        # /info lido antes de a interface decidir o modo
+        assert core.info()["tls_fingerprint"] is None
+        core.tls = True
+        assert core.tls_fingerprint is not None
+        assert core.info()["tls_fingerprint"] == core.tls_fingerprint
+        core.tls = False
+        assert core.tls_fingerprint is None
+    finally:
+        core.close()
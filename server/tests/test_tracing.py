@@ -0,0 +1,132 @@
+import time
+import socket
+import threading
+import pytest
+from flask import Flask
+from serving import PooledWSGIServer
+from tracing import Tracer, Trace, span, trace_app, current_trace, REQUEST_ID_HEADER
+
+
+def timing(header):
+    """{"nome": ms} a partir do header Server-Timing"""
+    entries = {}
+    for item in header.split(", "):
+        name, _, duration = item.partition(";dur=")
+        entries[name] = float(duration)
+    return entries
+
+
+def finished(tracer, path, duration):
+    """Trace que começou há ``duration`` segundos"""
+    trace = tracer.begin("GET", path, "127.0.0.1", start=time.perf_counter() - duration)
+    tracer.finish(trace, 200)
+    return trace
+
+
+def test_ring_buffer_keeps_the_most_recent():
+    tracer = Tracer(capacity=3, slowest=0)
+    for index in range(5):
+        finished(tracer, f"/r{index}", 0.001)
+    traces = tracer.traces()
+    assert [trace["path"] for trace in traces["recent"]] == ["/r4", "/r3", "/r2"]
+    assert traces["slowest"] == []
+    assert tracer.stats()["buffered"] == 3
+    assert tracer.stats()["recorded"] == 5
+
+
+def test_slowest_survive_eviction_from_the_buffer():
+    tracer = Tracer(capacity=2, slowest=2)
+    for index, duration in enumerate([0.5, 0.01, 0.9, 0.02, 0.03, 0.04]):
+        finished(tracer, f"/r{index}", duration)
+    traces = tracer.traces()
+    assert [trace["path"] for trace in traces["recent"]] == ["/r5", "/r4"]
+    assert [trace["path"] for trace in traces["slowest"]] == ["/r2", "/r0"]
+    assert tracer.stats()["slowest_ms"] >= 900
+    assert len(tracer.traces(limit=1)["slowest"]) == 1
+
+
+def test_request_id_is_kept_only_when_valid():
+    tracer = Tracer()
+    assert tracer.begin("GET", "/", "c", request_id="app-1234:5").id == "app-1234:5"
+    generated = tracer.begin("GET", "/", "c", request_id="bad id\r\nX-Evil: 1").id
+    assert generated != "bad id\r\nX-Evil: 1"
+    assert tracer.begin("GET", "/", "c", request_id="x" * 65).id != "x" * 65
+    assert tracer.begin("GET", "/", "c").id != tracer.begin("GET", "/", "c").id
+
+
+def test_server_timing_sums_spans_with_the_same_name():
+    trace = Trace("id", "GET", "/", "c", 1.0)
+    trace.add("backend", 1.0, 1.002)
+    trace.add("backend", 1.003, 1.004)
+    trace.add("auth", 1.0, 1.0005)
+    trace.end = 1.010
+    entries = timing(trace.server_timing())
+    assert list(entries) == ["backend", "auth", "total"]
+    assert entries["backend"] == pytest.approx(3.0, abs=0.001)
+    assert entries["auth"] == pytest.approx(0.5, abs=0.001)
+    assert entries["total"] == pytest.approx(10.0, abs=0.001)
+
+
+def make_app(tracer):
+    app = Flask(__name__)
+    trace_app(app, tracer)
+
+    @app.route("/ping")
+    def ping():
+        with span("backend"):
+            time.sleep(0.002)
+        return "pong"
+
+    @app.route("/ws")
+    def ws():
+        return "no trace"
+
+    return app
+
+
+def test_trace_app_headers_and_exclusions():
+    tracer = Tracer(capacity=8)
+    client = make_app(tracer).test_client()
+
+    response = client.get("/ping", headers={REQUEST_ID_HEADER: "req-1"})
+    assert response.headers[REQUEST_ID_HEADER] == "req-1"
+    entries = timing(response.headers["Server-Timing"])
+    assert entries["backend"] >= 2.0
+    assert entries["dispatch"] >= entries["backend"]
+    assert entries["total"] >= entries["dispatch"]
+    # O test_client não passa pelo PooledWSGIServer: sem accept
+    assert "accept" not in entries
+
+    assert "Server-Timing" not in client.get("/ws").headers
+    recent = tracer.traces()["recent"]
+    assert [trace["route"] for trace in recent] == ["/ping"]
+    assert current_trace() is None
+
+
+def test_disabled_tracer_adds_nothing():
+    tracer = Tracer(capacity=0)
+    response = make_app(tracer).test_client().get("/ping")
+    assert "Server-Timing" not in response.headers
+    assert tracer.stats()["buffered"] == 0
+
+
+def test_accept_span_excludes_idle_time_before_the_first_request():
+    tracer = Tracer(capacity=8)
+    server = PooledWSGIServer("127.0.0.1", 0, make_app(tracer), workers=2, queue_size=8, keepalive=5.0)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        sock = socket.create_connection(("127.0.0.1", server.port), timeout=2)
+        # Conexão aberta antes (preconnect) e usada só depois
+        time.sleep(0.3)
+        sock.sendall(b"GET /ping HTTP/1.1\r\nHost: x\r\n\r\n")
+        data = b""
+        while b"pong" not in data:
+            data += sock.recv(4096)
+        sock.close()
+    finally:
+        server.shutdown()
+        server.server_close()
+    header = next(line for line in data.decode().split("\r\n") if line.startswith("Server-Timing:"))
+    entries = timing(header.split(": ", 1)[1])
+    assert entries["accept"] < 100
+    assert entries["total"] < 250
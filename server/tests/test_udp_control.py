@@ -0,0 +1,98 @@
+import time
+import hmac
+import hashlib
+import pytest
+from credentials import CredentialStore
+from media_controller import ControlError
+from udp_control import (UDPControlServer, build_request, parse_ack, STATUS_OK, STATUS_DUPLICATE,
+                         STATUS_FORBIDDEN, DEVICE_REQUEST_HEADER, MAGIC, VERSION_DEVICE, ACTION_IDS, MAC_SIZE)
+
+SERVER_TOKEN = "token-do-servidor"
+
+
+class FakeController:
+    def __init__(self):
+        self.commands = []
+
+    def command(self, action, client=None):
+        if action not in ("playpause", "next", "prev"):
+            raise ControlError("Comando inválido", 400)
+        self.commands.append(action)
+        return f"{action} enviado", 202
+
+
+@pytest.fixture
+def store(tmp_path):
+    return CredentialStore(str(tmp_path / "server_devices.json"), reload_interval=0)
+
+
+@pytest.fixture
+def make_server(store):
+    servers = []
+
+    def make_server(shared_token=True):
+        server = UDPControlServer(FakeController(), lambda: SERVER_TOKEN, host="127.0.0.1", port=0,
+                                  credentials=store, shared_token=shared_token)
+        servers.append(server)
+        return server
+
+    yield make_server
+    for server in servers:
+        server.sock.close()
+
+
+def test_shared_token_datagram(make_server):
+    server = make_server()
+    ack = server.handle(build_request(SERVER_TOKEN, "next", 7, 1))
+    assert parse_ack(SERVER_TOKEN, ack) == (STATUS_OK, 7, 1)
+    ack = server.handle(build_request(SERVER_TOKEN, "next", 7, 1))
+    assert parse_ack(SERVER_TOKEN, ack) == (STATUS_DUPLICATE, 7, 1)
+    assert server.controller.commands == ["next"]
+
+
+def test_shared_token_can_be_disabled(make_server):
+    server = make_server(shared_token=False)
+    assert server.handle(build_request(SERVER_TOKEN, "next", 7, 1)) is None
+    assert server.controller.commands == []
+
+
+def test_device_datagram_and_revocation(make_server, store):
+    server = make_server(shared_token=False)
+    device, token = store.add("celular", "command")
+    ack = server.handle(build_request(token, "playpause", 1, 1, device_id=device.id))
+    assert parse_ack(token, ack, device=True) == (STATUS_OK, 1, 1)
+    # Assinado com outro token: descartado
+    assert server.handle(build_request(SERVER_TOKEN, "playpause", 1, 2, device_id=device.id)) is None
+
+    store.revoke(device.id)
+    assert server.handle(build_request(token, "playpause", 1, 3, device_id=device.id)) is None
+    assert server.controller.commands == ["playpause"]
+    assert server.stats()["device_commands"] == 1
+
+
+def test_device_without_command_scope(make_server, store):
+    server = make_server()
+    device, token = store.add("painel", "volume")
+    ack = server.handle(build_request(token, "next", 1, 1, device_id=device.id))
+    assert parse_ack(token, ack, device=True) == (STATUS_FORBIDDEN, 1, 1)
+    assert server.controller.commands == []
+
+
+def test_replay_windows_are_per_device(make_server, store):
+    server = make_server()
+    first, first_token = store.add("celular")
+    second, second_token = store.add("tablet")
+    for device, token in ((first, first_token), (second, second_token)):
+        ack = server.handle(build_request(token, "next", 1, 1, device_id=device.id))
+        assert parse_ack(token, ack, device=True)[0] == STATUS_OK
+
+
+def test_stored_hash_cannot_sign(make_server, store):
+    server = make_server()
+    device, token = store.add("celular")
+    header = DEVICE_REQUEST_HEADER.pack(MAGIC, VERSION_DEVICE, ACTION_IDS["next"], int(device.id, 16), 1, 1,
+                                        int(time.time()))
+    # Quem só lê server_devices.json tem o hash de verificação, não a chave UDP
+    forged = header + hmac.new(bytes.fromhex(device.token_hash), header, hashlib.sha256).digest()[:MAC_SIZE]
+    assert server.handle(forged) is None
+    assert server.controller.commands == []
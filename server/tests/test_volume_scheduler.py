@@ -0,0 +1,88 @@
+import time
+import threading
+import pytest
+from audio_backend import FakeAudioBackend
+from volume_scheduler import VolumeScheduler, VolumeChange
+
+
+@pytest.fixture
+def make_scheduler():
+    schedulers = []
+
+    def make(backend, min_interval):
+        scheduler = VolumeScheduler(backend, min_interval=min_interval)
+        schedulers.append(scheduler)
+        return scheduler
+
+    yield make
+    for scheduler in schedulers:
+        scheduler.close()
+
+
+def test_sequential_writes_are_not_delayed(make_scheduler):
+    backend = FakeAudioBackend()
+    scheduler = make_scheduler(backend, min_interval=0.2)
+    start = time.monotonic()
+    for level in range(10):
+        ticket = scheduler.submit(VolumeChange(level=level))
+        assert ticket.status == "applied"
+    # Sem rajada, nenhuma escrita espera o intervalo mínimo
+    assert time.monotonic() - start < 0.2
+    assert backend.level == 9
+    assert scheduler.stats()["coalesced"] == 0
+
+
+def test_burst_is_coalesced_latest_wins(make_scheduler):
+    backend = FakeAudioBackend(latency=0.05)
+    scheduler = make_scheduler(backend, min_interval=0.05)
+    tickets = {}
+
+    def submit(level):
+        tickets[level] = scheduler.submit(VolumeChange(level=level))
+
+    first = threading.Thread(target=submit, args=(1,))
+    first.start()
+    time.sleep(0.01)
+    threads = [threading.Thread(target=submit, args=(level,)) for level in range(2, 8)]
+    for thread in threads:
+        thread.start()
+        time.sleep(0.002)
+    for thread in [first] + threads:
+        thread.join()
+
+    assert backend.level == 7
+    assert tickets[7].status == "applied"
+    assert scheduler.stats()["coalesced"] > 0
+    assert any(ticket.status == "superseded" for ticket in tickets.values())
+    assert backend.calls < 7
+
+
+def test_relative_changes_are_summed():
+    change = VolumeChange(delta=5).merge(VolumeChange(delta=-2)).merge(VolumeChange(mute="toggle"))
+    assert change.apply_to(50.0, False) == (53.0, True)
+    assert VolumeChange(level=90).merge(VolumeChange(delta=20)).apply_to(10.0, False) == (100.0, False)
+
+
+def test_close_cancels_pending_tickets():
+    backend = FakeAudioBackend(latency=0.2)
+    scheduler = VolumeScheduler(backend, min_interval=0)
+    tickets = {}
+
+    def submit(level):
+        tickets[level] = scheduler.submit(VolumeChange(level=level))
+
+    writing = threading.Thread(target=submit, args=(10,))
+    writing.start()
+    time.sleep(0.05)
+    waiting = threading.Thread(target=submit, args=(20,))
+    waiting.start()
+    time.sleep(0.05)
+    scheduler.close()
+    writing.join()
+    waiting.join()
+
+    # Nada substituiu o ajuste pendente: ele não foi aplicado
+    assert tickets[10].status == "applied"
+    assert tickets[20].status == "cancelled"
+    assert backend.level == 10
+    assert scheduler.submit(VolumeChange(level=30)).status == "cancelled"
@@ -0,0 +1,75 @@
+import json
+import threading
+import pytest
+from flask import Flask, g, jsonify
+from simple_websocket import Client, ConnectionError
+from serving import PooledWSGIServer
+from ws_channel import TicketBook, register_control_socket
+
+
+class FakeController:
+    def execute(self, operation, client=None):
+        return "pong", 200
+
+
+def authenticate(auth_header, scope=None):
+    if auth_header != "Bearer segredo":
+        return jsonify({"error": "Token inválido"}), 401
+    g.device = "celular"
+    return None
+
+
+@pytest.fixture
+def server():
+    app = Flask(__name__)
+    tickets = TicketBook(ttl=5)
+    register_control_socket(app, FakeController(), authenticate, lambda *args: None, tickets=tickets)
+    server = PooledWSGIServer("127.0.0.1", 0, app, workers=2, queue_size=8, keepalive=5.0)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    server.app = app
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def ping(ws):
+    ws.send(json.dumps({"id": 1, "op": "ping"}))
+    return json.loads(ws.receive(timeout=2))
+
+
+def test_header_handshake(server):
+    ws = Client.connect(f"ws://127.0.0.1:{server.port}/ws", headers={"Authorization": "Bearer segredo"})
+    assert ping(ws)["ok"]
+    ws.close()
+
+
+def test_token_in_query_is_refused(server):
+    with pytest.raises(ConnectionError):
+        Client.connect(f"ws://127.0.0.1:{server.port}/ws?token=segredo")
+
+
+def test_ticket_is_single_use(server):
+    client = server.app.test_client()
+    assert client.post("/ws/ticket").status_code == 401
+    response = client.post("/ws/ticket", headers={"Authorization": "Bearer segredo"},
+                           environ_base={"REMOTE_ADDR": "127.0.0.1"})
+    ticket = response.get_json()["ticket"]
+    assert response.get_json()["expires_in"] == 5
+
+    ws = Client.connect(f"ws://127.0.0.1:{server.port}/ws?ticket={ticket}")
+    assert ping(ws)["ok"]
+    ws.close()
+    with pytest.raises(ConnectionError):
+        Client.connect(f"ws://127.0.0.1:{server.port}/ws?ticket={ticket}")
+
+
+def test_ticket_expiry_and_address():
+    tickets = TicketBook(ttl=0)
+    assert tickets.redeem(tickets.issue("celular", "10.0.0.1"), "10.0.0.1") is None
+    tickets = TicketBook(ttl=30)
+    ticket = tickets.issue("celular", "10.0.0.1")
+    assert tickets.redeem(ticket, "10.0.0.2") is None
+    # Tentativa de outro IP também consome o ticket
+    assert tickets.redeem(ticket, "10.0.0.1") is None
+    assert tickets.redeem(tickets.issue("celular", "10.0.0.1"), "10.0.0.1") == "celular"
+    assert tickets.stats() == {"issued": 2, "redeemed": 1, "rejected": 2, "pending": 0}
@@ -0,0 +1,140 @@
+import os
+import ssl
+import shutil
+import hashlib
+import logging
+import datetime
+import ipaddress
+import subprocess
+
+logger = logging.getLogger(__name__)
+
+# HTTPS opcional (também ativado por --tls em server.py e server_gui.py)
+TLS_ENV = 'AUDIOREMOTE_TLS'
+DEFAULT_TLS = os.environ.get(TLS_ENV, "0").lower() in ("1", "true", "yes")
+
+# Certificado autoassinado gravado ao lado do server_token.txt
+CERT_FILE = 'server_cert.pem'
+KEY_FILE = 'server_key.pem'
+CERT_DAYS = 3650
+CERT_NAME = "AudioRemote Server"
+
+# Tickets de sessão TLS 1.3 enviados por handshake completo
+SESSION_TICKETS = 2
+
+
+class TLSError(Exception):
+    """Não foi possível criar ou carregar o certificado"""
+
+
+def certificate_paths(token_file):
+    directory = os.path.dirname(os.path.abspath(token_file))
+    return os.path.join(directory, CERT_FILE), os.path.join(directory, KEY_FILE)
+
+
+def _open_private(path):
+    """Abre o arquivo da chave já com permissão 0600, antes de gravar qualquer byte"""
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    try:
+        # O arquivo pode já existir com outra permissão
+        os.chmod(path, 0o600)
+    except OSError:
+        pass
+    return os.fdopen(fd, "wb")
+
+
+def _generate_with_cryptography(cert_path, key_path, hosts):
+    from cryptography import x509
+    from cryptography.x509.oid import NameOID
+    from cryptography.hazmat.primitives import hashes, serialization
+    from cryptography.hazmat.primitives.asymmetric import ec
+
+    key = ec.generate_private_key(ec.SECP256R1())
+    name = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, CERT_NAME)])
+    alt_names = [x509.DNSName("localhost")]
+    for host in hosts:
+        alt_names.append(x509.IPAddress(ipaddress.ip_address(host)))
+    now = datetime.datetime.now(datetime.timezone.utc)
+    certificate = (
+        x509.CertificateBuilder()
+        .subject_name(name)
+        .issuer_name(name)
+        .public_key(key.public_key())
+        .serial_number(x509.random_serial_number())
+        .not_valid_before(now - datetime.timedelta(days=1))
+        .not_valid_after(now + datetime.timedelta(days=CERT_DAYS))
+        .add_extension(x509.SubjectAlternativeName(alt_names), critical=False)
+        .add_extension(x509.BasicConstraints(ca=False, path_length=None), critical=True)
+        .sign(key, hashes.SHA256())
+    )
+    with _open_private(key_path) as f:
+        f.write(key.private_bytes(serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8,
+                                  serialization.NoEncryption()))
+    with open(cert_path, "wb") as f:
+        f.write(certificate.public_bytes(serialization.Encoding.PEM))
+
+
+def _generate_with_openssl(cert_path, key_path, hosts):
+    """Sem o pacote cryptography: usa o executável openssl, se houver"""
+    executable = shutil.which("openssl")
+    if executable is None:
+        raise TLSError("Instale o pacote cryptography (pip install cryptography) para gerar o certificado")
+    alt_names = ",".join(["DNS:localhost"] + [f"IP:{host}" for host in hosts])
+    # O openssl grava a chave no arquivo já criado com permissão 0600
+    _open_private(key_path).close()
+    subprocess.run([
+        executable, "req", "-x509", "-newkey", "ec", "-pkeyopt", "ec_paramgen_curve:P-256",
+        "-nodes", "-keyout", key_path, "-out", cert_path, "-days", str(CERT_DAYS),
+        "-subj", f"/CN={CERT_NAME}", "-addext", f"subjectAltName={alt_names}",
+    ], check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+def ensure_certificate(token_file, hosts=()):
+    """Retorna (cert, chave), gerando o par autoassinado na primeira vez.
+
+    ``hosts`` (IPs do servidor) entram no subjectAltName; como o app fixa
+    o certificado pela impressão digital, uma troca de IP depois não exige
+    um certificado novo.
+    """
+    cert_path, key_path = certificate_paths(token_file)
+    if os.path.exists(cert_path) and os.path.exists(key_path):
+        return cert_path, key_path
+
+    hosts = sorted(set(hosts) | {"127.0.0.1"})
+    try:
+        try:
+            _generate_with_cryptography(cert_path, key_path, hosts)
+        except ImportError:
+            _generate_with_openssl(cert_path, key_path, hosts)
+    except (OSError, subprocess.CalledProcessError) as e:
+        raise TLSError(f"Falha ao gerar o certificado: {e}") from e
+    logger.info(f"🔐 Certificado autoassinado criado em {cert_path}")
+    return cert_path, key_path
+
+
+def fingerprint(cert_path):
+    """SHA-256 do certificado (DER), no formato AA:BB:..."""
+    with open(cert_path) as f:
+        der = ssl.PEM_cert_to_DER_cert(f.read())
+    digest = hashlib.sha256(der).hexdigest().upper()
+    return ":".join(digest[i:i + 2] for i in range(0, len(digest), 2))
+
+
+def create_server_context(cert_path, key_path):
+    """SSLContext do servidor com retomada de sessão.
+
+    O mesmo contexto vale pela vida do servidor: TLS 1.3 envia tickets
+    de sessão e TLS 1.2 usa tickets ou o cache de sessões do OpenSSL, então
+    um celular que reconecta faz o handshake abreviado (sem a troca de
+    chaves completa nem o envio do certificado).
+    """
+    context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+    context.minimum_version = ssl.TLSVersion.TLSv1_2
+    try:
+        context.load_cert_chain(cert_path, key_path)
+    except (OSError, ssl.SSLError) as e:
+        raise TLSError(f"Certificado inválido: {e}") from e
+    context.options &= ~ssl.OP_NO_TICKET
+    context.num_tickets = SESSION_TICKETS
+    context.set_alpn_protocols(["http/1.1"])
+    return context
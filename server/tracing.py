@@ -0,0 +1,211 @@
+import os
+import re
+import time
+import heapq
+import secrets
+import itertools
+import threading
+from collections import deque
+from contextlib import contextmanager
+from flask import g, request
+from serving import ACCEPTED_ENVIRON, HANDSHAKE_ENVIRON
+
+# Traces mais recentes guardados em memória (0 desativa o tracing)
+TRACE_BUFFER_ENV = 'AUDIOREMOTE_TRACE_BUFFER'
+DEFAULT_TRACE_BUFFER = int(os.environ.get(TRACE_BUFFER_ENV, 256))
+
+# Traces mais lentos guardados à parte (não saem do buffer por serem antigos)
+TRACE_SLOWEST_ENV = 'AUDIOREMOTE_TRACE_SLOWEST'
+DEFAULT_TRACE_SLOWEST = int(os.environ.get(TRACE_SLOWEST_ENV, 20))
+
+REQUEST_ID_HEADER = "X-Request-ID"
+_VALID_REQUEST_ID = re.compile(r"[A-Za-z0-9._:-]{1,64}")
+
+_local = threading.local()
+
+
+class Trace:
+    """Uma requisição: ID, rota, status e os spans (nome, início, fim) medidos.
+
+    Spans podem se sobrepor (``dispatch`` contém ``auth`` e ``backend``) e
+    threads de backend podem acrescentar spans depois da resposta (ex.:
+    ``key_injection``, já que o comando é respondido com 202 antes).
+    """
+    __slots__ = ("id", "method", "path", "route", "client", "status", "wall", "start", "end", "spans")
+
+    def __init__(self, trace_id, method, path, client, start):
+        self.id = trace_id
+        self.method = method
+        self.path = path
+        self.route = None
+        self.client = client
+        self.status = None
+        self.wall = time.time()
+        self.start = start
+        self.end = None
+        self.spans = []
+
+    def add(self, name, start, end):
+        # list.append é atômico: seguro a partir de outras threads
+        self.spans.append((name, start, end))
+
+    @property
+    def duration(self):
+        return (self.end or time.perf_counter()) - self.start
+
+    def server_timing(self):
+        """Valor do header Server-Timing (spans de mesmo nome somados)"""
+        totals = {}
+        for name, start, end in list(self.spans):
+            totals[name] = totals.get(name, 0.0) + (end - start)
+        totals["total"] = self.duration
+        return ", ".join(f"{name};dur={seconds * 1000:.3f}" for name, seconds in totals.items())
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "ts": round(self.wall, 3),
+            "method": self.method,
+            "path": self.path,
+            "route": self.route,
+            "client": self.client,
+            "status": self.status,
+            "total_ms": round(self.duration * 1000, 3),
+            "spans": [
+                {"name": name, "offset_ms": round((start - self.start) * 1000, 3),
+                 "duration_ms": round((end - start) * 1000, 3)}
+                for name, start, end in sorted(list(self.spans), key=lambda item: item[1])
+            ],
+        }
+
+
+def current_trace():
+    """Trace da requisição atendida pela thread atual (ou None)"""
+    return getattr(_local, "trace", None)
+
+
+@contextmanager
+def span(name):
+    """Mede um trecho no trace da requisição atual (nada fora de uma requisição)"""
+    trace = current_trace()
+    if trace is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        trace.add(name, start, time.perf_counter())
+
+
+class Tracer:
+    """Guarda os traces recentes em um buffer circular e os mais lentos em um heap.
+
+    Cada requisição custa um ID, alguns perf_counter() e um lock no final;
+    nada é escrito em disco nem logado.
+    """
+
+    def __init__(self, capacity=DEFAULT_TRACE_BUFFER, slowest=DEFAULT_TRACE_SLOWEST):
+        self.capacity = capacity
+        self.slowest_size = slowest
+        self.recorded = 0
+        self._recent = deque(maxlen=max(capacity, 1))
+        # Heap mínimo por duração: o topo é o mais rápido dos lentos
+        self._slowest = []
+        self._seq = itertools.count()
+        self._prefix = secrets.token_hex(3)
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self):
+        return self.capacity > 0
+
+    def begin(self, method, path, client, request_id=None, start=None):
+        if not request_id or not _VALID_REQUEST_ID.fullmatch(request_id):
+            request_id = f"{self._prefix}-{next(self._seq)}"
+        trace = Trace(request_id, method, path, client, start or time.perf_counter())
+        _local.trace = trace
+        return trace
+
+    def finish(self, trace, status, route=None):
+        trace.end = time.perf_counter()
+        trace.status = status
+        trace.route = route
+        _local.trace = None
+        with self._lock:
+            self.recorded += 1
+            self._recent.append(trace)
+            if self.slowest_size > 0:
+                item = (trace.duration, next(self._seq), trace)
+                if len(self._slowest) < self.slowest_size:
+                    heapq.heappush(self._slowest, item)
+                elif item[0] > self._slowest[0][0]:
+                    heapq.heapreplace(self._slowest, item)
+
+    def traces(self, limit=None):
+        """Traces recentes (mais novo primeiro) e mais lentos (mais lento primeiro)"""
+        with self._lock:
+            recent = list(self._recent)[::-1]
+            slowest = [trace for _, _, trace in sorted(self._slowest, key=lambda item: item[0], reverse=True)]
+        if limit is not None:
+            recent, slowest = recent[:limit], slowest[:limit]
+        return {
+            "enabled": self.enabled,
+            "capacity": self.capacity,
+            "recorded": self.recorded,
+            "recent": [trace.to_dict() for trace in recent],
+            "slowest": [trace.to_dict() for trace in slowest],
+        }
+
+    def stats(self):
+        with self._lock:
+            slowest = max((item[0] for item in self._slowest), default=None)
+            buffered = len(self._recent) if self.enabled else 0
+        return {
+            "enabled": self.enabled,
+            "capacity": self.capacity,
+            "buffered": buffered,
+            "recorded": self.recorded,
+            "slowest_ms": round(slowest * 1000, 3) if slowest is not None else None,
+        }
+
+
+def trace_app(app, tracer, exclude=("/ws", "/state/stream", "/debug/traces")):
+    """Abre um trace por requisição e responde com X-Request-ID e Server-Timing.
+
+    ``accept`` (da chegada dos primeiros bytes até a requisição ser lida,
+    só na primeira requisição da conexão) e ``tls`` vêm do PooledWSGIServer; ``dispatch``
+    cobre o roteamento e a view. Conexões longas ficam de fora.
+    """
+
+    @app.before_request
+    def begin_trace():
+        if not tracer.enabled or request.path in exclude:
+            return
+        now = time.perf_counter()
+        accepted = request.environ.get(ACCEPTED_ENVIRON)
+        trace = tracer.begin(request.method, request.path, request.remote_addr,
+                             request.headers.get(REQUEST_ID_HEADER), accepted or now)
+        if accepted is not None:
+            trace.add("accept", accepted, now)
+        handshake = request.environ.get(HANDSHAKE_ENVIRON)
+        if handshake is not None:
+            trace.add("tls", *handshake)
+        g.trace_dispatch = now
+
+    @app.after_request
+    def finish_trace(response):
+        trace = current_trace()
+        start = g.pop("trace_dispatch", None)
+        if trace is None or start is None:
+            return response
+        trace.add("dispatch", start, time.perf_counter())
+        tracer.finish(trace, response.status_code, request.url_rule.rule if request.url_rule else None)
+        response.headers[REQUEST_ID_HEADER] = trace.id
+        response.headers["Server-Timing"] = trace.server_timing()
+        return response
+
+    @app.teardown_request
+    def clear_trace(_error=None):
+        # Nunca deixa o trace vazar para a próxima requisição da thread
+        _local.trace = None
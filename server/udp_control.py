@@ -0,0 +1,253 @@
+import os
+import hmac
+import time
+import socket
+import struct
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from media_controller import ControlError
+from credentials import udp_key
+
+logger = logging.getLogger(__name__)
+
+# Porta UDP opcional (0 = desativado)
+UDP_PORT_ENV = 'AUDIOREMOTE_UDP_PORT'
+DEFAULT_UDP_PORT = int(os.environ.get(UDP_PORT_ENV, 0))
+
+# Aceita datagramas assinados com o token do servidor (versão 1); com 0 só
+# dispositivos pareados (versão 2), que podem ser revogados
+UDP_SHARED_TOKEN_ENV = 'AUDIOREMOTE_UDP_SHARED_TOKEN'
+DEFAULT_UDP_SHARED_TOKEN = os.environ.get(UDP_SHARED_TOKEN_ENV, "1").lower() in ("1", "true", "yes")
+
+# Formato (big-endian):
+#   requisição: magic "AR", versão, código da ação, client_id u32, seq u32,
+#               timestamp u32 (segundos unix), HMAC-SHA256 truncado (16 bytes)
+#   ack:        magic "AR", versão, status, client_id u32, seq u32, HMAC (16 bytes)
+# O HMAC usa o token do servidor como chave e cobre todos os bytes anteriores.
+# Na versão 2 a requisição traz também o id do dispositivo pareado (u32,
+# logo após o código da ação) e a chave é a chave UDP do dispositivo,
+# HMAC-SHA256(token do dispositivo, "udp").
+MAGIC = b"AR"
+VERSION = 1
+VERSION_DEVICE = 2
+MAC_SIZE = 16
+REQUEST_HEADER = struct.Struct("!2sBBIII")
+DEVICE_REQUEST_HEADER = struct.Struct("!2sBBIIII")
+ACK_HEADER = struct.Struct("!2sBBII")
+REQUEST_SIZE = REQUEST_HEADER.size + MAC_SIZE
+DEVICE_REQUEST_SIZE = DEVICE_REQUEST_HEADER.size + MAC_SIZE
+
+ACTION_CODES = {1: "playpause", 2: "next", 3: "prev"}
+ACTION_IDS = {action: code for code, action in ACTION_CODES.items()}
+
+STATUS_OK = 0
+STATUS_DUPLICATE = 1
+STATUS_INVALID = 2
+STATUS_ERROR = 3
+STATUS_FORBIDDEN = 4
+
+# Janela anti-replay: relógio e sequências aceitas fora de ordem
+MAX_CLOCK_SKEW = 30
+REPLAY_WINDOW = 64
+
+
+def _mac(key, data):
+    return hmac.new(key, data, hashlib.sha256).digest()[:MAC_SIZE]
+
+
+def device_key(token):
+    """Chave HMAC de um dispositivo pareado, derivada do seu token"""
+    return bytes.fromhex(udp_key(token))
+
+
+def build_request(token, action, client_id, seq, timestamp=None, device_id=None):
+    """Monta o datagrama de um comando (usado por clientes e benchmarks).
+
+    Com ``device_id`` (o id hexadecimal do dispositivo) usa a versão 2,
+    assinada com o token do dispositivo.
+    """
+    timestamp = int(time.time()) if timestamp is None else timestamp
+    if device_id is None:
+        header = REQUEST_HEADER.pack(MAGIC, VERSION, ACTION_IDS[action], client_id, seq, timestamp)
+        return header + _mac(token.encode(), header)
+    header = DEVICE_REQUEST_HEADER.pack(MAGIC, VERSION_DEVICE, ACTION_IDS[action], int(device_id, 16),
+                                        client_id, seq, timestamp)
+    return header + _mac(device_key(token), header)
+
+
+def parse_ack(token, data, device=False):
+    """Valida um ack e retorna (status, client_id, seq) ou None"""
+    if len(data) != ACK_HEADER.size + MAC_SIZE:
+        return None
+    key = device_key(token) if device else token.encode()
+    header, mac = data[:ACK_HEADER.size], data[ACK_HEADER.size:]
+    if not hmac.compare_digest(mac, _mac(key, header)):
+        return None
+    magic, version, status, client_id, seq = ACK_HEADER.unpack(header)
+    if magic != MAGIC or version != (VERSION_DEVICE if device else VERSION):
+        return None
+    return status, client_id, seq
+
+
+class ReplayWindow:
+    """Janela deslizante de sequências por client_id (estilo IPsec)"""
+
+    def __init__(self, max_clients=1024):
+        self.max_clients = max_clients
+        self._clients = OrderedDict()
+
+    def check_and_update(self, client_id, seq):
+        """True se a sequência é nova; registra-a como vista"""
+        state = self._clients.get(client_id)
+        if state is None:
+            self._clients[client_id] = (seq, 1)
+            if len(self._clients) > self.max_clients:
+                self._clients.popitem(last=False)
+            return True
+
+        self._clients.move_to_end(client_id)
+        highest, bitmap = state
+        if seq > highest:
+            shift = seq - highest
+            bitmap = ((bitmap << shift) | 1) & ((1 << REPLAY_WINDOW) - 1) if shift < REPLAY_WINDOW else 1
+            self._clients[client_id] = (seq, bitmap)
+            return True
+
+        offset = highest - seq
+        if offset >= REPLAY_WINDOW or bitmap & (1 << offset):
+            return False
+        self._clients[client_id] = (highest, bitmap | (1 << offset))
+        return True
+
+
+class UDPControlServer:
+    """Listener UDP autenticado para playpause/next/prev.
+
+    Cada comando é um único datagrama autenticado por HMAC com o token do
+    servidor ou, na versão 2, com o de um dispositivo pareado de
+    ``credentials``; a resposta é um único datagrama de ack. Datagramas
+    inválidos, de dispositivos revogados ou com o token do servidor quando
+    ``shared_token`` é False são descartados em silêncio. Uma retransmissão
+    (mesmo client_id/seq) recebe ack STATUS_DUPLICATE sem executar o
+    comando de novo.
+    """
+
+    def __init__(self, controller, get_token, host="0.0.0.0", port=DEFAULT_UDP_PORT, credentials=None,
+                 shared_token=DEFAULT_UDP_SHARED_TOKEN):
+        self.controller = controller
+        self.get_token = get_token
+        self.credentials = credentials
+        self.shared_token = shared_token
+        self.counters = {
+            "received": 0,
+            "executed": 0,
+            "device_commands": 0,
+            "duplicates": 0,
+            "rejected": 0,
+            "forbidden": 0,
+            "errors": 0,
+        }
+        self._replay = ReplayWindow()
+        self._running = False
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.bind((host, port))
+        self.sock.settimeout(0.5)
+        self.port = self.sock.getsockname()[1]
+
+    def _authenticate(self, data):
+        """(chave, device, campos da requisição) de um datagrama válido, ou None"""
+        if len(data) == REQUEST_SIZE and data[2] == VERSION and self.shared_token:
+            header, mac = data[:REQUEST_HEADER.size], data[REQUEST_HEADER.size:]
+            key = self.get_token().encode()
+            device = None
+            magic, version, code, client_id, seq, timestamp = REQUEST_HEADER.unpack(header)
+        elif len(data) == DEVICE_REQUEST_SIZE and data[2] == VERSION_DEVICE and self.credentials is not None:
+            header, mac = data[:DEVICE_REQUEST_HEADER.size], data[DEVICE_REQUEST_HEADER.size:]
+            magic, version, code, device_id, client_id, seq, timestamp = DEVICE_REQUEST_HEADER.unpack(header)
+            # Revogado ou desconhecido: descartado como um MAC inválido
+            device = self.credentials.find(f"{device_id:08x}")
+            # Dispositivos sem chave UDP (pareados antes dela existir) precisam ser pareados de novo
+            if device is None or device.udp_key is None:
+                return None
+            key = bytes.fromhex(device.udp_key)
+        else:
+            return None
+        if magic != MAGIC or not hmac.compare_digest(mac, _mac(key, header)):
+            return None
+        return key, device, version, code, client_id, seq, timestamp
+
+    def handle(self, data, address=None, now=None):
+        """Processa um datagrama e retorna o ack (ou None para descartar)"""
+        self.counters["received"] += 1
+        request = self._authenticate(data)
+        now = time.time() if now is None else now
+        if request is None or abs(now - request[-1]) > MAX_CLOCK_SKEW:
+            self.counters["rejected"] += 1
+            return None
+        key, device, version, code, client_id, seq, _ = request
+
+        # Cada dispositivo tem a sua janela de sequências
+        replay_id = client_id if device is None else (device.id, client_id)
+        if not self._replay.check_and_update(replay_id, seq):
+            self.counters["duplicates"] += 1
+            status = STATUS_DUPLICATE
+        elif code not in ACTION_CODES:
+            status = STATUS_INVALID
+        elif device is not None and not device.allows("command"):
+            self.counters["forbidden"] += 1
+            status = STATUS_FORBIDDEN
+        else:
+            try:
+                self.controller.command(ACTION_CODES[code], address[0] if address else None)
+                self.counters["executed"] += 1
+                if device is not None:
+                    self.counters["device_commands"] += 1
+                status = STATUS_OK
+                logger.info("📡 Comando UDP executado: %s de %s", ACTION_CODES[code],
+                            device.name if device is not None else (address[0] if address else "?"),
+                            extra={"event": "command"})
+            except ControlError as e:
+                self.counters["errors"] += 1
+                status = STATUS_INVALID if e.status == 400 else STATUS_ERROR
+
+        ack = ACK_HEADER.pack(MAGIC, version, status, client_id, seq)
+        return ack + _mac(key, ack)
+
+    def serve_forever(self):
+        self._running = True
+        accepted = "token do servidor e dispositivos pareados" if self.shared_token else "só dispositivos pareados"
+        logger.info(f"📡 Comandos UDP na porta {self.port} ({accepted})")
+        while self._running:
+            try:
+                data, address = self.sock.recvfrom(64)
+            except socket.timeout:
+                continue
+            except OSError:
+                break
+            ack = self.handle(data, address)
+            if ack is not None:
+                try:
+                    self.sock.sendto(ack, address)
+                except OSError:
+                    pass
+
+    def shutdown(self):
+        self._running = False
+        self.sock.close()
+
+    def stats(self):
+        return dict(self.counters, port=self.port, shared_token=self.shared_token)
+
+
+def start_udp_server(controller, get_token, port=None, credentials=None, shared_token=None):
+    """Cria e inicia o listener UDP em uma thread se a porta estiver configurada"""
+    port = DEFAULT_UDP_PORT if port is None else port
+    if not port:
+        return None
+    shared_token = DEFAULT_UDP_SHARED_TOKEN if shared_token is None else shared_token
+    server = UDPControlServer(controller, get_token, port=port, credentials=credentials,
+                              shared_token=shared_token)
+    threading.Thread(target=server.serve_forever, name="udp-control", daemon=True).start()
+    return server
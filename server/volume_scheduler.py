@@ -0,0 +1,231 @@
+import os
+import time
+import logging
+import threading
+from metrics import stage_timer
+from tracing import current_trace
+
+logger = logging.getLogger(__name__)
+
+# Intervalo mínimo entre duas escritas no dispositivo de áudio
+MIN_INTERVAL_ENV = 'AUDIOREMOTE_VOLUME_MIN_INTERVAL_MS'
+DEFAULT_MIN_INTERVAL = float(os.environ.get(MIN_INTERVAL_ENV, 30)) / 1000
+
+
+class VolumeChange:
+    """Alteração de volume/mudo aplicada de forma atômica pelo backend.
+
+    ``level`` é absoluto (0-100); ``delta`` é relativo ao volume atual;
+    ``mute`` é True, False ou "toggle".
+    """
+
+    def __init__(self, level=None, delta=0.0, mute=None):
+        self.level = level
+        self.delta = delta
+        self.mute = mute
+
+    @property
+    def sets_volume(self):
+        return self.level is not None or self.delta != 0
+
+    def merge(self, newer):
+        """Combina com uma alteração posterior sem perder nenhuma das duas"""
+        if newer.level is not None:
+            level, delta = newer.level, 0.0
+        elif self.level is not None:
+            level, delta = clamp(self.level + newer.delta), 0.0
+        else:
+            level, delta = None, self.delta + newer.delta
+
+        if newer.mute is None:
+            mute = self.mute
+        elif newer.mute != "toggle":
+            mute = newer.mute
+        elif self.mute is None:
+            mute = "toggle"
+        elif self.mute == "toggle":
+            # Dois toggles se anulam
+            mute = None
+        else:
+            mute = not self.mute
+        return VolumeChange(level, delta, mute)
+
+    def overrides(self, older):
+        """True se esta alteração torna a anterior irrelevante"""
+        volume_overridden = self.level is not None or not older.sets_volume
+        mute_overridden = self.mute in (True, False) or older.mute is None
+        return volume_overridden and mute_overridden
+
+    def apply_to(self, volume, muted):
+        """Estado resultante a partir do estado atual"""
+        if self.level is not None:
+            volume = self.level
+        elif self.delta:
+            volume = clamp(volume + self.delta)
+        if self.mute == "toggle":
+            muted = not muted
+        elif self.mute is not None:
+            muted = self.mute
+        return volume, muted
+
+
+def clamp(level):
+    return max(0.0, min(100.0, level))
+
+
+class VolumeTicket:
+    """Acompanha o resultado de uma atualização de volume enfileirada"""
+
+    def __init__(self, change):
+        self.change = change
+        self.status = "pending"
+        self.error = None
+        self.state = None
+        self.changed = False
+        # Trace da requisição que espera o ticket (recebe o span audio_endpoint)
+        self.trace = current_trace()
+        self._done = threading.Event()
+
+    def finish(self, status, error=None, state=None, changed=False):
+        self.status = status
+        self.error = error
+        self.state = state
+        self.changed = changed
+        self._done.set()
+
+    def wait(self, timeout=None):
+        self._done.wait(timeout)
+        return self
+
+
+def trace_write(tickets, start):
+    """Uma escrita combinada aparece no trace de cada requisição que ela atendeu"""
+    end = time.perf_counter()
+    for ticket in tickets:
+        if ticket.trace is not None:
+            ticket.trace.add("audio_endpoint", start, end)
+
+
+class VolumeScheduler:
+    """Aplica atualizações de volume/mudo em uma única thread.
+
+    Enquanto uma escrita está em andamento, novas requisições são
+    combinadas com a alteração pendente: um volume absoluto substitui o
+    anterior (o substituído é respondido na hora) e deltas e mudo são
+    somados, então ajustes concorrentes nunca se perdem. O backend lê o
+    estado e aplica a alteração de uma vez, pulando escritas sem efeito.
+    ``min_interval`` só separa escritas seguidas de uma rajada (alterações
+    que chegaram durante uma escrita); uma alteração que encontra o
+    agendador ocioso é escrita na hora.
+    """
+
+    def __init__(self, backend, min_interval=DEFAULT_MIN_INTERVAL, metrics=None):
+        self.backend = backend
+        self.metrics = metrics
+        self.min_interval = min_interval
+        self.submitted = 0
+        self.applied = 0
+        self.coalesced = 0
+        self.skipped = 0
+        self.failed = 0
+        self._pending = None
+        self._tickets = []
+        self._last_apply = 0.0
+        # Alguma alteração chegou enquanto uma escrita estava em andamento
+        self._burst = False
+        self._writing = False
+        self._closed = False
+        self._cond = threading.Condition()
+        self._thread = threading.Thread(target=self._run, name="volume-scheduler", daemon=True)
+        self._thread.start()
+
+    def submit(self, change, timeout=5.0):
+        """Agenda uma VolumeChange e aguarda ela ser aplicada ou substituída"""
+        ticket = VolumeTicket(change)
+        with self._cond:
+            if self._closed:
+                ticket.finish("cancelled")
+                return ticket
+            if self._writing or self._pending is not None:
+                self._burst = True
+            if self._pending is None:
+                self._pending = change
+            else:
+                self._pending = self._pending.merge(change)
+                self.coalesced += 1
+                riding = []
+                for older in self._tickets:
+                    if change.overrides(older.change):
+                        older.finish("superseded")
+                    else:
+                        riding.append(older)
+                self._tickets = riding
+            self._tickets.append(ticket)
+            self.submitted += 1
+            self._cond.notify()
+        return ticket.wait(timeout)
+
+    def _next_change(self):
+        """Aguarda a próxima alteração (em rajada, respeitando o intervalo mínimo)"""
+        with self._cond:
+            self._writing = False
+            while not self._closed:
+                if self._pending is None:
+                    self._cond.wait()
+                    continue
+                delay = self._last_apply + self.min_interval - time.monotonic()
+                if self._burst and delay > 0:
+                    # Novos valores podem ser combinados durante a espera
+                    self._cond.wait(delay)
+                    continue
+                change, tickets = self._pending, self._tickets
+                self._pending, self._tickets = None, []
+                self._burst = False
+                self._writing = True
+                return change, tickets
+            return None, []
+
+    def _run(self):
+        while True:
+            change, tickets = self._next_change()
+            if change is None:
+                break
+            start = time.perf_counter()
+            try:
+                with stage_timer(self.metrics, "audio_endpoint"):
+                    state, changed = self.backend.apply_change(change)
+                trace_write(tickets, start)
+                if changed:
+                    self.applied += 1
+                    self._last_apply = time.monotonic()
+                else:
+                    self.skipped += 1
+                for ticket in tickets:
+                    ticket.finish("applied", state=state, changed=changed)
+            except Exception as e:
+                trace_write(tickets, start)
+                self.failed += 1
+                self._last_apply = time.monotonic()
+                for ticket in tickets:
+                    ticket.finish("failed", e)
+
+    def stats(self):
+        """Contadores do agendador"""
+        return {
+            "submitted": self.submitted,
+            "applied": self.applied,
+            "coalesced": self.coalesced,
+            "skipped": self.skipped,
+            "failed": self.failed,
+            "min_interval_ms": round(self.min_interval * 1000, 1),
+        }
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            # Nada substituiu esses ajustes: eles simplesmente não foram aplicados
+            for ticket in self._tickets:
+                ticket.finish("cancelled")
+            self._pending, self._tickets = None, []
+            self._cond.notify_all()
+        self._thread.join(timeout=1)
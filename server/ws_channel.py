@@ -0,0 +1,150 @@
+import json
+import time
+import logging
+import secrets
+import threading
+from collections import OrderedDict
+from flask import g, jsonify, request
+from flask_sock import Sock
+from media_controller import ControlError
+
+logger = logging.getLogger(__name__)
+
+# Protocolo (uma mensagem JSON por frame):
+#   {"id": 1, "op": "cmd", "action": "next"}
+#   {"id": 2, "op": "vol", "level": 30}
+#   {"id": 3, "op": "ping"}
+#   {"id": 4, "op": "wait", "ms": 200}
+# Cada mensagem recebe um ack com o mesmo id:
+#   {"id": 1, "ok": true, "status": 202, "msg": "next enviado"}
+
+# Tickets de handshake: o token nunca vai na URL, onde logs, traces e proxies o veriam
+TICKET_TTL = 30
+MAX_TICKETS = 256
+
+
+class TicketBook:
+    """Tickets de uso único para o handshake do /ws (clientes sem header, como navegadores).
+
+    POST /ws/ticket (autenticado) emite um ticket que vale ``ttl``
+    segundos, uma única vez e só para o mesmo IP.
+    """
+
+    def __init__(self, ttl=TICKET_TTL, max_tickets=MAX_TICKETS):
+        self.ttl = ttl
+        self.max_tickets = max_tickets
+        self.issued = 0
+        self.redeemed = 0
+        self.rejected = 0
+        self._tickets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def issue(self, device, client):
+        ticket = secrets.token_urlsafe(32)
+        with self._lock:
+            self._tickets[ticket] = (device, client, time.monotonic() + self.ttl)
+            if len(self._tickets) > self.max_tickets:
+                self._tickets.popitem(last=False)
+            self.issued += 1
+        return ticket
+
+    def redeem(self, ticket, client):
+        """Device do ticket ou None (desconhecido, expirado, já usado ou de outro IP)"""
+        with self._lock:
+            entry = self._tickets.pop(ticket, None)
+            if entry is None or entry[1] != client or entry[2] < time.monotonic():
+                self.rejected += 1
+                return None
+            self.redeemed += 1
+            return entry[0]
+
+    def stats(self):
+        with self._lock:
+            pending = len(self._tickets)
+        return {"issued": self.issued, "redeemed": self.redeemed, "rejected": self.rejected, "pending": pending}
+
+
+def handle_message(controller, raw, client=None, authorize=None):
+    """Executa uma mensagem do canal e retorna o ack correspondente.
+
+    ``authorize(message)`` lança ControlError se o dispositivo não pode
+    executar a operação (ou foi revogado depois do handshake).
+    """
+    try:
+        message = json.loads(raw)
+    except (TypeError, ValueError):
+        return {"ok": False, "status": 400, "error": "JSON inválido"}
+
+    if not isinstance(message, dict):
+        return {"ok": False, "status": 400, "error": "Mensagem inválida"}
+
+    ack = {"id": message.get("id")}
+    try:
+        if authorize is not None:
+            authorize(message)
+        text, status = controller.execute(message, client)
+        ack.update(ok=True, status=status, msg=text)
+    except ControlError as e:
+        ack.update(ok=False, status=e.status, error=e.message)
+    except Exception:
+        # Um erro inesperado responde só esta mensagem; o canal continua aberto
+        logger.exception("❌ Erro inesperado no canal /ws")
+        ack.update(ok=False, status=500, error="Erro interno")
+    return ack
+
+
+def register_control_socket(app, controller, authenticate, log, authorize=None, tickets=None):
+    """Registra o canal WebSocket /ws autenticado uma única vez no handshake.
+
+    ``authenticate(auth_header)`` retorna None se autorizado ou a resposta de
+    erro (e deixa o dispositivo em ``g.device``); ``authorize(device,
+    message)`` confere cada mensagem; ``log`` recebe mensagem e argumentos
+    no estilo do logging. O handshake usa o header Authorization ou um
+    ``?ticket=`` emitido por POST /ws/ticket.
+    """
+    sock = Sock(app)
+    tickets = tickets if tickets is not None else TicketBook()
+
+    @app.before_request
+    def authenticate_ws_handshake():
+        # Rejeita o upgrade antes de trocar o protocolo
+        if request.path != '/ws':
+            return None
+        auth_header = request.headers.get('Authorization')
+        ticket = request.args.get('ticket')
+        if auth_header or not ticket:
+            return authenticate(auth_header)
+        device = tickets.redeem(ticket, request.remote_addr)
+        if device is None:
+            return jsonify({"error": "Ticket inválido ou expirado"}), 401
+        g.device = device
+        return None
+
+    @app.route('/ws/ticket', methods=['POST'])
+    def issue_ticket():
+        error = authenticate(request.headers.get('Authorization'))
+        if error is not None:
+            return error
+        return jsonify({"ticket": tickets.issue(g.get("device"), request.remote_addr),
+                        "expires_in": tickets.ttl})
+
+    @sock.route('/ws')
+    def control_socket(ws):
+        remote_addr = request.remote_addr
+        device = g.get("device")
+        check = (lambda message: authorize(device, message)) if authorize is not None else None
+        log("[WS] Client connected from %s", remote_addr)
+        try:
+            while True:
+                raw = ws.receive()
+                if raw is None:
+                    break
+                ack = handle_message(controller, raw, remote_addr, check)
+                ws.send(json.dumps(ack, ensure_ascii=False))
+                if ack.get("status") == 401:
+                    # Dispositivo revogado: encerra o canal
+                    break
+        finally:
+            log("[WS] Client disconnected from %s", remote_addr)
+
+    return sock